@@ -0,0 +1,280 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from collections import defaultdict
+import logging
+import threading
+import traceback
+
+from six.moves import queue
+
+from mbed_flasher.common import FlashError, EraseError, ResetError
+from mbed_flasher.daplink_status import DaplinkStatus, DETAILS_CACHE
+from mbed_flasher.erase import Erase
+from mbed_flasher.flash import Flash
+from mbed_flasher.log_pipeline import target_logger
+from mbed_flasher.pipeline import Pipeline
+from mbed_flasher.reset import Reset
+from mbed_flasher.return_codes import EXIT_CODE_SUCCESS
+from mbed_flasher.return_codes import EXIT_CODE_UNHANDLED_EXCEPTION
+from mbed_flasher.timings import TRACER
+
+DEFAULT_CONCURRENCY = 4
+OPERATION_ERRORS = {"flash": FlashError, "erase": EraseError, "reset": ResetError,
+                    "run": FlashError}
+
+
+# pylint: disable=too-many-instance-attributes
+class OperationResult(object):
+    """
+    Outcome of a flash, erase or reset operation.
+    """
+    def __init__(self, operation, target_id, method=None):
+        """
+        :param operation: flash, erase, reset or run
+        :param target_id: target id the operation was requested for
+        :param method: method of the operation, e.g. msd or pyocd
+        """
+        self.operation = operation
+        self.target_id = target_id
+        self.method = method
+        self.return_code = EXIT_CODE_SUCCESS
+        self.message = None
+        self.error = None
+        self.target = None
+        self.duration = None
+        self.timings = None
+        self.bytes_written = None
+        self.attempts = []
+        self.details = None
+        self.skipped = False
+
+    @property
+    def succeeded(self):
+        """
+        :return: True if the operation succeeded
+        """
+        return self.return_code == EXIT_CODE_SUCCESS
+
+    @property
+    def retries(self):
+        """
+        :return: number of retried flash attempts
+        """
+        return max(len(self.attempts) - 1, 0)
+
+    def raise_for_error(self):
+        """
+        Raise the exception the operation failed with, if any.
+        """
+        if self.error is not None:
+            raise self.error
+
+    def as_dict(self):
+        """
+        :return: JSON serializable dictionary of the result
+        """
+        return {"operation": self.operation,
+                "target_id": self.target_id,
+                "method": self.method,
+                "return_code": self.return_code,
+                "message": self.message,
+                "target": self.target,
+                "duration": self.duration,
+                "timings": self.timings,
+                "bytes_written": self.bytes_written,
+                "retries": self.retries,
+                "attempts": self.attempts,
+                "details": self.details,
+                "skipped": self.skipped}
+
+    @classmethod
+    def from_dict(cls, values):
+        """
+        :param values: dictionary from as_dict
+        :return: OperationResult, error is rebuilt as the exception type of the operation
+        """
+        result = cls(values["operation"], values["target_id"], values.get("method"))
+        for name in ("return_code", "message", "target", "duration", "timings",
+                     "bytes_written", "details"):
+            setattr(result, name, values.get(name))
+        result.attempts = values.get("attempts") or []
+        result.skipped = bool(values.get("skipped"))
+        if not result.succeeded and result.message is not None:
+            error_class = OPERATION_ERRORS.get(result.operation, FlashError)
+            result.error = error_class(message=result.message, return_code=result.return_code)
+        return result
+
+
+def _sum_bytes(timings):
+    total = timings.get("bytes", 0)
+    for child in timings.get("children", []):
+        total += _sum_bytes(child)
+    return total
+
+
+class FlasherAPI(object):
+    """
+    Library API running flash, erase and reset operations and returning OperationResult
+    objects instead of raising, also for lists of jobs. Operations log to a child logger
+    of logger named by the target id.
+    """
+    def __init__(self, logger=None, session_pool=None):
+        """
+        :param logger: logger object
+        :param session_pool: SessionPool reused by pyocd method operations
+        """
+        self.logger = logger if logger else logging.getLogger("mbed-flasher")
+        self.session_pool = session_pool
+        self._target_locks = defaultdict(threading.Lock)
+        self._locks_lock = threading.Lock()
+
+    def flash(self, build, target_id=None, **options):
+        """
+        :param build: image file path
+        :param target_id: target id
+        :param options: other Flash.flash arguments, e.g. method or retry_policy
+        :return: OperationResult
+        """
+        flasher = Flash(logger=target_logger(self.logger, target_id),
+                        session_pool=self.session_pool)
+        result = OperationResult("flash", target_id, options.get("method", Flash.MSD_METHOD))
+        self._run(result, flasher, lambda: flasher.flash(build, target_id=target_id, **options))
+        result.attempts = flasher.attempts
+        return result
+
+    def erase(self, target_id=None, **options):
+        """
+        :param target_id: target id
+        :param options: other Erase.erase arguments, e.g. method or no_reset
+        :return: OperationResult
+        """
+        eraser = Erase(session_pool=self.session_pool,
+                       logger=target_logger(self.logger, target_id))
+        return self._run(OperationResult("erase", target_id, options.get("method")),
+                         eraser, lambda: eraser.erase(target_id=target_id, **options))
+
+    def reset(self, target_id=None, **options):
+        """
+        :param target_id: target id
+        :param options: other Reset.reset arguments, e.g. method or duration
+        :return: OperationResult
+        """
+        resetter = Reset(logger=target_logger(self.logger, target_id),
+                         session_pool=self.session_pool)
+        return self._run(OperationResult("reset", target_id, options.get("method")),
+                         resetter, lambda: resetter.reset(target_id=target_id, **options))
+
+    def run(self, steps, target_id=None, **options):
+        """
+        :param steps: comma separated step names or list of them, see Pipeline.run
+        :param target_id: target id
+        :param options: other Pipeline.run arguments, e.g. build or method
+        :return: OperationResult, pipeline.step_durations gives the step breakdown
+        of its timings
+        """
+        pipeline = Pipeline(logger=target_logger(self.logger, target_id),
+                            session_pool=self.session_pool)
+        return self._run(OperationResult("run", target_id,
+                                         options.get("method", Flash.PYOCD_METHOD)),
+                         pipeline, lambda: pipeline.run(steps, target_id=target_id, **options))
+
+    def flash_many(self, jobs, concurrency=DEFAULT_CONCURRENCY):
+        """
+        Flash a list of jobs, jobs of the same target are run one at a time.
+        :param jobs: list of dictionaries of flash arguments, build and target_id included
+        :param concurrency: maximum number of jobs run at the same time
+        :return: list of OperationResult in the order of jobs
+        """
+        return self._run_many(self.flash, jobs, concurrency)
+
+    def erase_many(self, jobs, concurrency=DEFAULT_CONCURRENCY):
+        """
+        Erase a list of jobs, jobs of the same target are run one at a time.
+        :param jobs: list of dictionaries of erase arguments, target_id included
+        :param concurrency: maximum number of jobs run at the same time
+        :return: list of OperationResult in the order of jobs
+        """
+        return self._run_many(self.erase, jobs, concurrency)
+
+    def _target_lock(self, target_id):
+        with self._locks_lock:
+            return self._target_locks[target_id]
+
+    def _run(self, result, operation, call):
+        with self._target_lock(result.target_id):
+            with TRACER.capture(result.operation, target_id=result.target_id) as span:
+                try:
+                    result.return_code = call()
+                except FlashError as error:
+                    result.return_code = error.return_code
+                    result.message = error.message
+                    result.error = error
+                # pylint: disable=broad-except
+                except Exception as error:
+                    self.logger.debug("%s failed unexpectedly:\n%s", result.operation,
+                                      traceback.format_exc())
+                    result.return_code = EXIT_CODE_UNHANDLED_EXCEPTION
+                    result.message = str(error)
+                    result.error = error
+
+        result.duration = span.duration
+        result.timings = span.as_dict(span.start)
+        result.bytes_written = _sum_bytes(result.timings) or None
+        result.target = operation.target
+        result.skipped = getattr(operation, "skipped", False) is True
+        if isinstance(result.target, dict) and result.target.get("mount_point"):
+            # Erase, flash and reset may have remounted the drive
+            DETAILS_CACHE.invalidate(result.target.get("target_id"))
+            try:
+                result.details = DaplinkStatus(result.target["mount_point"],
+                                               result.target.get("target_id")).details()
+            except (IOError, OSError):
+                pass
+        return result
+
+    def _run_many(self, run, jobs, concurrency):
+        jobs = list(jobs)
+        results = [None] * len(jobs)
+        pending = queue.Queue()
+        for index, job in enumerate(jobs):
+            pending.put((index, job))
+
+        def worker():
+            while True:
+                try:
+                    index, job = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    results[index] = run(**job)
+                # pylint: disable=broad-except
+                except Exception as error:
+                    # e.g. a job without build
+                    result = OperationResult(run.__name__, job.get("target_id"),
+                                             job.get("method"))
+                    result.return_code = EXIT_CODE_UNHANDLED_EXCEPTION
+                    result.message = str(error)
+                    result.error = error
+                    results[index] = result
+
+        threads = [threading.Thread(target=worker, name="mbedflash-job-{}".format(number))
+                   for number in range(max(1, min(concurrency, len(jobs))))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
@@ -0,0 +1,262 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import logging
+import os
+import struct
+import time
+
+from serial import Serial
+
+from mbed_flasher.common import monotonic
+
+try:
+    import selectors
+except ImportError:
+    # python 2 compatibility
+    import selectors2 as selectors
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, dropped data can not be queried
+    fcntl = None
+
+CAPTURE_READ_SIZE = 65536
+CAPTURE_WRITE_BUFFER = 1024 * 1024
+CAPTURE_SELECT_TIMEOUT = 0.1
+
+# Linux serial_icounter_struct, see linux/serial.h
+TIOCGICOUNT = 0x545D
+ICOUNTER_FORMAT = "20i"
+ICOUNTER_OVERRUN = 7
+ICOUNTER_BUF_OVERRUN = 10
+
+
+def read_overrun_count(file_descriptor):
+    """
+    Read the number of bytes the kernel or the UART dropped on a serial port.
+    :param file_descriptor: file descriptor of an open serial port
+    :return: overrun count, None if the port does not support the query
+    """
+    if fcntl is None:
+        return None
+    buf = bytearray(struct.calcsize(ICOUNTER_FORMAT))
+    try:
+        fcntl.ioctl(file_descriptor, TIOCGICOUNT, buf)
+    except (IOError, OSError):
+        return None
+    counters = struct.unpack(ICOUNTER_FORMAT, bytes(buf))
+    return counters[ICOUNTER_OVERRUN] + counters[ICOUNTER_BUF_OVERRUN]
+
+
+# pylint: disable=too-many-instance-attributes
+class CaptureStream(object):
+    """
+    One captured serial port and the file its output is written to.
+    """
+    def __init__(self, port, output_path, timestamps):
+        self.port = port
+        self.name = getattr(port, "name", None) or getattr(port, "port", None)
+        self.file_descriptor = port.fileno()
+        self.output_path = output_path
+        # Written by every poll round until close(), so not opened in a with block
+        # pylint: disable=consider-using-with
+        self.output = open(output_path, "wb", buffering=CAPTURE_WRITE_BUFFER)
+        self.timestamps = timestamps
+        self.at_line_start = True
+        self.bytes = 0
+        self.started = monotonic()
+        self.stopped = None
+        self._overrun_base = read_overrun_count(self.file_descriptor)
+        self._dropped_at_close = None
+
+    def write(self, data, stamp):
+        """
+        Write a chunk of port output, prefixing every new line with the stamp.
+        :param data: bytes read from the port
+        :param stamp: timestamp prefix shared by all chunks of one poll round
+        """
+        self.bytes += len(data)
+        if not self.timestamps:
+            self.output.write(data)
+            return
+
+        ends_line = data.endswith(b"\n")
+        if ends_line:
+            data = data[:-1]
+        data = data.replace(b"\n", b"\n" + stamp)
+        if self.at_line_start:
+            data = stamp + data
+        if ends_line:
+            data += b"\n"
+        self.at_line_start = ends_line
+        self.output.write(data)
+
+    @property
+    def dropped(self):
+        """
+        :return: bytes dropped by the port since capture started, None if unknown
+        """
+        if self.stopped is not None:
+            return self._dropped_at_close
+        if self._overrun_base is None:
+            return None
+        count = read_overrun_count(self.file_descriptor)
+        if count is None:
+            return None
+        return count - self._overrun_base
+
+    def statistics(self):
+        """
+        :return: dictionary of capture statistics for this port
+        """
+        elapsed = (self.stopped or monotonic()) - self.started
+        return {
+            "port": self.name,
+            "file": self.output_path,
+            "bytes": self.bytes,
+            "bytes_per_second": self.bytes / elapsed if elapsed > 0 else 0.0,
+            "dropped": self.dropped
+        }
+
+    def close(self):
+        """
+        Flush the output file and close the port.
+        """
+        if self.stopped is not None:
+            return
+        # Closed descriptors may be reused, so read the counters while the port is still open
+        self._dropped_at_close = self.dropped
+        self.stopped = monotonic()
+        self.output.close()
+        self.port.close()
+
+
+class SerialCapture(object):
+    """
+    Capture the output of many serial ports in one selector loop.
+    Only POSIX serial ports can be selected on.
+    """
+    def __init__(self, logger=None, timestamps=True):
+        self.logger = logger if logger else logging.getLogger("mbed-flasher")
+        self.timestamps = timestamps
+        self._selector = selectors.DefaultSelector()
+        self._streams = {}
+        self._closed = []
+
+    def open(self, serial_port, output_path, baudrate=115200):
+        """
+        Open a serial port and start capturing it.
+        :param serial_port: serial port name
+        :param output_path: file the port output is written to
+        :param baudrate: port baudrate
+        :return: CaptureStream
+        """
+        port = Serial(serial_port, baudrate=baudrate, timeout=0)
+        return self.add(port, output_path)
+
+    def add(self, port, output_path):
+        """
+        Start capturing an already open port.
+        :param port: object with fileno() and close(), typically serial.Serial
+        :param output_path: file the port output is written to
+        :return: CaptureStream
+        """
+        stream = CaptureStream(port, output_path, self.timestamps)
+        self._selector.register(stream.file_descriptor, selectors.EVENT_READ, stream)
+        self._streams[stream.file_descriptor] = stream
+        self.logger.debug("capturing %s to %s", stream.name, output_path)
+        return stream
+
+    def remove(self, stream):
+        """
+        Stop capturing a port and close it.
+        :param stream: CaptureStream returned by open or add
+        """
+        if self._streams.pop(stream.file_descriptor, None) is None:
+            return
+        self._selector.unregister(stream.file_descriptor)
+        stream.close()
+        self._closed.append(stream)
+
+    def poll(self, timeout=CAPTURE_SELECT_TIMEOUT):
+        """
+        Wait for port output once and write everything that is available.
+        :param timeout: seconds to wait for any port to become readable
+        :return: number of bytes captured
+        """
+        if not self._streams:
+            time.sleep(timeout)
+            return 0
+
+        ready = self._selector.select(timeout)
+        if not ready:
+            return 0
+
+        stamp = None
+        if self.timestamps:
+            # One timestamp per round keeps formatting cost independent of line count
+            stamp = "[{:.6f}] ".format(time.time()).encode("ascii")
+
+        captured = 0
+        for key, _ in ready:
+            stream = key.data
+            try:
+                data = os.read(stream.file_descriptor, CAPTURE_READ_SIZE)
+            except (IOError, OSError) as error:
+                self.logger.warning("capture of %s stopped: %s", stream.name, error)
+                self.remove(stream)
+                continue
+
+            if not data:
+                self.logger.warning("capture of %s stopped: port closed", stream.name)
+                self.remove(stream)
+                continue
+
+            stream.write(data, stamp)
+            captured += len(data)
+
+        return captured
+
+    def run(self, duration=None, stop_event=None):
+        """
+        Capture until the duration has elapsed, the stop event is set or all ports are gone.
+        :param duration: seconds to capture, None for no limit
+        :param stop_event: threading.Event stopping the capture when set
+        """
+        deadline = None if duration is None else monotonic() + duration
+        while self._streams:
+            if stop_event is not None and stop_event.is_set():
+                break
+            if deadline is not None and monotonic() >= deadline:
+                break
+            self.poll()
+
+    def statistics(self):
+        """
+        :return: list of per-port statistics, including ports that already stopped
+        """
+        streams = list(self._streams.values()) + self._closed
+        return [stream.statistics() for stream in streams]
+
+    def close(self):
+        """
+        Stop capturing all ports.
+        """
+        for stream in list(self._streams.values()):
+            self.remove(stream)
+        self._selector.close()
@@ -16,6 +16,13 @@ limitations under the License.
 
 import logging
 import os
+# monotonic is re-exported for timing measurements elsewhere in the package
+# pylint: disable=unused-import
+try:
+    from time import monotonic
+except ImportError:
+    # python 2 compatibility
+    from time import time as monotonic
 
 from mbed_flasher.return_codes import EXIT_CODE_FILE_MISSING
 from mbed_flasher.return_codes import EXIT_CODE_DAPLINK_USER_ERROR
@@ -0,0 +1,178 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import re
+import threading
+
+from mbed_flasher.daplink_errors import DAPLINK_ERRORS
+
+# Longest first so that the alternation prefers complete messages
+DAPLINK_ERROR_PATTERN = re.compile("|".join(
+    re.escape(error) for error in sorted(DAPLINK_ERRORS, key=len, reverse=True)))
+
+DETAILS_VERSION_PATTERN = re.compile(r"^Interface Version:?\s*(.*)$", re.MULTILINE)
+DETAILS_FLAG_PATTERN = re.compile(r"^(Automation allowed|Auto Reset):\s*(\d)", re.MULTILINE)
+
+
+def find_daplink_errors(fault):
+    """
+    Find known DAPLink error messages from FAIL.TXT contents.
+    :param fault: FAIL.TXT contents
+    :return: list of distinct error messages, keys of DAPLINK_ERRORS
+    """
+    errors = []
+    for match in DAPLINK_ERROR_PATTERN.finditer(fault):
+        if match.group(0) not in errors:
+            errors.append(match.group(0))
+    return errors
+
+
+def parse_details(text):
+    """
+    Parse DETAILS.TXT fields used by the flasher.
+    :param text: DETAILS.TXT contents
+    :return: dictionary with interface_version (int, None if it could not be parsed),
+    automation_allowed and auto_reset
+    """
+    details = {"interface_version": 0, "automation_allowed": False, "auto_reset": False}
+    version = DETAILS_VERSION_PATTERN.search(text)
+    if version:
+        try:
+            details["interface_version"] = int(version.group(1).strip().split(' ')[-1])
+        except (IndexError, ValueError):
+            details["interface_version"] = None
+    for name, value in DETAILS_FLAG_PATTERN.findall(text):
+        details[name.lower().replace(" ", "_")] = value == "1"
+    return details
+
+
+def _list_names(mount_point):
+    try:
+        scandir = os.scandir
+    except AttributeError:
+        # python 2 compatibility
+        return os.listdir(mount_point)
+    return [entry.name for entry in scandir(mount_point)]
+
+
+class DetailsCache(object):
+    """
+    Parsed DETAILS.TXT per target, kept until the target remounts or the file changes.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._details = {}
+
+    def get(self, target_id, mount_point, reader, stamp=None):
+        """
+        :param target_id: target id
+        :param mount_point: current mount point of the target
+        :param reader: callable returning DETAILS.TXT contents, raises IOError or OSError
+        :param stamp: identity of the file, e.g. inode, size and modification time,
+        cached details of another stamp are read again
+        :return: parsed details, see parse_details
+        """
+        key = (mount_point, stamp)
+        with self._lock:
+            cached = self._details.get(target_id)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        details = parse_details(reader())
+        with self._lock:
+            self._details[target_id] = (key, details)
+        return details
+
+    def invalidate(self, target_id=None):
+        """
+        :param target_id: target id, None clears all targets
+        """
+        with self._lock:
+            if target_id is None:
+                self._details.clear()
+            else:
+                self._details.pop(target_id, None)
+
+
+DETAILS_CACHE = DetailsCache()
+
+
+class DaplinkStatus(object):
+    """
+    Snapshot of DAPLink status files taken with a single scan of the mount point.
+    """
+    def __init__(self, mount_point, target_id=None):
+        """
+        :param mount_point: target mount point
+        :param target_id: target id used as DETAILS.TXT cache key, not cached if None
+        """
+        self.mount_point = mount_point
+        self.target_id = target_id
+        self._names = {}
+        try:
+            names = _list_names(mount_point)
+        except OSError:
+            # Mount point is gone, e.g. remount in progress, no status files either
+            names = []
+        for name in names:
+            self._names[name.upper()] = name
+
+    def has_file(self, name):
+        """
+        :param name: file name, compared case insensitively as on the FAT mount
+        :return: True if the file was present when the snapshot was taken
+        """
+        return name.upper() in self._names
+
+    def read(self, name):
+        """
+        :param name: file name
+        :return: stripped file contents, raises IOError or OSError
+        """
+        real_name = self._names.get(name.upper(), name)
+        with open(os.path.join(self.mount_point, real_name), 'r') as status_file:
+            return status_file.read().strip()
+
+    @property
+    def failed(self):
+        """
+        :return: True if FAIL.TXT is present
+        """
+        return self.has_file("FAIL.TXT")
+
+    @property
+    def asserted(self):
+        """
+        :return: True if ASSERT.TXT is present
+        """
+        return self.has_file("ASSERT.TXT")
+
+    def details(self):
+        """
+        :return: parsed DETAILS.TXT, cached per target until remount or until the file
+        changes, raises IOError or OSError if it can not be read
+        """
+        def reader():
+            return self.read("DETAILS.TXT")
+
+        if self.target_id is None:
+            return parse_details(reader())
+        details_stat = os.stat(os.path.join(self.mount_point,
+                                            self._names.get("DETAILS.TXT", "DETAILS.TXT")))
+        stamp = (details_stat.st_dev, details_stat.st_ino, details_stat.st_size,
+                 details_stat.st_mtime)
+        return DETAILS_CACHE.get(self.target_id, self.mount_point, reader, stamp)
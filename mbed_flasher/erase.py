@@ -17,29 +17,67 @@ limitations under the License.
 # python 3 compatibility
 # pylint: disable=superfluous-parens
 
+import os
+
+import six
+
 from mbed_flasher.common import Logger, EraseError
 from mbed_flasher.flashers.FlasherMbed import FlasherMbed
 from mbed_flasher.flashers.FlasherPyOCD import FlasherPyOCD, ConnectMode
 from mbed_flasher.mbed_common import MbedCommon
+from mbed_flasher.metrics import count_operation
 from mbed_flasher.return_codes import EXIT_CODE_SUCCESS
 from mbed_flasher.return_codes import EXIT_CODE_COULD_NOT_MAP_TARGET_ID_TO_DEVICE
+from mbed_flasher.return_codes import EXIT_CODE_FILE_MISSING
 from mbed_flasher.return_codes import EXIT_CODE_MISUSE_CMD
 from mbed_flasher.return_codes import EXIT_CODE_TARGET_ID_MISSING
 
 
+def parse_erase_range(spec):
+    """
+    :param spec: "start-end" with end exclusive, "start+size" or (start, end),
+    addresses are decimal or 0x prefixed hexadecimal
+    :return: (start, end) tuple, end exclusive
+    """
+    try:
+        if isinstance(spec, six.string_types):
+            if "-" in spec:
+                start, end = [int(value, 0) for value in spec.split("-")]
+            else:
+                start, size = [int(value, 0) for value in spec.split("+")]
+                end = start + size
+        else:
+            start, end = [int(value) for value in spec]
+    except (TypeError, ValueError):
+        start, end = None, None
+    if start is None or start < 0 or end <= start:
+        raise EraseError(message="Invalid erase range {}, expected START-END or "
+                                 "START+SIZE".format(spec),
+                         return_code=EXIT_CODE_MISUSE_CMD)
+    return start, end
+
+
 # pylint: disable=too-few-public-methods
 class Erase(object):
     """ Erase object, which manages erasing for given devices
     """
 
-    def __init__(self):
-        logger = Logger('mbed-flasher')
-        self.logger = logger.logger
+    def __init__(self, session_pool=None, logger=None):
+        """
+        :param session_pool: SessionPool reused by pyocd method operations
+        :param logger: logger object
+        """
+        self.logger = logger if logger else Logger('mbed-flasher').logger
+        self.session_pool = session_pool
+        self.target = None
+        self.skipped = False
 
     # pylint: disable=too-many-arguments
+    @count_operation("erase")
     def erase(self, target_id=None, no_reset=None, method=None,
               pyocd_platform=None, pyocd_pack=None,
-              pyocd_connect_mode=ConnectMode.UNDER_RESET.value):
+              pyocd_connect_mode=ConnectMode.UNDER_RESET.value,
+              erase_ranges=None, erase_image=None, blank_check=False):
         """
         Erase (mbed) device(s).
         :param target_id: target_id
@@ -48,12 +86,28 @@ class Erase(object):
         :param pyocd_platform: target platform to pyocd
         :param pyocd_pack: pack file path to pyocd
         :param pyocd_connect_mode: connect_mode used with pyocd
+        :param erase_ranges: list of address ranges, see parse_erase_range, only the flash
+        sectors overlapping them are erased, pyocd method only
+        :param erase_image: .bin or .hex image, only the flash sectors it covers are erased,
+        pyocd method only
+        :param blank_check: check the flash with pyocd first and skip the erase if it is
+        already blank, skipped tells if it was skipped
         """
+        self.skipped = False
         if target_id is None:
             raise EraseError(message="target_id is missing",
                              return_code=EXIT_CODE_TARGET_ID_MISSING)
 
-        target_mbed = MbedCommon.refresh_target(target_id)
+        ranges = [parse_erase_range(spec) for spec in erase_ranges or []]
+        if (ranges or erase_image) and method != 'pyocd':
+            raise EraseError(message="Erasing address ranges is supported only with "
+                                     "pyocd method",
+                             return_code=EXIT_CODE_MISUSE_CMD)
+        if erase_image and not os.path.isfile(erase_image):
+            raise EraseError(message="Given image {} does not exist".format(erase_image),
+                             return_code=EXIT_CODE_FILE_MISSING)
+
+        target_mbed = self.target = MbedCommon.refresh_target(target_id)
         if target_mbed is None:
             raise EraseError(message="Did not find target: {}".format(target_id),
                              return_code=EXIT_CODE_COULD_NOT_MAP_TARGET_ID_TO_DEVICE)
@@ -61,16 +115,37 @@ class Erase(object):
         self.logger.info("Erasing: %s", target_id)
 
         if method == 'msd':
-            FlasherMbed(logger=self.logger).erase(target=target_mbed, no_reset=no_reset)
+            if blank_check and self._is_blank(target_mbed, pyocd_platform, pyocd_pack,
+                                              pyocd_connect_mode):
+                self.logger.info("flash is already blank, erase skipped")
+                self.skipped = True
+            else:
+                FlasherMbed(logger=self.logger).erase(target=target_mbed, no_reset=no_reset)
         elif method == 'pyocd':
-            FlasherPyOCD(logger=self.logger).erase(
+            flasher = FlasherPyOCD(logger=self.logger, session_pool=self.session_pool)
+            flasher.erase(
                 target=target_mbed,
                 no_reset=no_reset,
                 platform=pyocd_platform,
                 pack=pyocd_pack,
-                connect_mode=pyocd_connect_mode)
+                connect_mode=pyocd_connect_mode,
+                ranges=ranges,
+                image=erase_image,
+                blank_check=blank_check)
+            self.skipped = flasher.erase_skipped
         else:
             raise EraseError(message="Selected method {} not supported".format(method),
                              return_code=EXIT_CODE_MISUSE_CMD)
 
         return EXIT_CODE_SUCCESS
+
+    def _is_blank(self, target, platform, pack, connect_mode):
+        """
+        Blank check an msd erase target with pyocd, False if pyocd can not check it.
+        """
+        try:
+            return FlasherPyOCD(logger=self.logger, session_pool=self.session_pool).blank_check(
+                target=target, platform=platform, pack=pack, connect_mode=connect_mode)
+        except EraseError as error:
+            self.logger.warning("Blank check failed, erasing: %s", error.message)
+            return False
@@ -14,17 +14,27 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-from mbed_flasher.common import Logger, FlashError,\
+import time
+
+from mbed_flasher.common import Logger, FlashError, monotonic,\
     check_file, check_file_exists, check_file_extension
 from mbed_flasher.flashers.FlasherMbed import FlasherMbed
 from mbed_flasher.flashers.FlasherPyOCD import FlasherPyOCD, ConnectMode
+from mbed_flasher.image_check import validate_image, target_memory_map, boot_address
+from mbed_flasher.image_compose import IMAGE_COMPOSER, image_paths, needs_composing
 from mbed_flasher.mbed_common import MbedCommon
+from mbed_flasher.metrics import count_operation, return_code_name, FLASH_RETRIES
+from mbed_flasher.readiness import ReadinessProbe, BOOT_BANNER_TIMEOUT
+from mbed_flasher.reset import Reset
+from mbed_flasher.reset_methods import PyOCDReset
+from mbed_flasher.retry import RetryPolicy
 from mbed_flasher.return_codes import EXIT_CODE_TARGET_ID_MISSING
 from mbed_flasher.return_codes import EXIT_CODE_SUCCESS
 from mbed_flasher.return_codes import EXIT_CODE_KEYBOARD_INTERRUPT
 from mbed_flasher.return_codes import EXIT_CODE_SYSTEM_INTERRUPT
 from mbed_flasher.return_codes import EXIT_CODE_COULD_NOT_MAP_TARGET_ID_TO_DEVICE
 from mbed_flasher.return_codes import EXIT_CODE_MISUSE_CMD
+from mbed_flasher.timings import TRACER
 
 
 # pylint: disable=too-few-public-methods
@@ -37,56 +47,138 @@ class Flash(object):
     MSD_METHOD = 'msd'
     PYOCD_METHOD = 'pyocd'
 
-    def __init__(self, logger=None):
+    def __init__(self, logger=None, session_pool=None):
+        """
+        :param logger: logger object
+        :param session_pool: SessionPool reused by pyocd method operations
+        """
         if logger is None:
             logger = Logger('mbed-flasher')
             logger = logger.logger
         self.logger = logger
+        self.session_pool = session_pool
+        self.boot_latency = None
+        self.attempts = []
+        self.target = None
 
     # pylint: disable=too-many-arguments
+    def prepare_build(self, build, target_id=None, pyocd_platform=None, pyocd_pack=None,
+                      validate=True):
+        """
+        Check the image files, merge several images to one and validate the result.
+        :param build: string (file-path), or list of image specs merged to one image
+        :param target_id: target_id, used to find the target memory map
+        :param pyocd_platform: target platform to pyocd
+        :param pyocd_pack: pack file path to pyocd
+        :param validate: check hex checksums, flash address ranges and vector table
+        :return: path of the image to flash, raises FlashError if it is not usable
+        """
+        if isinstance(build, (list, tuple)) and build:
+            for spec in build:
+                check_file(self.logger, spec)
+            for path in image_paths(build):
+                check_file_exists(self.logger, path)
+                check_file_extension(self.logger, path)
+            if needs_composing(build):
+                base_address = boot_address(target_memory_map(target_id, pyocd_platform,
+                                                              pyocd_pack))
+                build = IMAGE_COMPOSER.compose(build, base_address)
+            else:
+                build = build[0]
+        else:
+            check_file(self.logger, build)
+            check_file_exists(self.logger, build)
+            check_file_extension(self.logger, build)
+        if validate:
+            validate_image(build, target_id=target_id, platform=pyocd_platform,
+                           pack=pyocd_pack, logger=self.logger)
+        return build
+
+    # pylint: disable=too-many-arguments, too-many-locals
+    @count_operation("flash")
+    @TRACER.timed("Flash.flash")
     def flash(self, build, target_id=None, method=MSD_METHOD, no_reset=None,
               pyocd_platform=None, pyocd_pack=None,
-              pyocd_connect_mode=ConnectMode.UNDER_RESET.value):
+              pyocd_connect_mode=ConnectMode.UNDER_RESET.value,
+              boot_banner=None, boot_timeout=BOOT_BANNER_TIMEOUT,
+              pyocd_profile=None, pyocd_program_options=None, reset_method=None,
+              verify=False, retry_policy=None, validate=True):
         """Flash (mbed) device
-        :param build: string (file-path)
+        :param build: string (file-path), or list of image specs merged to one image,
+        a .bin image may be followed by @address
         :param target_id: target_id
         :param method: method for flashing i.e. simple
         :param no_reset: whether to reset the board after flash
         :param pyocd_platform: target platform to pyocd
         :param pyocd_pack: pack file path to pyocd
         :param pyocd_connect_mode: connect_mode used with pyocd
+        :param boot_banner: regular expression printed by the target once booted,
+        flash returns after it is seen on the serial port, only used with msd method
+        :param boot_timeout: seconds to wait for the boot banner
+        :param pyocd_profile: programming profile used with pyocd, safe, fast or max
+        :param pyocd_program_options: raw programming options used with pyocd,
+        list of KEY=VALUE strings overriding the profile
+        :param reset_method: post-flash reset method used with msd, one of RESET_METHODS,
+        pyocd reset uses pyocd_platform and pyocd_pack
+        :param verify: compare flash contents with the image using on-target CRC32,
+        with msd method pyocd_platform and pyocd_pack are used to connect to the target
+        :param retry_policy: RetryPolicy for failures DAPLink reports as transient,
+        no retries if None. Every attempt is recorded in self.attempts
+        :param validate: check hex checksums, flash address ranges and vector table
+        of the image before flashing
         """
         if target_id is None:
             msg = "Target_id is missing"
             raise FlashError(message=msg,
                              return_code=EXIT_CODE_TARGET_ID_MISSING)
+        TRACER.current().set(target_id=target_id, method=method)
 
-        check_file(self.logger, build)
-        check_file_exists(self.logger, build)
-        check_file_extension(self.logger, build)
+        build = self.prepare_build(build, target_id, pyocd_platform, pyocd_pack, validate)
 
-        target_mbed = MbedCommon.refresh_target(target_id)
+        target_mbed = self.target = MbedCommon.refresh_target(target_id)
         if target_mbed is None:
             raise FlashError(message="Did not find target: {}".format(target_id),
                              return_code=EXIT_CODE_COULD_NOT_MAP_TARGET_ID_TO_DEVICE)
 
         self.logger.debug("Flashing: %s", target_mbed["target_id"])
 
-        try:
+        boot_probe = None
+        if boot_banner:
+            boot_probe = ReadinessProbe(boot_banner, timeout=boot_timeout, logger=self.logger)
+
+        reset_method = reset_method or 'simple'
+        reset_options = None
+        if reset_method == PyOCDReset.name:
+            reset_options = {"platform": pyocd_platform, "pack": pyocd_pack,
+                             "session_pool": self.session_pool}
+
+        def flash_once(target_mbed):
             if method == Flash.MSD_METHOD:
                 FlasherMbed(logger=self.logger).flash(
-                    source=build, target=target_mbed, no_reset=no_reset)
+                    source=build, target=target_mbed, no_reset=no_reset, boot_probe=boot_probe,
+                    reset_method=reset_method, reset_options=reset_options)
+                if verify:
+                    FlasherPyOCD(logger=self.logger, session_pool=self.session_pool).verify(
+                        source=build, target=target_mbed, platform=pyocd_platform,
+                        pack=pyocd_pack)
             elif method == Flash.PYOCD_METHOD:
-                FlasherPyOCD(logger=self.logger).flash(
+                FlasherPyOCD(logger=self.logger, session_pool=self.session_pool).flash(
                     source=build,
                     target=target_mbed,
                     no_reset=no_reset,
                     platform=pyocd_platform,
                     pack=pyocd_pack,
-                    connect_mode=pyocd_connect_mode)
+                    connect_mode=pyocd_connect_mode,
+                    profile=pyocd_profile,
+                    program_options=pyocd_program_options,
+                    verify=verify)
             else:
                 raise FlashError(message="Selected method {} not supported".format(method),
                                  return_code=EXIT_CODE_MISUSE_CMD)
+
+        try:
+            target_mbed = self._attempt(flash_once, target_mbed, retry_policy or RetryPolicy(),
+                                        reset_method, reset_options)
         except KeyboardInterrupt:
             raise FlashError(message="Aborted by user",
                              return_code=EXIT_CODE_KEYBOARD_INTERRUPT)
@@ -95,5 +187,73 @@ class Flash(object):
                              return_code=EXIT_CODE_SYSTEM_INTERRUPT)
 
         self.logger.info("%s flash success", target_mbed["target_id"])
+        if boot_probe is not None:
+            self.boot_latency = boot_probe.latency
 
         return EXIT_CODE_SUCCESS
+
+    # pylint: disable=too-many-arguments
+    def _attempt(self, flash_once, target_mbed, retry_policy, reset_method, reset_options):
+        """
+        Flash until an attempt succeeds or the retry policy gives up.
+        :param flash_once: function flashing the target given to it once
+        :param target_mbed: target dictionary of the first attempt
+        :param retry_policy: RetryPolicy
+        :param reset_method: reset method used before retries, one of RESET_METHODS
+        :param reset_options: options of the reset method or None
+        :return: target dictionary of the succeeded attempt, raises FlashError otherwise
+        """
+        target_id = target_mbed["target_id"]
+        self.attempts = []
+        attempt = 1
+        while True:
+            started = monotonic()
+            try:
+                with TRACER.span("Flash.attempt", attempt=attempt):
+                    flash_once(target_mbed)
+                self._record_attempt(attempt, started, EXIT_CODE_SUCCESS)
+                return target_mbed
+            except FlashError as error:
+                record = self._record_attempt(attempt, started, error.return_code,
+                                              error.message)
+                if not retry_policy.should_retry(error, attempt, target_id):
+                    raise
+                record["delay"] = retry_policy.delay(attempt)
+                FLASH_RETRIES.inc(result=return_code_name(error.return_code))
+                self.logger.warning("Flash attempt %d failed: %s, retrying in %.1f seconds",
+                                    attempt, error.message, record["delay"])
+                target_mbed = self.target = self._prepare_retry(
+                    target_id, retry_policy, record["delay"], reset_method, reset_options)
+                attempt += 1
+
+    def _record_attempt(self, attempt, started, return_code, message=None):
+        record = {"attempt": attempt,
+                  "return_code": return_code,
+                  "message": message,
+                  "duration": monotonic() - started,
+                  "delay": 0}
+        self.attempts.append(record)
+        return record
+
+    # pylint: disable=too-many-arguments
+    def _prepare_retry(self, target_id, retry_policy, delay, reset_method, reset_options):
+        """
+        Wait and optionally reset the target before the next attempt.
+        :param reset_method: reset method of the flash operation, one of RESET_METHODS
+        :param reset_options: options of the reset method or None
+        :return: refreshed target, raises FlashError if the target is gone
+        """
+        if retry_policy.reset_between:
+            target_mbed = MbedCommon.refresh_target(target_id)
+            if target_mbed is not None:
+                try:
+                    Reset(logger=self.logger, session_pool=self.session_pool).reset_target(
+                        target_mbed, method=reset_method, **(reset_options or {}))
+                except Exception as error:  # pylint: disable=broad-except
+                    self.logger.warning("Reset before retry failed: %s", error)
+        time.sleep(delay)
+        target_mbed = MbedCommon.refresh_target(target_id)
+        if target_mbed is None:
+            raise FlashError(message="Did not find target: {}".format(target_id),
+                             return_code=EXIT_CODE_COULD_NOT_MAP_TARGET_ID_TO_DEVICE)
+        return target_mbed
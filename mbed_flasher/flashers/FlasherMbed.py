@@ -15,7 +15,7 @@ limitations under the License.
 """
 
 import logging
-from os.path import join, isfile
+from os.path import isfile
 import os
 from time import sleep
 import hashlib
@@ -27,6 +27,7 @@ import six
 from mbed_flasher.common import FlashError, EraseError
 from mbed_flasher.mbed_common import MbedCommon
 from mbed_flasher.daplink_errors import DAPLINK_ERRORS
+from mbed_flasher.daplink_status import DaplinkStatus, find_daplink_errors
 from mbed_flasher.reset import Reset
 from mbed_flasher.return_codes import EXIT_CODE_SUCCESS
 from mbed_flasher.return_codes import EXIT_CODE_FLASH_FAILED
@@ -37,6 +38,7 @@ from mbed_flasher.return_codes import EXIT_CODE_TARGET_ID_MISSING
 from mbed_flasher.return_codes import EXIT_CODE_MOUNT_POINT_MISSING
 from mbed_flasher.return_codes import EXIT_CODE_SERIAL_PORT_MISSING
 from mbed_flasher.return_codes import EXIT_CODE_IMPLEMENTATION_MISSING
+from mbed_flasher.timings import TRACER
 
 ERASE_REMOUNT_TIMEOUT = 10
 ERASE_VERIFICATION_TIMEOUT = 30
@@ -53,16 +55,22 @@ class FlasherMbed(object):
         self.logger = logger if logger else logging.getLogger('mbed-flasher')
 
     # pylint: disable=unused-argument
-    def flash(self, source, target, no_reset):
+    # pylint: disable=too-many-arguments
+    def flash(self, source, target, no_reset, boot_probe=None,
+              reset_method='simple', reset_options=None):
         """copy file to the destination
         :param source: binary to be flashed
         :param target: target to be flashed
         :param no_reset: do not reset flashed board at all
+        :param boot_probe: ReadinessProbe waiting for the boot banner after reset
+        :param reset_method: method of the post-flash reset, one of RESET_METHODS
+        :param reset_options: reset method specific options
         """
         if not isinstance(source, six.string_types):
             return
 
-        return self.try_drag_and_drop_flash(source, target, no_reset)
+        return self.try_drag_and_drop_flash(source, target, no_reset, boot_probe,
+                                            reset_method, reset_options)
 
     # pylint: disable=too-many-return-statements, too-many-branches
     def erase(self, target, no_reset):
@@ -98,12 +106,19 @@ class FlasherMbed(object):
         self.logger.info("erase %s completed", target["target_id"])
         return EXIT_CODE_SUCCESS
 
-    def try_drag_and_drop_flash(self, source, target, no_reset):
+    # pylint: disable=too-many-arguments
+    @TRACER.timed("FlasherMbed.try_drag_and_drop_flash")
+    def try_drag_and_drop_flash(self, source, target, no_reset, boot_probe=None,
+                                reset_method='simple', reset_options=None):
         """
         Try to flash the target using drag and drop method.
         :param source: file to be flashed
         :param target: target board to be flashed
         :param no_reset: whether to reset the board after flash
+        :param boot_probe: ReadinessProbe waiting for the boot banner after reset,
+        a fixed delay is used instead when not given
+        :param reset_method: method of the post-flash reset, one of RESET_METHODS
+        :param reset_options: reset method specific options
         :return: 0 if success
         """
 
@@ -125,13 +140,21 @@ class FlasherMbed(object):
             target = MbedCommon.wait_for_file_disappear(target, source)
 
             if not no_reset:
-                Reset(logger=self.logger).reset_board(target["serial_port"])
-                sleep(0.4)
+                Reset(logger=self.logger).reset_target(
+                    target, reset_method, boot_probe=boot_probe, **(reset_options or {}))
+                if boot_probe is None:
+                    sleep(0.4)
 
             # verify flashing went as planned
             self.logger.debug("verifying flash")
-            return self.verify_flash_success(
+            result = self.verify_flash_success(
                 target, MbedCommon.get_binary_destination(target["mount_point"], source))
+
+            # DAPLink failure reasons take precedence over a missing boot banner
+            if boot_probe is not None and not no_reset:
+                boot_probe.raise_if_not_ready()
+
+            return result
         # In python3 IOError is just an alias for OSError
         except (OSError, IOError) as error:
             msg = "File copy failed due to: {}".format(str(error))
@@ -139,6 +162,7 @@ class FlasherMbed(object):
             raise FlashError(message=msg,
                              return_code=EXIT_CODE_OS_ERROR)
 
+    @TRACER.timed("FlasherMbed.copy_file")
     def copy_file(self, source, destination):
         """
         copy file from os
@@ -152,7 +176,9 @@ class FlasherMbed(object):
             raise FlashError(message="File couldn't be read",
                              return_code=EXIT_CODE_FILE_COULD_NOT_BE_READ)
 
-        self.logger.debug("SHA1: %s", hashlib.sha1(aux_source).hexdigest())
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("SHA1: %s", hashlib.sha1(aux_source).hexdigest())
+        TRACER.current().set(bytes=len(aux_source))
 
         try:
             if platform.system() == "Windows":
@@ -187,41 +213,36 @@ class FlasherMbed(object):
             if destination_fd:
                 os.close(destination_fd)
 
-    @staticmethod
-    def _read_file(path, file_name):
-        with open(join(path, file_name), 'r') as fault:
-            return fault.read().strip()
-
+    @TRACER.timed("FlasherMbed.verify_flash_success")
     def verify_flash_success(self, target, file_path):
         """
         verify flash went well
         """
         mount = target['mount_point']
-        if isfile(join(mount, 'FAIL.TXT')):
-            fault = FlasherMbed._read_file(mount, "FAIL.TXT")
+        status = DaplinkStatus(mount, target.get("target_id"))
+        if status.failed:
+            fault = status.read("FAIL.TXT")
             self.logger.error("Flashing failed: %s. tid=%s",
                               fault, target["target_id"])
 
-            try:
-                errors = [error for error in DAPLINK_ERRORS if error in fault]
-                assert len(errors) <= 1
-                raise FlashError(message=fault, return_code=DAPLINK_ERRORS[errors[0]])
-            except AssertionError:
+            errors = find_daplink_errors(fault)
+            if len(errors) > 1:
                 msg = "Found multiple errors from FAIL.TXT: {}".format(fault)
-                self.logger.exception(msg)
+                self.logger.error(msg)
                 raise FlashError(message=msg, return_code=EXIT_CODE_FLASH_FAILED)
-            except IndexError:
+            if not errors:
                 msg = "Error in FAIL.TXT is unknown: {}".format(fault)
-                self.logger.exception(msg)
+                self.logger.error(msg)
                 raise FlashError(message=msg, return_code=EXIT_CODE_FLASH_FAILED)
+            raise FlashError(message=fault, return_code=DAPLINK_ERRORS[errors[0]])
 
-        if isfile(join(mount, 'ASSERT.TXT')):
-            fault = FlasherMbed._read_file(mount, "ASSERT.TXT")
+        if status.asserted:
+            fault = status.read("ASSERT.TXT")
             msg = "Found ASSERT.TXT: {}".format(fault)
             self.logger.error("{} found ASSERT.txt: {}".format(target["target_id"], fault))
             raise FlashError(message=msg, return_code=EXIT_CODE_FLASH_FAILED)
 
-        if isfile(file_path):
+        if status.has_file(os.path.basename(file_path)):
             msg = "File still present in mount point"
             self.logger.error("{} file still present in mount point".format(target["target_id"]))
             raise FlashError(message=msg, return_code=EXIT_CODE_FILE_STILL_PRESENT)
@@ -248,26 +269,16 @@ class FlasherMbed(object):
         :return: None if can be erased, raises otherwise
         """
         try:
-            with open(join(target["mount_point"], 'DETAILS.TXT'), 'rb') as new_file:
-                details_txt = new_file.readlines()
+            details = DaplinkStatus(target["mount_point"], target.get("target_id")).details()
         except (OSError, IOError):
             raise EraseError(message="No DETAILS.TXT found",
                              return_code=EXIT_CODE_IMPLEMENTATION_MISSING)
 
-        automation_activated = False
-        daplink_version = 0
-        for line in details_txt:
-            if line.find(b"Automation allowed: 1") != -1:
-                automation_activated = True
-            if line.find(b"Interface Version") != -1:
-                try:
-                    if six.PY2:
-                        daplink_version = int(line.split(' ')[-1])
-                    else:
-                        daplink_version = int(line.decode('utf-8').split(' ')[-1])
-                except (IndexError, ValueError):
-                    raise EraseError(message="Failed to parse DAPLINK version from DETAILS.TXT",
-                                     return_code=EXIT_CODE_IMPLEMENTATION_MISSING)
+        automation_activated = details["automation_allowed"]
+        daplink_version = details["interface_version"]
+        if daplink_version is None:
+            raise EraseError(message="Failed to parse DAPLINK version from DETAILS.TXT",
+                             return_code=EXIT_CODE_IMPLEMENTATION_MISSING)
 
         if not automation_activated:
             msg = "Selected device does not have automation activated in DAPLINK"
@@ -14,20 +14,48 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+from contextlib import contextmanager
 from enum import Enum
+import io
 import logging
+import os
 import traceback
 
 from intelhex import IntelHexError
+from pyocd.core.exceptions import ProbeError, TransferError, TransferFaultError
 from pyocd.core.helpers import ConnectHelper
+from pyocd.core.session import Session
+from pyocd.core.target import Target
 from pyocd.flash.file_programmer import FileProgrammer
 from pyocd.flash.eraser import FlashEraser
+from pyocd.probe.pydapaccess.dap_access_api import DAPAccessIntf
 
-from mbed_flasher.common import FlashError, EraseError
+from mbed_flasher.common import FlashError, EraseError, ResetError, monotonic
+from mbed_flasher.flashers.crc_verify import CrcVerifier, load_image
+from mbed_flasher.flashers.pack_cache import PACK_CACHE
+from mbed_flasher.flashers.probe_cache import PROBE_CACHE
+from mbed_flasher.flashers.programming_profiles import DEFAULT_PROFILE
+from mbed_flasher.flashers.programming_profiles import PROGRAMMING_STATISTICS
+from mbed_flasher.flashers.programming_profiles import get_programming_options
+from mbed_flasher.hexfile import HexFormatError, parse_hex
 from mbed_flasher.return_codes import EXIT_CODE_COULD_NOT_MAP_TARGET_ID_TO_DEVICE
 from mbed_flasher.return_codes import EXIT_CODE_PYOCD_USER_ERROR
 from mbed_flasher.return_codes import EXIT_CODE_SUCCESS
 from mbed_flasher.return_codes import EXIT_CODE_PYOCD_UNHANDLED_EXCEPTION
+from mbed_flasher.return_codes import EXIT_CODE_MISUSE_CMD
+from mbed_flasher.timings import TRACER
+
+# Errors of the probe or its USB connection, the cached probe may have been replugged
+PROBE_ERRORS = (ProbeError, TransferError, DAPAccessIntf.Error)
+
+
+def _is_probe_error(error):
+    """
+    :param error: exception raised during an operation
+    :return: True if the probe or its connection failed, a fault of an address is not
+    a problem of the probe
+    """
+    return isinstance(error, PROBE_ERRORS) and not isinstance(error, TransferFaultError)
 
 
 class ConnectMode(Enum):
@@ -40,17 +68,49 @@ class ConnectMode(Enum):
     ATTACH = "attach"
 
 
+# Reset type names, older pyOCD releases use the first and newer the second enum name
+RESET_TYPES = {
+    "hw": ("HW", "HARDWARE"),
+    "sw": ("SW", "SYSTEM"),
+    "emulated": ("SW_EMULATED", "EMULATED"),
+}
+DEFAULT_RESET_TYPE = "hw"
+
+
+def get_reset_type(name):
+    """
+    :param name: one of RESET_TYPES keys
+    :return: pyOCD Target.ResetType, raises ResetError for unknown names
+    """
+    for enum_name in RESET_TYPES.get(name, ()):
+        reset_type = getattr(Target.ResetType, enum_name, None)
+        if reset_type is not None:
+            return reset_type
+    raise ResetError(message="Selected pyOCD reset type {} not supported".format(name),
+                     return_code=EXIT_CODE_MISUSE_CMD)
+
+
 class FlasherPyOCD(object):
     """
     Flash and erase board using PyOCD.
     """
     name = "pyOCD"
 
-    def __init__(self, logger=None):
+    def __init__(self, logger=None, session_pool=None):
+        """
+        :param logger: logger object
+        :param session_pool: SessionPool keeping sessions open between operations,
+        a new session is opened and closed for every operation if None
+        """
         self.logger = logger if logger else logging.getLogger('mbed-flasher')
+        self.session_pool = session_pool
+        self.throughput = None
+        self.erase_skipped = False
 
-    # pylint: disable=too-many-arguments
-    def flash(self, source, target, no_reset, platform, pack, connect_mode):
+    # pylint: disable=too-many-arguments, too-many-locals
+    @TRACER.timed("FlasherPyOCD.flash")
+    def flash(self, source, target, no_reset, platform, pack, connect_mode,
+              profile=None, program_options=None, verify=False):
         """Flash target using pyOCD
         :param source: binary to be flashed
         :param target: mbedls given target dictionary
@@ -58,21 +118,36 @@ class FlasherPyOCD(object):
         :param platform: target platform
         :param pack: path of pack file
         :param connect_mode: mode used when connecting
+        :param profile: programming profile name, see PROGRAMMING_PROFILES
+        :param program_options: raw programming options overriding the profile,
+        list of KEY=VALUE strings or dictionary
+        :param verify: compare flash contents with the image using on-target CRC32
         :return: 0 if success otherwise raises
         """
         self.logger.debug('Flashing with pyOCD')
+        profile = DEFAULT_PROFILE if profile is None else profile
+        options = get_programming_options(profile, program_options)
+        double_buffer = options.pop("double_buffer", None)
+        self.throughput = None
+        succeeded = False
         try:
-            session = self._get_session(target, platform, pack, connect_mode, FlashError)
-            with session:
-                file_programmer = FileProgrammer(session, chip_erase="sector")
-                file_programmer.program(source)
+            with self._session(target, platform, pack, connect_mode, FlashError) as session:
+                file_programmer = FileProgrammer(session, **options)
+                with TRACER.span("FlasherPyOCD.program", profile=profile):
+                    with self._double_buffering(session, double_buffer):
+                        start = monotonic()
+                        size = self._program(file_programmer, source)
+                        self._record_throughput(size, monotonic() - start, platform, profile)
+                if verify:
+                    self._verify(session, source)
 
                 if not no_reset:
                     self.logger.debug('Resetting with pyOCD')
                     session.target.reset()
+            succeeded = True
         except FlashError:
             raise
-        except IntelHexError as error:
+        except (HexFormatError, IntelHexError) as error:
             msg = "PyOCD flash failed due to invalid hex file: {}".format(error)
             self.logger.error(msg)
             raise FlashError(message=msg, return_code=EXIT_CODE_PYOCD_USER_ERROR)
@@ -85,24 +160,139 @@ class FlasherPyOCD(object):
             self.logger.error(msg)
             self.logger.error(traceback.format_exc())
             raise FlashError(message=msg, return_code=EXIT_CODE_PYOCD_UNHANDLED_EXCEPTION)
+        finally:
+            if not succeeded:
+                PROGRAMMING_STATISTICS.record(platform, profile, None)
+
+        return EXIT_CODE_SUCCESS
+
+    def _program(self, file_programmer, source):
+        """
+        Program the image. Segments of .hex images are read with parse_hex and added
+        as binary data, which avoids the per byte address map of intelhex.
+        :return: number of data bytes programmed, None if not known
+        """
+        if not isinstance(source, str) or not source.lower().endswith(".hex"):
+            file_programmer.program(source)
+            if isinstance(source, str) and os.path.isfile(source):
+                return os.path.getsize(source)
+            return None
+        size = 0
+        for address, data in parse_hex(source).segments:
+            try:
+                file_programmer.add_file(io.BytesIO(data), file_format="bin",
+                                         base_address=address)
+            except ValueError as error:
+                # Like pyOCD, data outside target memory is ignored for hex images
+                self.logger.warning("Failed to add data chunk: %s", error)
+                continue
+            size += len(data)
+        file_programmer.commit()
+        return size
+
+    def verify(self, source, target, platform=None, pack=None,
+               connect_mode=ConnectMode.ATTACH.value):
+        """Verify target flash contents against an image using pyOCD
+        :param source: flashed .bin or .hex file
+        :param target: mbedls given target dictionary
+        :param platform: target platform, detected from the board if None
+        :param pack: path of pack file
+        :param connect_mode: mode used when connecting
+        :return: 0 if contents match otherwise raises
+        """
+        self.logger.debug('Verifying with pyOCD')
+        try:
+            with self._session(target, platform, pack, connect_mode, FlashError) as session:
+                self._verify(session, source)
+        except FlashError:
+            raise
+        except Exception as error:
+            msg = "PyOCD verify failed unexpectedly: {}".format(error)
+            self.logger.error(msg)
+            self.logger.error(traceback.format_exc())
+            raise FlashError(message=msg, return_code=EXIT_CODE_PYOCD_UNHANDLED_EXCEPTION)
 
         return EXIT_CODE_SUCCESS
 
-    def erase(self, target, no_reset, platform, pack, connect_mode):
+    @TRACER.timed("FlasherPyOCD.verify")
+    def _verify(self, session, source):
+        """
+        Compare flash contents with the image, .bin images start from the boot memory.
+        """
+        boot_memory = session.target.memory_map.get_boot_memory()
+        base_address = boot_memory.start if boot_memory is not None else 0
+        CrcVerifier(session, logger=self.logger).verify(load_image(source, base_address))
+
+    def _record_throughput(self, size, elapsed, platform, profile):
+        """
+        Log programming throughput and store it to PROGRAMMING_STATISTICS.
+        :param size: number of data bytes programmed, None if not known
+        """
+        if size is None:
+            return
+        TRACER.current().set(bytes=size)
+        if not size or elapsed <= 0:
+            return
+        self.throughput = size / elapsed
+        self.logger.info("programmed %d bytes in %.3f seconds (%.1f KiB/s, profile %s)",
+                         size, elapsed, self.throughput / 1024, profile)
+        PROGRAMMING_STATISTICS.record(platform, profile, self.throughput)
+
+    @contextmanager
+    def _double_buffering(self, session, enable):
+        """
+        Double buffering is used when the flash algorithm supports it, it can only be
+        turned off here. The flash objects are restored afterwards, pooled sessions are
+        reused by jobs of other profiles.
+        :param enable: False turns double buffering off, True or None keep the default
+        """
+        if enable is None or enable:
+            yield
+            return
+        self.logger.debug("disabling double buffered programming")
+        flashes = [region.flash for region in session.target.memory_map
+                   if region.is_flash and region.flash is not None]
+        original = [flash.double_buffer_supported for flash in flashes]
+        for flash in flashes:
+            flash.double_buffer_supported = False
+        try:
+            yield
+        finally:
+            for flash, supported in zip(flashes, original):
+                flash.double_buffer_supported = supported
+
+    # pylint: disable=too-many-arguments
+    def erase(self, target, no_reset, platform, pack, connect_mode, ranges=None, image=None,
+              blank_check=False):
         """Erase target using pyOCD
         :param target: mbedls given target dictionary
         :param no_reset: do not reset flashed board at all
         :param platform: target platform
         :param pack: path of pack file
         :param connect_mode: mode used when connecting
+        :param ranges: list of (start, end) address ranges, end exclusive, sectors overlapping
+        them are erased instead of the whole chip
+        :param image: .bin or .hex file, sectors its contents would be written to are erased
+        instead of the whole chip
+        :param blank_check: skip the erase if the flash to be erased is already blank,
+        erase_skipped tells if it was skipped
         :return: 0 if success otherwise raises
         """
         self.logger.debug('Erasing with pyOCD')
+        self.erase_skipped = False
         try:
-            session = self._get_session(target, platform, pack, connect_mode, EraseError)
-            with session:
-                flash_eraser = FlashEraser(session, FlashEraser.Mode.CHIP)
-                flash_eraser.erase()
+            with self._session(target, platform, pack, connect_mode, EraseError) as session:
+                ranges = list(ranges or [])
+                if image:
+                    ranges.extend(self._image_ranges(session, image))
+                if blank_check and self._is_blank(session, ranges):
+                    self.logger.info("flash is already blank, erase skipped")
+                    self.erase_skipped = True
+                elif ranges:
+                    self._erase_sectors(session, ranges)
+                else:
+                    flash_eraser = FlashEraser(session, FlashEraser.Mode.CHIP)
+                    flash_eraser.erase()
 
                 if not no_reset:
                     self.logger.debug('Resetting with pyOCD')
@@ -117,29 +307,182 @@ class FlasherPyOCD(object):
 
         return EXIT_CODE_SUCCESS
 
+    def blank_check(self, target, platform, pack, connect_mode, ranges=None):
+        """Check with pyOCD if target flash is erased
+        :param target: mbedls given target dictionary
+        :param platform: target platform
+        :param pack: path of pack file
+        :param connect_mode: mode used when connecting
+        :param ranges: list of (start, end) address ranges, end exclusive, all flash if None
+        :return: True if the flash is blank otherwise False, raises on failure
+        """
+        try:
+            with self._session(target, platform, pack, connect_mode, EraseError) as session:
+                return self._is_blank(session, ranges)
+        except EraseError:
+            raise
+        except Exception as error:
+            msg = "PyOCD blank check failed unexpectedly: {}".format(error)
+            self.logger.error(msg)
+            raise EraseError(message=msg, return_code=EXIT_CODE_PYOCD_UNHANDLED_EXCEPTION)
+
+    @TRACER.timed("FlasherPyOCD.blank_check")
+    def _is_blank(self, session, ranges):
+        """
+        Compare flash with its erased value using the on-target CRC32 analyzer, flash
+        without analyzer support is read back. Stops at the first block that is not blank.
+        """
+        segments = []
+        for region in session.target.memory_map:
+            if not region.is_flash or region.flash is None:
+                continue
+            erased = bytearray([region.erased_byte_value])
+            for start, end in ranges or [(region.start, region.end + 1)]:
+                low, high = max(start, region.start), min(end, region.end + 1)
+                if low < high:
+                    segments.append((low, bytes(erased * (high - low))))
+        mismatches = CrcVerifier(session, logger=self.logger).compare(segments, first_only=True)
+        if mismatches:
+            self.logger.debug("flash is not blank at 0x%08x", mismatches[0][0])
+        return not mismatches
+
+    @staticmethod
+    def _image_ranges(session, image):
+        """
+        :return: address ranges of the image contents, .bin images start from the boot memory
+        """
+        boot_memory = session.target.memory_map.get_boot_memory()
+        base_address = boot_memory.start if boot_memory is not None else 0
+        return [(address, address + len(data))
+                for address, data in load_image(image, base_address)]
+
+    @TRACER.timed("FlasherPyOCD.erase_sectors")
+    def _erase_sectors(self, session, ranges):
+        """
+        Erase the sectors overlapping the ranges, raise EraseError if a range is not in flash.
+        """
+        memory_map = session.target.memory_map
+        for start, end in ranges:
+            address = start
+            while address < end:
+                region = memory_map.get_region_for_address(address)
+                if region is None or not region.is_flash:
+                    msg = "Erase range 0x{:08x}-0x{:08x} is outside flash: 0x{:08x}".format(
+                        start, end, address)
+                    self.logger.error(msg)
+                    raise EraseError(message=msg, return_code=EXIT_CODE_MISUSE_CMD)
+                address = region.end + 1
+        self.logger.info("erasing sectors of %s", ", ".join(
+            "0x{:08x}-0x{:08x}".format(start, end) for start, end in ranges))
+        FlashEraser(session, FlashEraser.Mode.SECTOR).erase(
+            [(start, end) for start, end in ranges if start < end])
+
+    # pylint: disable=too-many-arguments
+    def reset(self, target, platform=None, pack=None, connect_mode=ConnectMode.ATTACH.value,
+              reset_type=DEFAULT_RESET_TYPE):
+        """Reset target using pyOCD
+        :param target: mbedls given target dictionary
+        :param platform: target platform, pyOCD detects it from the board if None
+        :param pack: path of pack file
+        :param connect_mode: mode used when connecting
+        :param reset_type: hw, sw or emulated
+        :return: 0 if success otherwise raises
+        """
+        self.logger.debug('Resetting with pyOCD (%s)', reset_type)
+        pyocd_reset_type = get_reset_type(reset_type)
+        try:
+            with self._session(target, platform, pack, connect_mode, ResetError) as session:
+                session.target.reset(pyocd_reset_type)
+        except ResetError:
+            raise
+        except Exception as error:
+            msg = "PyOCD reset failed unexpectedly: {}".format(error)
+            self.logger.error(msg)
+            self.logger.error(traceback.format_exc())
+            raise ResetError(message=msg, return_code=EXIT_CODE_PYOCD_UNHANDLED_EXCEPTION)
+
+        return EXIT_CODE_SUCCESS
+
+    # pylint: disable=too-many-arguments
+    @contextmanager
+    def _session(self, target, platform, pack, connect_mode, error_class):
+        """
+        Context manager yielding an open pyOCD session, taken from the session pool if any.
+        The cached probe is dropped if the session can not be opened or the probe fails,
+        not on errors of the operation itself.
+        :param target: mbedls given target dictionary
+        :param platform: target platform
+        :param pack: path of pack file
+        :param connect_mode: mode used when connecting
+        :param error_class: error to be risen on failure
+        """
+        if self.session_pool is None:
+            session = self._get_session(target, platform, pack, connect_mode, error_class)
+            opened = []
+            try:
+                with session:
+                    opened.append(session)
+                    yield session
+            except Exception as error:
+                if not opened or _is_probe_error(error):
+                    PROBE_CACHE.discard(session.probe)
+                raise
+            return
+
+        def opener():
+            return self._get_session(target, platform, pack, connect_mode, error_class)
+
+        unique_id = target['target_id_usb_id']
+        opened = []
+        try:
+            with self.session_pool.session(unique_id,
+                                           (platform, pack, connect_mode),
+                                           opener) as session:
+                opened.append(session)
+                yield session
+        except Exception as error:
+            if not opened or _is_probe_error(error):
+                PROBE_CACHE.invalidate(unique_id)
+            raise
+
+    @TRACER.timed("FlasherPyOCD.session")
     def _get_session(self, target, platform, pack, connect_mode, error_class):
         """
         Internal method for acquiring pyOCD session
         :param target: mbedls given target dictionary
-        :param platform: target platform
+        :param platform: target platform, detected from the board if None
         :param pack: path of pack file
         :param connect_mode: mode used when connecting, one of
         halt, pre-reset, under-reset, attach
         :param error_class: error to be risen on failure
         :return: Session on success, raises AssertionError or error_class on failure
         """
-        assert isinstance(platform, str)
+        assert isinstance(platform, str) or platform is None
         assert isinstance(pack, str) or pack is None
         assert isinstance(connect_mode, str)
 
+        if PACK_CACHE.populate(pack, platform):
+            # Target definition came from the pack cache, pyOCD need not parse the pack
+            self.logger.debug("using cached target definition for %s", platform)
+            pack = None
+
+        unique_id = target['target_id_usb_id']
+        options = dict(target_override=platform,
+                       connect_mode=connect_mode,
+                       resume_on_disconnect=False,
+                       hide_programming_progress=True,
+                       pack=pack)
+
+        probe = PROBE_CACHE.get(unique_id)
+        if probe is not None:
+            # Known probe, skip enumerating every probe on the host
+            self.logger.debug("using cached probe for %s", unique_id)
+            return Session(probe, **options)
+
         session = ConnectHelper.session_with_chosen_probe(
-            unique_id=target['target_id_usb_id'],
+            unique_id=unique_id,
             blocking=False,
-            target_override=platform,
-            connect_mode=connect_mode,
-            resume_on_disconnect=False,
-            hide_programming_progress=True,
-            pack=pack)
+            **options)
 
         if session is None:
             msg = "Did not find pyOCD target: {}".format(target["target_id_usb_id"])
@@ -148,4 +491,5 @@ class FlasherPyOCD(object):
                 message=msg,
                 return_code=EXIT_CODE_COULD_NOT_MAP_TARGET_ID_TO_DEVICE)
 
+        PROBE_CACHE.add(unique_id, session.probe)
         return session
@@ -0,0 +1,168 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import logging
+import zlib
+
+from pyocd.core.exceptions import FlashFailure
+
+from mbed_flasher.common import FlashError, monotonic
+from mbed_flasher.hexfile import parse_hex
+from mbed_flasher.return_codes import EXIT_CODE_VERIFY_FAILED
+
+# The CRC analyzer encodes block address divided by block size in 16 bits
+ANALYZER_MAX_BLOCK_INDEX = 0xFFFF
+
+
+def load_image(source, base_address=0):
+    """
+    Read image contents.
+    :param source: path of .bin or .hex file
+    :param base_address: address of a .bin image
+    :return: list of (address, bytes) segments
+    """
+    if source.lower().endswith(".hex"):
+        return [(address, bytes(data)) for address, data in parse_hex(source).segments]
+
+    with open(source, "rb") as image:
+        return [(base_address, image.read())]
+
+
+def split_blocks(address, size):
+    """
+    Split a range to power of two sized blocks aligned to their size,
+    the layout the on-target CRC analyzer accepts.
+    :param address: start address
+    :param size: range length in bytes
+    :return: list of (address, size)
+    """
+    blocks = []
+    end = address + size
+    while address < end:
+        block = address & -address if address else 1 << (end - address).bit_length()
+        while block > end - address:
+            block >>= 1
+        blocks.append((address, block))
+        address += block
+    return blocks
+
+
+def _clip(segments, start, end):
+    """
+    :return: parts of the segments within [start, end)
+    """
+    clipped = []
+    for address, data in segments:
+        low = max(address, start)
+        high = min(address + len(data), end)
+        if low < high:
+            clipped.append((low, data[low - address:high - address]))
+    return clipped
+
+
+class CrcVerifier(object):
+    """
+    Verify programmed flash by comparing CRC32 computed on the target with host CRC32.
+    Blocks the analyzer can not address and flash without analyzer support are read back.
+    """
+    def __init__(self, session, logger=None):
+        """
+        :param session: open pyOCD session
+        :param logger: logger object
+        """
+        self.logger = logger if logger else logging.getLogger("mbed-flasher")
+        self.session = session
+        self.mismatches = []
+
+    def verify(self, segments):
+        """
+        :param segments: list of (address, bytes) that were programmed
+        :return: None if contents match, raises FlashError otherwise
+        """
+        start = monotonic()
+        self.compare(segments)
+        verified = sum(len(data) for _, data in self._flash_segments(segments))
+        self.logger.info("verified %d bytes in %.3f seconds", verified, monotonic() - start)
+        if self.mismatches:
+            addresses = ", ".join("0x{:08x}".format(address) for address, _ in self.mismatches)
+            msg = "Verification failed, flash contents differ at {}".format(addresses)
+            self.logger.error(msg)
+            raise FlashError(message=msg, return_code=EXIT_CODE_VERIFY_FAILED)
+
+    def compare(self, segments, first_only=False):
+        """
+        :param segments: list of (address, bytes) expected in flash, data outside flash
+        regions is ignored
+        :param first_only: stop at the first block that differs
+        :return: list of (address, size) of blocks that differ
+        """
+        self.mismatches = []
+        for region in self.session.target.memory_map:
+            if not region.is_flash or region.flash is None:
+                continue
+            region_segments = _clip(segments, region.start, region.end + 1)
+            if region_segments:
+                self._verify_region(region.flash, region_segments, first_only)
+                if first_only and self.mismatches:
+                    break
+        return self.mismatches
+
+    def _flash_segments(self, segments):
+        flash_segments = []
+        for region in self.session.target.memory_map:
+            if region.is_flash and region.flash is not None:
+                flash_segments.extend(_clip(segments, region.start, region.end + 1))
+        return flash_segments
+
+    def _verify_region(self, flash, segments, first_only=False):
+        crc_blocks = []
+        read_blocks = []
+        for address, data in segments:
+            for block_address, size in split_blocks(address, len(data)):
+                offset = block_address - address
+                block = (block_address, size, bytes(data[offset:offset + size]))
+                if flash.use_analyzer and block_address // size <= ANALYZER_MAX_BLOCK_INDEX:
+                    crc_blocks.append(block)
+                else:
+                    read_blocks.append(block)
+
+        try:
+            flash.init(flash.Operation.VERIFY)
+        except FlashFailure:
+            # Not all algorithms implement verify init
+            flash.init(flash.Operation.ERASE)
+        try:
+            if crc_blocks:
+                self._compare_crcs(flash, crc_blocks, first_only)
+            for address, size, data in read_blocks:
+                if first_only and self.mismatches:
+                    break
+                if bytes(bytearray(self.session.target.read_memory_block8(address, size))) != data:
+                    self.mismatches.append((address, size))
+        finally:
+            flash.cleanup()
+
+    def _compare_crcs(self, flash, blocks, first_only=False):
+        # Commands are written to the first page buffer, one word each
+        batch = max(1, flash.get_page_info(blocks[0][0]).size // 4)
+        for index in range(0, len(blocks), batch):
+            if first_only and self.mismatches:
+                return
+            chunk = blocks[index:index + batch]
+            crcs = flash.compute_crcs([(address, size) for address, size, _ in chunk])
+            for (address, size, data), crc in zip(chunk, crcs):
+                if zlib.crc32(data) & 0xFFFFFFFF != crc:
+                    self.mismatches.append((address, size))
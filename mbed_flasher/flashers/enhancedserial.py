@@ -12,14 +12,37 @@ like found in the telnetlib.
 """
 import re
 from time import sleep
-import pkg_resources
+import serial
 from serial import Serial, SerialException, SerialTimeoutException
 
+RE_FLOAT = re.compile(r"^\d+\.\d+")
+BREAK_DURATION = 0.25
+
+
+def _parse_pyserial_version(pyserial_version):
+    """! Parse pyserial module version
+    @return Returns float with pyserial module number
+    """
+    version = 3.0
+    match = RE_FLOAT.search(pyserial_version)
+    if match:
+        try:
+            version = float(match.group(0))
+        except ValueError:
+            version = 3.0   # We will assume you've got latest (3.0+)
+    return version
+
+
+# Resolved once at import, serial ports are opened for every reset
+PYSERIAL_VERSION = _parse_pyserial_version(getattr(serial, "VERSION", "3.0"))
+
 
 class EnhancedSerial(Serial): # pylint: disable=too-many-ancestors, too-many-instance-attributes
     '''
     EnhancedSerial module
     '''
+    re_float = RE_FLOAT
+
     def __init__(self, *args, **kwargs):
         # ensure that a reasonable timeout is set
         timeout = kwargs.get('timeout', 0.1)
@@ -28,34 +51,26 @@ class EnhancedSerial(Serial): # pylint: disable=too-many-ancestors, too-many-ins
         kwargs['timeout'] = timeout
         Serial.__init__(self, *args, **kwargs)
         self.buf = ''
-        self.pyserial_version = self.get_pyserial_version()
+        self.pyserial_version = PYSERIAL_VERSION
         self.is_pyserial_v3 = self.pyserial_version >= 3.0
 
-    def get_pyserial_version(self):
+    @staticmethod
+    def get_pyserial_version():
         """! Retrieve pyserial module version
         @return Returns float with pyserial module number
         """
-        # pylint: disable = anomalous-backslash-in-string
-        self.re_float = re.compile("^\d+\.\d+")
-        pyserial_version = pkg_resources.require("pyserial")[0].version
-        version = 3.0
-        match = self.re_float.search(pyserial_version)
-        if match:
-            try:
-                version = float(match.group(0))
-            except ValueError:
-                version = 3.0   # We will assume you've got latest (3.0+)
-        return version
+        return PYSERIAL_VERSION
 
-    def safe_send_break(self):
+    def safe_send_break(self, duration=BREAK_DURATION):
         """! Closure for pyserial version dependant API calls
+        @param duration Seconds the break condition is held
         """
         if self.is_pyserial_v3:
-            return self._safe_send_break_v3_0()
-        return self._safe_send_break_v2_7()
+            return self._safe_send_break_v3_0(duration)
+        return self._safe_send_break_v2_7(duration)
 
     # pylint: disable=bare-except
-    def _safe_send_break_v2_7(self):
+    def _safe_send_break_v2_7(self, duration=BREAK_DURATION):
         """! pyserial 2.7 API implementation of sendBreak/setBreak
         @details
         Below API is deprecated for pyserial 3.x versions!
@@ -64,20 +79,19 @@ class EnhancedSerial(Serial): # pylint: disable=too-many-ancestors, too-many-ins
         """
         result = True
         try:
-            self.sendBreak()
+            self.sendBreak(duration)
         except:
             # In Linux a termios.error is raised in sendBreak and in setBreak.
             # The following setBreak() is needed to release the reset signal on the
             # target mcu.
             try:
-                sleep(1)
+                sleep(duration)
                 self.setBreak(False)
-                sleep(1)
             except:
                 result = False
         return result
 
-    def _safe_send_break_v3_0(self):
+    def _safe_send_break_v3_0(self, duration=BREAK_DURATION):
         """! pyserial 3.x API implementation of send_brea / break_condition
         @details
         http://pyserial.readthedocs.org/en/latest/pyserial_api.html#serial.Serial.send_break
@@ -85,7 +99,7 @@ class EnhancedSerial(Serial): # pylint: disable=too-many-ancestors, too-many-ins
         """
         result = True
         try:
-            self.send_break()
+            self.send_break(duration)
         except:
             # In Linux a termios.error is raised in sendBreak and in setBreak.
             # The following break_condition = False is needed to release the reset signal
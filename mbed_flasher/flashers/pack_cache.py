@@ -0,0 +1,242 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+
+import appdirs
+from pyocd.core import memory_map
+from pyocd.target import TARGET
+from pyocd.target.pack.cmsis_pack import CmsisPack
+from pyocd.target.pack.flash_algo import PackFlashAlgo
+from pyocd.target.pack.pack_target import PackTargets
+
+PACK_CACHE_DIR = os.path.join(appdirs.user_cache_dir("mbed-flasher", "ARM"), "packs")
+PACK_CACHE_FORMAT = 1
+PACK_HASH_CHUNK = 1024 * 1024
+
+REGION_CLASSES = {
+    "FLASH": memory_map.FlashRegion,
+    "RAM": memory_map.RamRegion,
+    "ROM": memory_map.RomRegion,
+}
+
+
+def normalise_target_name(name):
+    """
+    Normalise target name the way pyOCD does for TARGET lookups.
+    :param name: target or part name
+    :return: lower case name with non alphanumeric runs replaced by underscore
+    """
+    return re.sub(r"[^a-z0-9]+", "_", name.lower())
+
+
+def pack_digest(pack_path):
+    """
+    :param pack_path: path of pack file
+    :return: sha1 hex digest of the pack file
+    """
+    digest = hashlib.sha1()
+    with open(pack_path, "rb") as pack_file:
+        for chunk in iter(lambda: pack_file.read(PACK_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _json_attributes(region):
+    """
+    Region attributes that can be stored, object valued attributes are rebuilt on load.
+    """
+    attributes = {}
+    for key, value in getattr(region, "attributes", {}).items():
+        if isinstance(value, (bool, int, float, str)) or value is None:
+            attributes[key] = value
+    attributes.update({"name": region.name, "start": region.start, "length": region.length})
+    attributes.pop("end", None)
+    return attributes
+
+
+class CachedPackDevice(object):
+    """
+    Target definition hydrated from the pack cache, used in place of pyOCD CmsisPackDevice.
+    """
+    def __init__(self, definition, algos):
+        self.part_number = definition["part_number"]
+        self.vendor = definition["vendor"]
+        self.families = definition["families"]
+        self.svd = None
+        self._regions = definition["regions"]
+        self._algos = algos
+
+    @property
+    def memory_map(self):
+        """
+        :return: new MemoryMap, the target owns and modifies the map it is given
+        """
+        regions = []
+        for region in self._regions:
+            attributes = dict(region["attributes"])
+            if region["algo"] is not None:
+                attributes["flm"] = PackFlashAlgo(io.BytesIO(self._algos[region["algo"]]))
+            regions.append(REGION_CLASSES[region["type"]](**attributes))
+        return memory_map.MemoryMap(regions)
+
+
+class PackCache(object):
+    """
+    On-disk cache of target definitions parsed from CMSIS packs,
+    keyed by pack file hash and target name.
+    """
+    def __init__(self, cache_dir=PACK_CACHE_DIR, logger=None):
+        self.logger = logger if logger else logging.getLogger("mbed-flasher")
+        self.cache_dir = cache_dir
+
+    def _entry_dir(self, digest, target_name):
+        return os.path.join(self.cache_dir, digest, normalise_target_name(target_name))
+
+    def get(self, pack_path, target_name):
+        """
+        Return the cached target definition, parsing the pack and filling the cache on a miss.
+        :param pack_path: path of pack file
+        :param target_name: target part name
+        :return: CachedPackDevice, None if the pack does not define the target
+        """
+        entry_dir = self._entry_dir(pack_digest(pack_path), target_name)
+        device = self._load(entry_dir)
+        if device is None:
+            self.logger.debug("pack cache miss for %s in %s", target_name, pack_path)
+            self._store(pack_path, target_name, entry_dir)
+            device = self._load(entry_dir)
+        return device
+
+    @staticmethod
+    def _load(entry_dir):
+        try:
+            with open(os.path.join(entry_dir, "device.json"), "r") as definition_file:
+                definition = json.load(definition_file)
+            if definition.get("format") != PACK_CACHE_FORMAT:
+                return None
+            algos = {}
+            for name in set(region["algo"] for region in definition["regions"]):
+                if name is not None:
+                    with open(os.path.join(entry_dir, name), "rb") as algo_file:
+                        algos[name] = algo_file.read()
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+        return CachedPackDevice(definition, algos)
+
+    @staticmethod
+    def _algorithms(pack, device):
+        """
+        :return: list of (start, end, blob) of the flash algorithms of the device
+        """
+        algos = []
+        for element in device._info.algos:  # pylint: disable=protected-access
+            blob = pack.get_file(element.attrib["name"]).read()
+            algo = PackFlashAlgo(io.BytesIO(blob))
+            algos.append((algo.flash_start, algo.flash_start + algo.flash_size, blob))
+        return algos
+
+    @staticmethod
+    def _regions(device, algos):
+        """
+        Flash algorithms are matched to regions by the address range they program.
+        :param algos: list from _algorithms
+        :return: tuple of list of region definitions and dictionary of algorithm blobs
+        by file name
+        """
+        regions = []
+        blobs = {}
+        for region in device.memory_map:
+            type_name = region.type.name
+            if type_name not in REGION_CLASSES:
+                continue
+            algo_name = None
+            if type_name == "FLASH":
+                for index, (start, end, blob) in enumerate(algos):
+                    if start <= region.start < end:
+                        algo_name = "algo{}.flm".format(index)
+                        blobs[algo_name] = blob
+                        break
+            regions.append({"type": type_name, "algo": algo_name,
+                            "attributes": _json_attributes(region)})
+        return regions, blobs
+
+    @staticmethod
+    def _write_entry(entry_dir, definition, blobs):
+        # Write to a temporary directory first so readers never see a partial entry
+        parent = os.path.dirname(entry_dir)
+        if not os.path.isdir(parent):
+            os.makedirs(parent)
+        tmp_dir = tempfile.mkdtemp(dir=parent)
+        for name, blob in blobs.items():
+            with open(os.path.join(tmp_dir, name), "wb") as algo_file:
+                algo_file.write(blob)
+        with open(os.path.join(tmp_dir, "device.json"), "w") as definition_file:
+            json.dump(definition, definition_file)
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # Another process stored the same entry first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _store(self, pack_path, target_name, entry_dir):
+        pack = CmsisPack(pack_path)
+        wanted = normalise_target_name(target_name)
+        devices = [dev for dev in pack.devices
+                   if normalise_target_name(dev.part_number) == wanted]
+        if not devices:
+            return
+        device = devices[0]
+
+        regions, blobs = self._regions(device, self._algorithms(pack, device))
+        definition = {"format": PACK_CACHE_FORMAT,
+                      "part_number": device.part_number,
+                      "vendor": device.vendor,
+                      "families": list(device.families),
+                      "regions": regions}
+        self._write_entry(entry_dir, definition, blobs)
+
+    def populate(self, pack_path, target_name):
+        """
+        Add the target defined in the pack to pyOCD targets from the cache.
+        :param pack_path: path of pack file
+        :param target_name: target part name
+        :return: True if the target is available without passing the pack to pyOCD
+        """
+        if not pack_path or not target_name or not os.path.isfile(pack_path):
+            return False
+
+        # pylint: disable=broad-except
+        try:
+            device = self.get(pack_path, target_name)
+            if device is None:
+                return False
+            PackTargets.populate_device(device)
+        except Exception as error:
+            self.logger.debug("pack cache not used for %s: %s", target_name, error)
+            return False
+
+        return normalise_target_name(target_name) in TARGET or target_name.lower() in TARGET
+
+
+PACK_CACHE = PackCache()
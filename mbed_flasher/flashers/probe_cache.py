@@ -0,0 +1,115 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import logging
+import os
+import threading
+
+from mbed_flasher.common import monotonic
+
+PROBE_CACHE_TTL = 30
+USB_DEVICES_PATH = "/sys/bus/usb/devices"
+
+
+def usb_topology(path=USB_DEVICES_PATH):
+    """
+    Snapshot of attached USB devices, changes when a device is plugged or unplugged.
+    :param path: sysfs USB devices directory
+    :return: tuple of device names, None where sysfs is not available
+    """
+    try:
+        return tuple(sorted(os.listdir(path)))
+    except OSError:
+        return None
+
+
+class ProbeCache(object):
+    """
+    Debug probes found by earlier pyOCD sessions, keyed by unique id.
+    Lets a session be opened on the wanted probe without enumerating all probes.
+    The cache is cleared after ttl seconds and when the USB topology changes.
+    """
+    def __init__(self, ttl=PROBE_CACHE_TTL, logger=None):
+        """
+        :param ttl: seconds a cached probe is trusted, 0 disables the cache
+        :param logger: logger object
+        """
+        self.logger = logger if logger else logging.getLogger("mbed-flasher")
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._probes = {}
+        self._topology = None
+        self._filled = None
+
+    def _expire(self):
+        topology = usb_topology()
+        now = monotonic()
+        if self._filled is not None and (now - self._filled > self.ttl or
+                                         topology != self._topology):
+            self.logger.debug("probe cache expired")
+            self._probes.clear()
+            self._filled = None
+        return topology, now
+
+    def get(self, unique_id):
+        """
+        :param unique_id: probe unique id, target_id_usb_id
+        :return: cached DebugProbe or None
+        """
+        with self._lock:
+            self._expire()
+            return self._probes.get(unique_id)
+
+    def add(self, unique_id, probe):
+        """
+        Store the probe of a session that was opened by enumerating probes.
+        :param unique_id: probe unique id the probe was chosen with
+        :param probe: pyOCD DebugProbe
+        """
+        probe_id = getattr(probe, "unique_id", None)
+        if not self.ttl or not isinstance(probe_id, str) or unique_id not in probe_id:
+            return
+        with self._lock:
+            topology, now = self._expire()
+            if self._filled is None:
+                self._topology = topology
+                self._filled = now
+            self._probes[unique_id] = probe
+
+    def discard(self, probe):
+        """
+        Forget a probe, e.g. after a session on it failed.
+        :param probe: pyOCD DebugProbe
+        """
+        with self._lock:
+            for unique_id, cached in list(self._probes.items()):
+                if cached is probe:
+                    del self._probes[unique_id]
+
+    def invalidate(self, unique_id=None):
+        """
+        Forget the probe of one unique id, or all probes.
+        :param unique_id: probe unique id, None clears the cache
+        """
+        with self._lock:
+            if unique_id is None:
+                self._probes.clear()
+                self._filled = None
+            else:
+                self._probes.pop(unique_id, None)
+
+
+PROBE_CACHE = ProbeCache()
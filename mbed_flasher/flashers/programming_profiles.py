@@ -0,0 +1,100 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from mbed_flasher.common import FlashError
+from mbed_flasher.return_codes import EXIT_CODE_MISUSE_CMD
+from mbed_flasher.statistics import OperationStatistics
+
+DEFAULT_PROFILE = "safe"
+PROGRAMMING_STATISTICS_SIZE = 100
+
+# chip_erase, smart_flash, trust_crc and keep_unwritten are passed to pyOCD FileProgrammer,
+# double_buffer is applied to the flash builders of the session.
+PROGRAMMING_PROFILES = {
+    # Erase and program every sector touched by the image
+    "safe": {"chip_erase": "sector"},
+    # Let pyOCD pick chip or sector erase and skip pages whose contents already match
+    "fast": {"chip_erase": "auto", "smart_flash": True, "double_buffer": True},
+    # Also trust page CRCs without reading back and erase unwritten parts of sectors
+    "max": {"chip_erase": "auto", "smart_flash": True, "trust_crc": True,
+            "keep_unwritten": False, "double_buffer": True},
+}
+
+CHIP_ERASE_VALUES = ("sector", "chip", "auto")
+BOOLEAN_OPTIONS = ("smart_flash", "trust_crc", "keep_unwritten", "double_buffer")
+BOOLEAN_VALUES = {"true": True, "1": True, "yes": True, "on": True,
+                  "false": False, "0": False, "no": False, "off": False}
+
+
+def _misuse(message):
+    return FlashError(message=message, return_code=EXIT_CODE_MISUSE_CMD)
+
+
+def parse_program_option(option):
+    """
+    Parse raw programming option.
+    :param option: string KEY=VALUE, e.g. chip_erase=auto or trust_crc=true
+    :return: tuple (key, value), raises FlashError for unknown keys or values
+    """
+    key, separator, value = option.partition("=")
+    key = key.strip().replace("-", "_")
+    value = value.strip().lower()
+    if not separator:
+        raise _misuse("Programming option {} is not KEY=VALUE".format(option))
+
+    if key == "chip_erase":
+        if value not in CHIP_ERASE_VALUES:
+            raise _misuse("chip_erase must be one of {}".format(", ".join(CHIP_ERASE_VALUES)))
+        return key, value
+
+    if key in BOOLEAN_OPTIONS:
+        if value not in BOOLEAN_VALUES:
+            raise _misuse("{} must be true or false".format(key))
+        return key, BOOLEAN_VALUES[value]
+
+    raise _misuse("Unknown programming option {}".format(key))
+
+
+def get_programming_options(profile=None, options=None):
+    """
+    Combine named profile and raw options, raw options take precedence.
+    :param profile: one of PROGRAMMING_PROFILES keys, DEFAULT_PROFILE if None
+    :param options: dictionary or list of KEY=VALUE strings
+    :return: dictionary of programming options
+    """
+    profile = DEFAULT_PROFILE if profile is None else profile
+    if profile not in PROGRAMMING_PROFILES:
+        raise _misuse("Programming profile {} not supported".format(profile))
+
+    result = dict(PROGRAMMING_PROFILES[profile])
+    if isinstance(options, dict):
+        options = ["{}={}".format(key, value) for key, value in options.items()]
+    for option in options or []:
+        key, value = parse_program_option(option)
+        result[key] = value
+    return result
+
+
+class ProgrammingStatistics(OperationStatistics):
+    """
+    Latest programming throughputs in bytes per second and failures per platform and
+    profile, the fastest profile has the highest median throughput.
+    """
+    def __init__(self, size=PROGRAMMING_STATISTICS_SIZE):
+        OperationStatistics.__init__(self, size, higher_is_better=True)
+
+
+PROGRAMMING_STATISTICS = ProgrammingStatistics()
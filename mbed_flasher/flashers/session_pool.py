@@ -0,0 +1,182 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import atexit
+from contextlib import contextmanager
+import logging
+import threading
+
+from mbed_flasher.common import monotonic
+
+SESSION_IDLE_TIMEOUT = 60
+
+
+# pylint: disable=too-few-public-methods
+class _PooledSession(object):
+    """
+    Pool entry, the lock serializes operations on one probe.
+    """
+    def __init__(self, session, options):
+        self.session = session
+        self.options = options
+        self.lock = threading.Lock()
+        self.last_used = monotonic()
+        self.closed = False
+
+
+class SessionPool(object):
+    """
+    Open pyOCD sessions keyed by probe unique id, reused by back-to-back operations.
+    """
+    def __init__(self, idle_timeout=SESSION_IDLE_TIMEOUT, logger=None):
+        """
+        :param idle_timeout: seconds an unused session is kept open
+        :param logger: logger object
+        """
+        self.logger = logger if logger else logging.getLogger("mbed-flasher")
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._entries = {}
+        atexit.register(self.close_all)
+
+    @contextmanager
+    def session(self, unique_id, options, opener):
+        """
+        Context manager yielding an open session for the probe.
+        A session that raised is closed instead of being returned to the pool.
+        :param unique_id: probe unique id, target_id_usb_id
+        :param options: hashable connect options, a session opened with other options is replaced
+        :param opener: callable returning a new unopened session
+        """
+        entry = self._acquire(unique_id, options, opener)
+        try:
+            yield entry.session
+        except BaseException:
+            self._discard(unique_id, entry)
+            entry.lock.release()
+            raise
+        entry.last_used = monotonic()
+        entry.lock.release()
+
+    def _acquire(self, unique_id, options, opener):
+        self.evict_idle()
+        while True:
+            with self._lock:
+                entry = self._entries.get(unique_id)
+                if entry is None:
+                    entry = _PooledSession(None, options)
+                    # Held by the caller until its session() block exits, not within this function
+                    entry.lock.acquire()  # pylint: disable=consider-using-with
+                    self._entries[unique_id] = entry
+                    break
+
+            entry.lock.acquire()
+            if entry.closed:
+                # Replaced while waiting, look it up again
+                entry.lock.release()
+                continue
+
+            if entry.options == options and self.is_healthy(entry.session):
+                self.logger.debug("reusing pyOCD session for %s", unique_id)
+                return entry
+
+            self.logger.debug("replacing pyOCD session for %s", unique_id)
+            self._discard(unique_id, entry)
+            entry.lock.release()
+
+        try:
+            session = opener()
+            session.open()
+        except BaseException:
+            self._discard(unique_id, entry)
+            entry.lock.release()
+            raise
+
+        entry.session = session
+        return entry
+
+    def _discard(self, unique_id, entry):
+        with self._lock:
+            if self._entries.get(unique_id) is entry:
+                del self._entries[unique_id]
+        entry.closed = True
+        if entry.session is not None:
+            self._close_session(entry.session)
+
+    def _close_session(self, session):
+        # pylint: disable=broad-except
+        try:
+            session.close()
+        except Exception as error:
+            self.logger.warning("closing pyOCD session failed: %s", error)
+
+    @staticmethod
+    def is_healthy(session):
+        """
+        Check that the session and its probe are still usable.
+        :param session: pyOCD session
+        :return: boolean
+        """
+        # pylint: disable=broad-except
+        try:
+            if not getattr(session, "is_open", True):
+                return False
+            probe = getattr(session, "probe", None)
+            if probe is not None and not getattr(probe, "is_open", True):
+                return False
+            session.target.get_state()
+        except Exception:
+            return False
+        return True
+
+    def evict_idle(self):
+        """
+        Close sessions that have not been used within idle_timeout.
+        """
+        now = monotonic()
+        with self._lock:
+            idle = [(unique_id, entry) for unique_id, entry in self._entries.items()
+                    if now - entry.last_used > self.idle_timeout]
+
+        for unique_id, entry in idle:
+            if not entry.lock.acquire(False):
+                continue
+            if now - entry.last_used > self.idle_timeout and not entry.closed:
+                self.logger.debug("closing idle pyOCD session for %s", unique_id)
+                self._discard(unique_id, entry)
+            entry.lock.release()
+
+    def close(self, unique_id):
+        """
+        Close the session of one probe, waits for an ongoing operation.
+        :param unique_id: probe unique id
+        """
+        with self._lock:
+            entry = self._entries.get(unique_id)
+        if entry is None:
+            return
+        with entry.lock:
+            if not entry.closed:
+                self._discard(unique_id, entry)
+
+    def close_all(self):
+        """
+        Close all sessions.
+        """
+        with self._lock:
+            unique_ids = list(self._entries)
+        for unique_id in unique_ids:
+            self.close(unique_id)
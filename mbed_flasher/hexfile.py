@@ -0,0 +1,193 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import binascii
+
+HEX_RECORD_DATA = 0
+HEX_RECORD_EOF = 1
+HEX_RECORD_EXTENDED_SEGMENT = 2
+HEX_RECORD_START_SEGMENT = 3
+HEX_RECORD_EXTENDED_LINEAR = 4
+HEX_RECORD_START_LINEAR = 5
+
+# Start code and five bytes: length, address, type and checksum
+HEX_RECORD_MIN_LENGTH = 11
+# Lines decoded with one unhexlify call
+HEX_BATCH_LINES = 4096
+HEX_WRITE_RECORD_SIZE = 32
+
+
+class HexFormatError(ValueError):
+    """
+    Raised for a malformed Intel HEX file, the message tells the line.
+    """
+
+
+class HexImage(object):
+    """
+    Contents of an Intel HEX file as contiguous segments.
+    """
+    def __init__(self, segments, start_record=None):
+        """
+        :param segments: list of (address, bytearray) sorted by address, not overlapping
+        :param start_record: (record type, data) of the start address record or None
+        """
+        self.segments = segments
+        self.start_record = start_record
+
+    @property
+    def size(self):
+        """
+        :return: number of data bytes
+        """
+        return sum(len(data) for _, data in self.segments)
+
+
+def _error(number, reason):
+    raise HexFormatError("line {}: {}".format(number, reason))
+
+
+# pylint: disable=too-many-locals, too-many-branches
+def parse_hex(path):
+    """
+    Parse an Intel HEX file. Lines are decoded a batch at a time and consecutive data
+    records are appended to bytearray segments, no per byte work is done in Python.
+    :param path: .hex file
+    :return: HexImage
+    :raises HexFormatError: on a syntax, length or checksum error, overlapping data
+    or missing end of file record
+    """
+    with open(path, "rb") as hex_file:
+        lines = hex_file.read().split()
+
+    segments = []
+    segment = None
+    segment_end = None
+    offset = 0
+    start_record = None
+    for first in range(0, len(lines), HEX_BATCH_LINES):
+        batch = lines[first:first + HEX_BATCH_LINES]
+        joined = b"".join(batch)
+        if joined.count(b":") != len(batch):
+            for number, line in enumerate(batch, first + 1):
+                if line[:1] != b":" or line.count(b":") != 1:
+                    _error(number, "not a hex record")
+        try:
+            decoded = bytearray(binascii.unhexlify(joined.replace(b":", b"")))
+        except (TypeError, ValueError):
+            for number, line in enumerate(batch, first + 1):
+                try:
+                    binascii.unhexlify(line[1:])
+                except (TypeError, ValueError):
+                    _error(number, "not a hex record")
+
+        position = 0
+        for number, line in enumerate(batch, first + 1):
+            if len(line) < HEX_RECORD_MIN_LENGTH:
+                _error(number, "wrong record length")
+            length = decoded[position]
+            end = position + length + 5
+            if len(line) != 2 * (length + 5) + 1:
+                _error(number, "wrong record length")
+            if sum(decoded[position:end]) & 0xFF:
+                _error(number, "checksum mismatch")
+            record_type = decoded[position + 3]
+            if record_type == HEX_RECORD_DATA:
+                address = offset + (decoded[position + 1] << 8 | decoded[position + 2])
+                if address == segment_end:
+                    segment += decoded[position + 4:end - 1]
+                else:
+                    segment = decoded[position + 4:end - 1]
+                    segments.append((address, segment))
+                segment_end = address + length
+            elif record_type == HEX_RECORD_EXTENDED_LINEAR:
+                offset = (decoded[position + 4] << 8 | decoded[position + 5]) << 16
+            elif record_type == HEX_RECORD_EXTENDED_SEGMENT:
+                offset = (decoded[position + 4] << 8 | decoded[position + 5]) << 4
+            elif record_type in (HEX_RECORD_START_SEGMENT, HEX_RECORD_START_LINEAR):
+                start_record = (record_type, bytes(decoded[position + 4:end - 1]))
+            elif record_type == HEX_RECORD_EOF:
+                return HexImage(merge_segments(segments), start_record)
+            else:
+                _error(number, "unknown record type {}".format(record_type))
+            position = end
+
+    raise HexFormatError("end of file record missing")
+
+
+def merge_segments(segments):
+    """
+    :param segments: list of (address, bytearray) in any order
+    :return: list of (address, bytearray) sorted by address, adjacent segments joined
+    :raises HexFormatError: if segments overlap
+    """
+    merged = []
+    for address, data in sorted(segments, key=lambda segment: segment[0]):
+        if not data:
+            continue
+        if merged:
+            previous_address, previous = merged[-1]
+            previous_end = previous_address + len(previous)
+            if address < previous_end:
+                raise HexFormatError("data at 0x{:08x} overlaps data at 0x{:08x}".format(
+                    address, previous_address))
+            if address == previous_end:
+                merged[-1] = (previous_address, previous + data)
+                continue
+        merged.append((address, bytearray(data)))
+    return merged
+
+
+def _record(record_type, address, data):
+    record = bytearray([len(data), address >> 8 & 0xFF, address & 0xFF, record_type])
+    record += data
+    record.append(-sum(record) & 0xFF)
+    return b":" + binascii.hexlify(bytes(record)).upper() + b"\n"
+
+
+def write_hex(path, segments, start_record=None):
+    """
+    Write segments as an Intel HEX file.
+    :param path: .hex file
+    :param segments: list of (address, bytes)
+    :param start_record: (record type, data) of the start address record or None
+    """
+    records = []
+    upper = None
+    for address, data in segments:
+        for chunk in range(0, len(data), HEX_WRITE_RECORD_SIZE):
+            chunk_address = address + chunk
+            # Records do not cross 64 KiB boundaries
+            size = min(HEX_WRITE_RECORD_SIZE, len(data) - chunk,
+                       0x10000 - (chunk_address & 0xFFFF))
+            if chunk_address >> 16 != upper:
+                upper = chunk_address >> 16
+                records.append(_record(HEX_RECORD_EXTENDED_LINEAR, 0,
+                                       bytearray([upper >> 8, upper & 0xFF])))
+            records.append(_record(HEX_RECORD_DATA, chunk_address & 0xFFFF,
+                                   data[chunk:chunk + size]))
+            if size < HEX_WRITE_RECORD_SIZE and size < len(data) - chunk:
+                # Rest of the chunk is on the next 64 KiB page
+                remaining = data[chunk + size:chunk + HEX_WRITE_RECORD_SIZE]
+                upper = (chunk_address + size) >> 16
+                records.append(_record(HEX_RECORD_EXTENDED_LINEAR, 0,
+                                       bytearray([upper >> 8, upper & 0xFF])))
+                records.append(_record(HEX_RECORD_DATA, 0, remaining))
+    if start_record is not None:
+        records.append(_record(start_record[0], 0, bytearray(start_record[1])))
+    records.append(_record(HEX_RECORD_EOF, 0, bytearray()))
+    with open(path, "wb") as hex_file:
+        hex_file.write(b"".join(records))
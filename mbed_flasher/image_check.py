@@ -0,0 +1,186 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import logging
+import os
+import struct
+
+import six
+from pyocd.board.board_ids import BOARD_ID_TO_INFO
+from pyocd.target import TARGET
+
+from mbed_flasher.common import FlashError
+from mbed_flasher.flashers.pack_cache import PACK_CACHE
+from mbed_flasher.hexfile import HexFormatError, parse_hex
+from mbed_flasher.return_codes import EXIT_CODE_IMAGE_CORRUPTED
+from mbed_flasher.return_codes import EXIT_CODE_IMAGE_OUT_OF_RANGE
+from mbed_flasher.return_codes import EXIT_CODE_IMAGE_INVALID_VECTOR_TABLE
+from mbed_flasher.timings import TRACER
+
+# Initial stack pointer and reset handler
+VECTOR_TABLE_HEAD = 8
+ERASED_WORD = 0xFFFFFFFF
+# Other allowed files, e.g. DAPLink .cfg and .act files, are not firmware images
+IMAGE_EXTENSIONS = (".bin", ".hex")
+
+
+def _fail(message, return_code, logger):
+    logger.error(message)
+    raise FlashError(message=message, return_code=return_code)
+
+
+def merge_ranges(records):
+    """
+    :param records: list of (address, bytes)
+    :return: sorted list of (start, end) address ranges, end exclusive
+    """
+    ranges = []
+    for address, data in sorted(records, key=lambda record: record[0]):
+        end = address + len(data)
+        if ranges and address <= ranges[-1][1]:
+            ranges[-1] = (ranges[-1][0], max(end, ranges[-1][1]))
+        elif data:
+            ranges.append((address, end))
+    return ranges
+
+
+def image_head(records, size=VECTOR_TABLE_HEAD):
+    """
+    :param records: list of (address, bytes)
+    :param size: number of bytes wanted
+    :return: up to size contiguous bytes from the lowest address of the image
+    """
+    head = b""
+    address = None
+    for record_address, data in sorted(records, key=lambda record: record[0]):
+        if address is None:
+            address = record_address
+        if record_address > address + len(head) or len(head) >= size:
+            break
+        head += data[address + len(head) - record_address:]
+    return head[:size]
+
+
+def target_memory_map(target_id=None, platform=None, pack=None):
+    """
+    Memory map of the target, from the pyOCD target or the pack, or from the board id
+    in the target id.
+    :param target_id: target id, first four characters are the board id
+    :param platform: pyOCD target name
+    :param pack: path of pack file defining the target
+    :return: pyOCD MemoryMap, None if the target is not known
+    """
+    if platform:
+        if pack:
+            try:
+                device = PACK_CACHE.get(pack, platform)
+            except (IOError, OSError):
+                # Flashing reports the unreadable pack
+                return None
+            return device.memory_map if device else None
+        target_class = TARGET.get(platform.lower())
+        return target_class.MEMORY_MAP if target_class else None
+    if isinstance(target_id, six.string_types):
+        board = BOARD_ID_TO_INFO.get(target_id[:4].upper())
+        target_class = TARGET.get(board.target) if board else None
+        return target_class.MEMORY_MAP if target_class else None
+    return None
+
+
+def boot_address(memory_map):
+    """
+    :param memory_map: pyOCD MemoryMap or None
+    :return: start of the boot memory, where .bin images are placed, 0 if not known
+    """
+    boot_memory = memory_map.get_boot_memory() if memory_map is not None else None
+    return boot_memory.start if boot_memory is not None else 0
+
+
+def check_ranges(path, ranges, memory_map, logger):
+    """
+    Raise if an address range of the image is not within flash.
+    """
+    flash = sorted((region.start, region.end + 1) for region in memory_map if region.is_flash)
+    for start, end in ranges:
+        address = start
+        while address < end:
+            region_end = next((high for low, high in flash if low <= address < high), None)
+            if region_end is None:
+                _fail("Image {} does not fit in target flash: address 0x{:08x} is outside "
+                      "flash".format(path, address), EXIT_CODE_IMAGE_OUT_OF_RANGE, logger)
+            address = region_end
+
+
+def check_vector_table(path, head, memory_map, logger):
+    """
+    Raise if the image does not start with a Cortex-M vector table.
+    """
+    if len(head) < VECTOR_TABLE_HEAD:
+        return
+    stack_pointer, reset_handler = struct.unpack("<II", head[:VECTOR_TABLE_HEAD])
+    message = None
+    if stack_pointer in (0, ERASED_WORD) or stack_pointer & 3:
+        message = "initial stack pointer 0x{:08x} is not a stack address".format(stack_pointer)
+    elif reset_handler == ERASED_WORD or not reset_handler & 1:
+        message = "reset vector 0x{:08x} is not a Thumb address".format(reset_handler)
+    elif memory_map is not None:
+        ram = [region for region in memory_map if region.is_ram]
+        if ram and not any(region.start <= stack_pointer <= region.end + 1 for region in ram):
+            message = "initial stack pointer 0x{:08x} is outside RAM".format(stack_pointer)
+        elif not any(region.contains_address(reset_handler & ~1)
+                     for region in memory_map if region.is_flash):
+            message = "reset vector 0x{:08x} is outside flash".format(reset_handler)
+    if message:
+        _fail("Image {} has no valid vector table: {}".format(path, message),
+              EXIT_CODE_IMAGE_INVALID_VECTOR_TABLE, logger)
+
+
+@TRACER.timed("validate_image")
+def validate_image(path, target_id=None, platform=None, pack=None, logger=None):
+    """
+    Check the image before flashing: hex record checksums, that the image fits in target
+    flash and that it starts with a vector table. Address checks are skipped for targets
+    without a known memory map, files other than .bin and .hex are not checked.
+    :param path: image file
+    :param target_id: target id
+    :param platform: pyOCD target name
+    :param pack: path of pack file defining the target
+    :param logger: logger object
+    :return: None on success, raise FlashError otherwise
+    """
+    logger = logger if logger else logging.getLogger("mbed-flasher")
+    if not path.lower().endswith(IMAGE_EXTENSIONS):
+        logger.debug("%s is not an image, skipping validation", os.path.basename(path))
+        return
+    memory_map = target_memory_map(target_id, platform, pack)
+    if path.lower().endswith(".hex"):
+        try:
+            records = parse_hex(path).segments
+        except HexFormatError as error:
+            _fail("Invalid hex file {}: {}".format(path, error), EXIT_CODE_IMAGE_CORRUPTED,
+                  logger)
+    else:
+        with open(path, "rb") as image:
+            records = [(boot_address(memory_map), image.read())]
+
+    ranges = merge_ranges(records)
+    if not ranges:
+        _fail("Image {} is empty".format(path), EXIT_CODE_IMAGE_CORRUPTED, logger)
+    if memory_map is not None:
+        check_ranges(path, ranges, memory_map, logger)
+    check_vector_table(path, image_head(records), memory_map, logger)
+    logger.debug("Image %s validated, %d bytes in 0x%08x-0x%08x", os.path.basename(path),
+                 sum(end - start for start, end in ranges), ranges[0][0], ranges[-1][1] - 1)
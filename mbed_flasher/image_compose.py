@@ -0,0 +1,194 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import functools
+import hashlib
+import logging
+import os
+import tempfile
+
+import appdirs
+
+from mbed_flasher.common import FlashError
+from mbed_flasher.hexfile import HexFormatError, merge_segments, parse_hex, write_hex
+from mbed_flasher.return_codes import EXIT_CODE_FILE_MISSING
+from mbed_flasher.return_codes import EXIT_CODE_IMAGE_CORRUPTED
+from mbed_flasher.return_codes import EXIT_CODE_IMAGE_OVERLAP
+from mbed_flasher.return_codes import EXIT_CODE_MISUSE_CMD
+from mbed_flasher.timings import TRACER
+
+IMAGE_CACHE_DIR = os.path.join(appdirs.user_cache_dir("mbed-flasher", "ARM"), "images")
+IMAGE_HASH_CHUNK = 1024 * 1024
+IMAGE_CACHE_ENTRIES = 32
+
+
+def parse_image_spec(spec):
+    """
+    :param spec: image path, .bin images may be followed by @address, e.g. boot.bin@0x8000000
+    :return: tuple of path and address, address is None if not given
+    """
+    path, separator, address = spec.rpartition("@")
+    if not separator:
+        return spec, None
+    try:
+        address = int(address, 0)
+    except ValueError:
+        # @ belongs to the path
+        return spec, None
+    if path.lower().endswith(".hex"):
+        raise FlashError(message="Address can not be given for hex image: {}".format(spec),
+                         return_code=EXIT_CODE_MISUSE_CMD)
+    return path, address
+
+
+def image_paths(specs):
+    """
+    :param specs: list of image specs
+    :return: list of image paths
+    """
+    return [parse_image_spec(spec)[0] for spec in specs]
+
+
+def needs_composing(build):
+    """
+    :param build: image path or list of image specs
+    :return: True if build must be merged to a single image before flashing
+    """
+    if not isinstance(build, (list, tuple)):
+        return False
+    return len(build) > 1 or parse_image_spec(build[0])[1] is not None
+
+
+class ImageComposer(object):
+    """
+    Merges several .bin and .hex images into one .hex image, merged images are cached
+    by the contents and addresses of their parts.
+    """
+    def __init__(self, cache_dir=IMAGE_CACHE_DIR, logger=None):
+        """
+        :param cache_dir: directory of merged images
+        :param logger: logger object
+        """
+        self.logger = logger if logger else logging.getLogger("mbed-flasher")
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def _digest(specs, base_address):
+        digest = hashlib.sha1()
+        for spec in specs:
+            path, address = parse_image_spec(spec)
+            if address is None and not path.lower().endswith(".hex"):
+                address = base_address
+            digest.update("{}:{}\n".format(os.path.splitext(path)[1].lower(),
+                                           address).encode("utf-8"))
+            with open(path, "rb") as image:
+                for chunk in iter(functools.partial(image.read, IMAGE_HASH_CHUNK), b""):
+                    digest.update(chunk)
+        return digest.hexdigest()
+
+    def _error(self, message, return_code):
+        """
+        Log the message.
+        :return: FlashError to raise
+        """
+        self.logger.error(message)
+        return FlashError(message=message, return_code=return_code)
+
+    def _read_part(self, spec, base_address):
+        """
+        :return: tuple of list of (address, bytearray) segments and start record of the image
+        """
+        image_path, address = parse_image_spec(spec)
+        try:
+            if image_path.lower().endswith(".hex"):
+                part = parse_hex(image_path)
+                return part.segments, part.start_record
+            with open(image_path, "rb") as image:
+                return [(base_address if address is None else address,
+                         bytearray(image.read()))], None
+        except HexFormatError as error:
+            raise self._error("Invalid hex file {}: {}".format(image_path, error),
+                              EXIT_CODE_IMAGE_CORRUPTED)
+        except (IOError, OSError) as error:
+            raise self._error("Could not read image {}: {}".format(image_path, error),
+                              EXIT_CODE_FILE_MISSING)
+
+    @TRACER.timed("ImageComposer.compose")
+    def compose(self, specs, base_address=0):
+        """
+        :param specs: list of image specs, see parse_image_spec
+        :param base_address: address of .bin images given without address
+        :return: path of the merged .hex image
+        """
+        try:
+            digest = self._digest(specs, base_address)
+        except (IOError, OSError) as error:
+            raise self._error("Could not read images: {}".format(error), EXIT_CODE_FILE_MISSING)
+        path = os.path.join(self.cache_dir, digest + ".hex")
+        if os.path.isfile(path):
+            self.logger.debug("using cached merged image %s", path)
+            os.utime(path, None)
+            return path
+
+        segments = []
+        start_record = None
+        for spec in specs:
+            part_segments, part_start_record = self._read_part(spec, base_address)
+            # Only the first start address is kept, the target boots from its vector table
+            start_record = start_record or part_start_record
+            try:
+                segments = merge_segments(segments + part_segments)
+            except HexFormatError as error:
+                raise self._error("Image {} overlaps earlier images: {}".format(spec, error),
+                                  EXIT_CODE_IMAGE_OVERLAP)
+
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        # Write to a temporary file first so readers never see a partial image
+        handle, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.cache_dir)
+        os.close(handle)
+        write_hex(tmp_path, segments, start_record)
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # Another process stored the same image first
+            os.remove(tmp_path)
+        self.logger.info("merged %d images to %s", len(specs), path)
+        self.prune()
+        return path
+
+    def prune(self, keep=IMAGE_CACHE_ENTRIES):
+        """
+        Remove all but the most recently written merged images.
+        :param keep: number of images kept
+        """
+        images = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if name.endswith(".hex"):
+                    images.append((os.path.getmtime(path), path))
+            except OSError:
+                # Removed by another process
+                continue
+        for _, path in sorted(images, reverse=True)[keep:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+IMAGE_COMPOSER = ImageComposer()
@@ -0,0 +1,145 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import logging
+import os
+
+from six.moves import queue
+
+try:
+    from logging.handlers import QueueHandler, QueueListener
+except ImportError:
+    # python 2, handlers are called directly and _RecordQueueHandler is not used
+    QueueHandler = logging.Handler
+    QueueListener = None
+
+TARGET_LOG_FORMAT = "%(asctime)s [%(levelname)s](%(threadName)s): %(message)s"
+
+
+def target_logger(logger, target_id):
+    """
+    :param logger: logger object
+    :param target_id: target id or None
+    :return: child logger of logger for the target, logger itself if target_id is None
+    """
+    if not target_id or not hasattr(logger, "getChild"):
+        return logger
+    return logger.getChild(str(target_id))
+
+
+class TargetFileHandler(logging.Handler):
+    """
+    Writes records of per target child loggers to a file per target, <target id>.log
+    in the log directory. Records of other loggers are ignored.
+    """
+    def __init__(self, logger_name, log_dir, level=logging.DEBUG):
+        """
+        :param logger_name: name of the parent logger of the target loggers
+        :param log_dir: directory of the log files, created if needed
+        :param level: level of the records written
+        """
+        logging.Handler.__init__(self, level)
+        self.prefix = logger_name + "."
+        self.log_dir = log_dir
+        self.setFormatter(logging.Formatter(TARGET_LOG_FORMAT))
+        self._files = {}
+
+    def emit(self, record):
+        if not record.name.startswith(self.prefix):
+            return
+        target_id = record.name[len(self.prefix):].split(".")[0]
+        handler = self._files.get(target_id)
+        if handler is None:
+            if not os.path.isdir(self.log_dir):
+                os.makedirs(self.log_dir)
+            handler = logging.FileHandler(os.path.join(self.log_dir, target_id + ".log"))
+            handler.setFormatter(self.formatter)
+            self._files[target_id] = handler
+        handler.emit(record)
+
+    def close(self):
+        for handler in self._files.values():
+            handler.close()
+        self._files = {}
+        logging.Handler.close(self)
+
+
+# QueueHandler implements emit, the logging.Handler base of python 2 is never instantiated
+class _RecordQueueHandler(QueueHandler):  # pylint: disable=abstract-method
+    """
+    Queues records as they are, formatting is left to the listener thread.
+    """
+    def prepare(self, record):
+        """
+        :return: record unchanged
+        """
+        return record
+
+
+class LogPipeline(object):
+    """
+    Moves formatting and writing of log records to a listener thread. The handlers of
+    the logger are moved behind a queue, so logging threads only enqueue records and do
+    not wait for each other on handler locks.
+    """
+    def __init__(self, logger, log_dir=None):
+        """
+        :param logger: logger object, child loggers are covered too
+        :param log_dir: directory of per target log files, no files are written if None
+        """
+        self.logger = logger
+        self.log_dir = log_dir
+        self.handlers = []
+        self._listener = None
+
+    def start(self):
+        """
+        Start the listener thread. Handlers are called directly if the queue handlers are
+        not available.
+        """
+        self.handlers = list(self.logger.handlers)
+        handlers = list(self.handlers)
+        if self.log_dir:
+            handlers.append(TargetFileHandler(self.logger.name, self.log_dir))
+        if QueueListener is None:
+            self.logger.handlers = handlers
+            return
+        records = queue.Queue(-1)
+        self._listener = QueueListener(records, *handlers, respect_handler_level=True)
+        self.logger.handlers = [_RecordQueueHandler(records)]
+        self._listener.start()
+
+    def stop(self):
+        """
+        Write the queued records and give the original handlers back to the logger.
+        """
+        if self._listener is not None:
+            self._listener.stop()
+            handlers = self._listener.handlers
+            self._listener = None
+        else:
+            handlers = self.logger.handlers
+        for handler in handlers:
+            if isinstance(handler, TargetFileHandler):
+                handler.close()
+        self.logger.handlers = self.handlers
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
@@ -19,17 +19,28 @@ limitations under the License.
 from __future__ import print_function
 import sys
 import argparse
+import json
 import logging
 import logging.handlers
+import os
 import traceback
 
+from mbed_flasher.api import FlasherAPI
 from mbed_flasher.common import FlashError, EraseError, ResetError
-from mbed_flasher.flashers.FlasherPyOCD import ConnectMode
+from mbed_flasher.flashers.FlasherPyOCD import ConnectMode, RESET_TYPES
+from mbed_flasher.flashers.programming_profiles import PROGRAMMING_PROFILES
 from mbed_flasher.flash import Flash
-from mbed_flasher.erase import Erase
-from mbed_flasher.reset import Reset
+from mbed_flasher.log_pipeline import LogPipeline
+from mbed_flasher.readiness import BOOT_BANNER_TIMEOUT
+from mbed_flasher.metrics import REGISTRY
+from mbed_flasher.pipeline import STEPS, step_durations
+from mbed_flasher.profiling import PROFILE_MODES, profile_call
+from mbed_flasher.reset_methods import RESET_METHODS
+from mbed_flasher.retry import RetryPolicy
+from mbed_flasher.server import FlashServer, SERVER_CONCURRENCY, client_if_running
 from mbed_flasher.return_codes import EXIT_CODE_SUCCESS
 from mbed_flasher.return_codes import EXIT_CODE_UNHANDLED_EXCEPTION
+from mbed_flasher.timings import TRACER
 
 
 def get_subparser(subparsers, name, func, **kwargs):
@@ -94,10 +105,47 @@ class FlasherCLI(object):
         """
         :return: 0 or args.func()
         """
-        if self.args.func:
-            return self.args.func()
-        self.parser.print_usage()
-        return EXIT_CODE_SUCCESS
+        if self.args.timings or self.args.trace:
+            TRACER.enable()
+        pipeline = LogPipeline(self.logger, log_dir=self.args.log_dir)
+        pipeline.start()
+        try:
+            if self.args.func:
+                if self.args.profile:
+                    return profile_call(self.args.profile, self.args.func,
+                                        emit=lambda line: print(line, file=sys.stderr),
+                                        output=self.args.profile_output)
+                return self.args.func()
+            self.parser.print_usage()
+            return EXIT_CODE_SUCCESS
+        finally:
+            if TRACER.enabled:
+                TRACER.disable()
+                self._export_timings()
+            if self.args.metrics_textfile:
+                self._export_metrics()
+            pipeline.stop()
+
+    def _export_metrics(self):
+        """
+        Write metrics of this run for node-exporter textfile collector
+        """
+        try:
+            REGISTRY.write_textfile(self.args.metrics_textfile, merge=True)
+        except (IOError, OSError) as error:
+            self.logger.error("Could not write metrics %s: %s", self.args.metrics_textfile, error)
+
+    def _export_timings(self):
+        """
+        Print timing breakdown and write Chrome trace as requested by --timings and --trace
+        """
+        if self.args.timings == 'json':
+            print(json.dumps(TRACER.breakdown(), indent=2))
+        if self.args.trace:
+            try:
+                TRACER.write_chrome_trace(self.args.trace)
+            except (IOError, OSError) as error:
+                self.logger.error("Could not write trace %s: %s", self.args.trace, error)
 
     def argparser_setup(self, sysargs):
         """! Configure CLI (Command Line options) options
@@ -120,6 +168,66 @@ class FlasherCLI(object):
                             action="store_true",
                             help="Silent - only errors will be printed.")
 
+        parser.add_argument('--log-dir',
+                            dest="log_dir",
+                            default=None,
+                            metavar='DIR',
+                            help="Write debug log of each target to DIR/<target_id>.log.")
+
+        parser.add_argument('--timings',
+                            dest="timings",
+                            default=None,
+                            choices=['json'],
+                            help="Print time spent in each phase of the command.")
+
+        parser.add_argument('--trace',
+                            dest="trace",
+                            default=None,
+                            metavar='FILE',
+                            help="Write phase timings to FILE in Chrome trace event format.")
+
+        parser.add_argument('--metrics-textfile',
+                            dest="metrics_textfile",
+                            default=None,
+                            metavar='FILE',
+                            help="Write operation metrics to FILE for node-exporter "
+                                 "textfile collector.")
+
+        parser.add_argument('--profile',
+                            dest="profile",
+                            default=None,
+                            choices=PROFILE_MODES,
+                            help="Run the command under cProfile (cpu) or tracemalloc (mem) "
+                                 "and print the hot spots.")
+
+        parser.add_argument('--profile-output',
+                            dest="profile_output",
+                            default=None,
+                            metavar='FILE',
+                            help="File the pstats or tracemalloc snapshot is written to, "
+                                 "mbedflash.pstats or mbedflash.tracemalloc by default.")
+
+        parser.add_argument('--server',
+                            dest="server",
+                            default=os.environ.get("MBEDFLASH_SERVER"),
+                            metavar='ADDRESS',
+                            help="Address of a running 'mbedflash serve', Unix socket path or "
+                                 "host:port. Flash, erase, reset and run are forwarded to it. "
+                                 "MBEDFLASH_SERVER or a per user socket by default.")
+
+        parser.add_argument('--use-server',
+                            dest="use_server",
+                            default=False,
+                            action="store_true",
+                            help="Forward flash, erase, reset and run to the server of this user "
+                                 "when it is running.")
+
+        parser.add_argument('--no-server',
+                            dest="no_server",
+                            default=False,
+                            action="store_true",
+                            help="Run the command in this process even if a server is running.")
+
         parser.add_argument('--version',
                             action='version',
                             version=FlasherCLI._get_version())
@@ -130,14 +238,33 @@ class FlasherCLI(object):
                                            metavar='<command>')
         subparsers.required = True
 
-        # Initialize flash command
+        self._add_flash_parser(subparsers)
+        self._add_reset_parser(subparsers)
+        self._add_erase_parser(subparsers)
+        self._add_run_parser(subparsers)
+        self._add_serve_parser(subparsers)
+
+        args = parser.parse_args(args=sysargs)
+        if 'method' in args:
+            if args.method is None:
+                args.method = 'simple'
+        self.parser = parser
+        return args
+
+    def _add_flash_parser(self, subparsers):
+        """
+        Add the flash command.
+        :param subparsers: subparsers of the mbedflash parser
+        """
         parser_flash = get_resource_subparser(subparsers,
                                               'flash',
                                               func=self.subcmd_flash_handler,
                                               help='Flash given resource')
         parser_flash.add_argument('-i', '--input',
-                                  help='Binary input to be flashed.',
-                                  default=None, metavar='INPUT')
+                                  help='Binary input to be flashed. Repeat to merge several '
+                                       'images into one, a .bin image may be followed by '
+                                       '@address, e.g. -i boot.bin@0x0 -i app.hex',
+                                  default=None, metavar='INPUT', action='append')
         parser_flash.add_argument('--tid', '--target_id',
                                   help='Target to be flashed',
                                   default=None, metavar='TARGET_ID')
@@ -164,7 +291,53 @@ class FlasherCLI(object):
                                            ConnectMode.UNDER_RESET.value,
                                            ConnectMode.ATTACH.value],
                                   metavar='PYOCD_CONNECT_MODE')
-        # Initialize reset command
+        parser_flash.add_argument('--pyocd_profile',
+                                  help='PyOCD programming profile, only used with pyocd method',
+                                  default=None,
+                                  choices=sorted(PROGRAMMING_PROFILES))
+        parser_flash.add_argument('--pyocd_program_option',
+                                  help='PyOCD programming option overriding the profile, '
+                                       'e.g. chip_erase=auto or trust_crc=true. '
+                                       'Can be given multiple times',
+                                  default=None, dest='pyocd_program_options', action='append',
+                                  metavar='KEY=VALUE')
+        parser_flash.add_argument('--boot-banner',
+                                  help='Regular expression printed by the target once booted, '
+                                       'flash returns after it is seen on the serial port. '
+                                       'Only used with msd method',
+                                  default=None, dest='boot_banner', metavar='REGEX')
+        parser_flash.add_argument('--boot-timeout',
+                                  help='Seconds to wait for the boot banner',
+                                  default=BOOT_BANNER_TIMEOUT, dest='boot_timeout', type=float,
+                                  metavar='SECONDS')
+        parser_flash.add_argument('--verify',
+                                  help='Verify flash contents with on-target CRC32 after '
+                                       'flashing. Uses pyOCD also with msd method',
+                                  default=False, dest='verify', action='store_true')
+        parser_flash.add_argument('--no-validate',
+                                  help='Do not check hex checksums, flash address ranges and '
+                                       'vector table of the image before flashing',
+                                  default=False, dest='no_validate', action='store_true')
+        parser_flash.add_argument('--reset-method',
+                                  help='Select post-flash reset method, only used with msd '
+                                       'method. pyocd reset uses --pyocd_platform and '
+                                       '--pyocd_pack',
+                                  default=None, dest='reset_method',
+                                  choices=sorted(RESET_METHODS))
+        parser_flash.add_argument('--retries',
+                                  help='Retry flashing this many times when DAPLink reports '
+                                       'a transient failure. A retry budget shared between '
+                                       'operations is only available from the python API',
+                                  default=0, dest='retries', type=int, metavar='COUNT')
+        parser_flash.add_argument('--retry-reset',
+                                  help='Reset the target before each retry',
+                                  default=False, dest='retry_reset', action='store_true')
+
+    def _add_reset_parser(self, subparsers):
+        """
+        Add the reset command.
+        :param subparsers: subparsers of the mbedflash parser
+        """
         parser_reset = get_resource_subparser(subparsers, 'reset',
                                               func=self.subcmd_reset_handler,
                                               help='Reset given resource')
@@ -172,10 +345,31 @@ class FlasherCLI(object):
                                   help='Target to be reset',
                                   default=None, metavar='TARGET_ID')
         parser_reset.add_argument('--method',
-                                  help='<simple>, used for reset',
+                                  help='Select reset method to be used',
                                   default='simple',
-                                  choices=['simple'])
-        # Initialize erase command
+                                  choices=sorted(RESET_METHODS))
+        parser_reset.add_argument('--duration',
+                                  help='Seconds the break or reset line pulse is held',
+                                  default=None, type=float, metavar='SECONDS')
+        parser_reset.add_argument('--pyocd_platform',
+                                  help='PyOCD target platform, only used with pyocd method. '
+                                       'Detected from the board if not given',
+                                  default=None,
+                                  metavar='PYOCD_PLATFORM')
+        parser_reset.add_argument('--pyocd_pack',
+                                  help='PyOCD pack, only used with pyocd method',
+                                  default=None,
+                                  metavar='PYOCD_PACK')
+        parser_reset.add_argument('--pyocd_reset_type',
+                                  help='PyOCD reset type, only used with pyocd method',
+                                  default=None,
+                                  choices=sorted(RESET_TYPES))
+
+    def _add_erase_parser(self, subparsers):
+        """
+        Add the erase command.
+        :param subparsers: subparsers of the mbedflash parser
+        """
         parser_erase = get_resource_subparser(subparsers, 'erase',
                                               func=self.subcmd_erase_handler,
                                               help='Erase given resource')
@@ -205,63 +399,211 @@ class FlasherCLI(object):
                                            ConnectMode.UNDER_RESET.value,
                                            ConnectMode.ATTACH.value],
                                   metavar='PYOCD_CONNECT_MODE')
-
-        args = parser.parse_args(args=sysargs)
-        if 'method' in args:
-            if args.method is None:
-                args.method = 'simple'
-        self.parser = parser
-        return args
+        parser_erase.add_argument('--erase-range',
+                                  help='Erase only the flash sectors overlapping the range, '
+                                       'END is exclusive. Can be given several times. '
+                                       'Only used with pyocd method',
+                                  default=None, action='append', dest='erase_ranges',
+                                  metavar='START-END')
+        parser_erase.add_argument('--erase-image',
+                                  help='Erase only the flash sectors the image would be '
+                                       'written to. Only used with pyocd method',
+                                  default=None, dest='erase_image', metavar='IMAGE')
+        parser_erase.add_argument('--blank-check',
+                                  help='Check the flash with pyocd first and skip the erase '
+                                       'if it is already blank',
+                                  default=False, dest='blank_check', action='store_true')
+
+    def _add_run_parser(self, subparsers):
+        """
+        Add the run command.
+        :param subparsers: subparsers of the mbedflash parser
+        """
+        parser_run = get_resource_subparser(subparsers, 'run',
+                                            func=self.subcmd_run_handler,
+                                            help='Run several steps on one target with one '
+                                                 'target lookup and one pyOCD session')
+        parser_run.add_argument('--steps',
+                                help='Comma separated steps run in the given order, some of '
+                                     '{}'.format(','.join(STEPS)),
+                                default=','.join(STEPS), metavar='STEPS')
+        parser_run.add_argument('-i', '--input',
+                                help='Image of flash and verify steps. Repeat to merge several '
+                                     'images into one, as with flash',
+                                default=None, metavar='INPUT', action='append')
+        parser_run.add_argument('--tid', '--target_id',
+                                help='Target the steps are run on',
+                                default=None, metavar='TARGET_ID')
+        parser_run.add_argument('--method',
+                                help='Method of erase, flash and reset steps, verify step '
+                                     'always uses pyocd',
+                                default=Flash.PYOCD_METHOD,
+                                choices=[Flash.MSD_METHOD, Flash.PYOCD_METHOD])
+        parser_run.add_argument('--pyocd_platform',
+                                help='PyOCD target platform',
+                                default=None,
+                                metavar='PYOCD_PLATFORM')
+        parser_run.add_argument('--pyocd_pack',
+                                help='PyOCD pack',
+                                default=None,
+                                metavar='PYOCD_PACK')
+        parser_run.add_argument('--pyocd_connect_mode',
+                                help='PyOCD connect mode, only used with pyocd method',
+                                default=ConnectMode.UNDER_RESET.value,
+                                choices=[ConnectMode.HALT.value,
+                                         ConnectMode.PRE_RESET.value,
+                                         ConnectMode.UNDER_RESET.value,
+                                         ConnectMode.ATTACH.value],
+                                metavar='PYOCD_CONNECT_MODE')
+        parser_run.add_argument('--pyocd_profile',
+                                help='PyOCD programming profile, only used with pyocd method',
+                                default=None,
+                                choices=sorted(PROGRAMMING_PROFILES))
+        parser_run.add_argument('--pyocd_program_option',
+                                help='PyOCD programming option overriding the profile. '
+                                     'Can be given multiple times',
+                                default=None, dest='pyocd_program_options', action='append',
+                                metavar='KEY=VALUE')
+        parser_run.add_argument('--reset-method',
+                                help='Reset method of the reset step, only used with msd '
+                                     'method',
+                                default=None, dest='reset_method',
+                                choices=sorted(RESET_METHODS))
+        parser_run.add_argument('--no-validate',
+                                help='Do not validate the image before the first step',
+                                default=False, dest='no_validate', action='store_true')
+
+    def _add_serve_parser(self, subparsers):
+        """
+        Add the serve command.
+        :param subparsers: subparsers of the mbedflash parser
+        """
+        parser_serve = get_subparser(subparsers, 'serve',
+                                     func=self.subcmd_serve_handler,
+                                     help='Run flash, erase, reset and run jobs of other mbedflash '
+                                          'commands in a long running process')
+        parser_serve.add_argument('--concurrency',
+                                  help='Maximum number of jobs run at the same time',
+                                  default=SERVER_CONCURRENCY, type=int)
 
     def set_log_level_from_verbose(self):
         """ set logging level, silent, or some of verbose level
         """
+        level = 'DEBUG'
         if self.args.silent:
             self.console_handler.setLevel('NOTSET')
         elif not self.args.verbose:
-            self.console_handler.setLevel('ERROR')
+            level = 'ERROR'
         elif self.args.verbose == 1:
-            self.console_handler.setLevel('WARNING')
+            level = 'WARNING'
         elif self.args.verbose == 2:
-            self.console_handler.setLevel('INFO')
-        elif self.args.verbose >= 3:
-            self.console_handler.setLevel('DEBUG')
-        else:
+            level = 'INFO'
+        elif self.args.verbose < 3:
+            level = 'CRITICAL'
             self.logger.critical("UNEXPLAINED NEGATIVE COUNT!")
+        if not self.args.silent:
+            self.console_handler.setLevel(level)
+        # Records below the console level are not created, so debug only work
+        # is skipped unless someone reads it
+        self.logger.setLevel('DEBUG' if self.args.log_dir else level)
 
     def subcmd_flash_handler(self):
         """
         flash command handler
         """
-        flasher = Flash()
-        return flasher.flash(
+        result = self._api().flash(
             build=self.args.input,
             target_id=self.args.tid,
             method=self.args.method,
             no_reset=self.args.no_reset,
             pyocd_platform=self.args.pyocd_platform,
             pyocd_pack=self.args.pyocd_pack,
-            pyocd_connect_mode=self.args.pyocd_connect_mode)
+            pyocd_connect_mode=self.args.pyocd_connect_mode,
+            boot_banner=self.args.boot_banner,
+            boot_timeout=self.args.boot_timeout,
+            pyocd_profile=self.args.pyocd_profile,
+            pyocd_program_options=self.args.pyocd_program_options,
+            reset_method=self.args.reset_method,
+            verify=self.args.verify,
+            validate=not self.args.no_validate,
+            retry_policy=RetryPolicy(attempts=self.args.retries + 1,
+                                     reset_between=self.args.retry_reset))
+        result.raise_for_error()
+        return result.return_code
 
     def subcmd_reset_handler(self):
         """
         reset command handler
         """
-        reset = Reset()
-        return reset.reset(target_id=self.args.tid, method=self.args.method)
+        result = self._api().reset(
+            target_id=self.args.tid, method=self.args.method,
+            duration=self.args.duration,
+            pyocd_platform=self.args.pyocd_platform,
+            pyocd_pack=self.args.pyocd_pack,
+            pyocd_reset_type=self.args.pyocd_reset_type)
+        result.raise_for_error()
+        return result.return_code
 
     def subcmd_erase_handler(self):
         """
         erase command handler
         """
-        eraser = Erase()
-        return eraser.erase(
+        result = self._api().erase(
             target_id=self.args.tid,
             no_reset=self.args.no_reset,
             method=self.args.method,
             pyocd_platform=self.args.pyocd_platform,
             pyocd_pack=self.args.pyocd_pack,
-            pyocd_connect_mode=self.args.pyocd_connect_mode)
+            pyocd_connect_mode=self.args.pyocd_connect_mode,
+            erase_ranges=self.args.erase_ranges,
+            erase_image=self.args.erase_image,
+            blank_check=self.args.blank_check)
+        result.raise_for_error()
+        return result.return_code
+
+    def subcmd_run_handler(self):
+        """
+        run command handler, prints the duration of each finished step
+        """
+        result = self._api().run(
+            steps=self.args.steps,
+            target_id=self.args.tid,
+            build=self.args.input,
+            method=self.args.method,
+            pyocd_platform=self.args.pyocd_platform,
+            pyocd_pack=self.args.pyocd_pack,
+            pyocd_connect_mode=self.args.pyocd_connect_mode,
+            pyocd_profile=self.args.pyocd_profile,
+            pyocd_program_options=self.args.pyocd_program_options,
+            reset_method=self.args.reset_method,
+            validate=not self.args.no_validate)
+        for step, duration in step_durations(result.timings):
+            print("{:<8} {:8.3f} s".format(step, duration))
+        result.raise_for_error()
+        return result.return_code
+
+    def subcmd_serve_handler(self):
+        """
+        serve command handler
+        """
+        FlashServer(address=self.args.server, concurrency=self.args.concurrency,
+                    logger=self.logger).serve_forever()
+        return EXIT_CODE_SUCCESS
+
+    def _api(self):
+        """
+        :return: ServerClient of a running server when --server or --use-server is given,
+        FlasherAPI if there is none or the command asks for timings, metrics or a profile
+        of this process
+        """
+        local = (self.args.no_server or self.args.timings or self.args.trace or
+                 self.args.metrics_textfile or self.args.profile or
+                 not (self.args.server or self.args.use_server))
+        client = None if local else client_if_running(self.args.server, self.logger)
+        if client:
+            self.logger.info("Forwarding to server at %s", client.address)
+            return client
+        return FlasherAPI(logger=self.logger)
 
     @staticmethod
     def _get_version():
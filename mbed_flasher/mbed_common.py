@@ -19,12 +19,38 @@ import time
 
 from mbed_os_tools.detect import create as create_board_detect
 
+from mbed_flasher.daplink_status import DETAILS_CACHE
+from mbed_flasher.metrics import DISCOVERY_DURATION
+from mbed_flasher.timings import TRACER
+
 
 CHECK_BINARY_DISAPPEAR_RETRIES = 60
 CHECK_BINARY_DISAPPEAR_SLEEP = 1
 REFRESH_TARGET_RETRIES = 100
 REFRESH_TARGET_SLEEP = 1
 
+_SHARED_BOARD_DETECT = []
+
+
+def share_board_detect(enabled=True):
+    """
+    Reuse one board detector for all lookups instead of creating one per lookup,
+    long running processes keep the detector warm this way.
+    :param enabled: False goes back to a detector per lookup
+    """
+    del _SHARED_BOARD_DETECT[:]
+    if enabled:
+        _SHARED_BOARD_DETECT.append(create_board_detect())
+
+
+def board_detect():
+    """
+    :return: shared board detector if enabled, otherwise a new one
+    """
+    if _SHARED_BOARD_DETECT:
+        return _SHARED_BOARD_DETECT[0]
+    return create_board_detect()
+
 
 class MbedCommon(object):
     """
@@ -49,17 +75,19 @@ class MbedCommon(object):
         :param target_id: target_id to be searched for
         :return: list of targets
         """
-        mbedls = create_board_detect()
+        mbedls = board_detect()
         return mbedls.list_mbeds(filter_function=lambda m: m["target_id"] == target_id)
 
     @staticmethod
+    @DISCOVERY_DURATION.time()
+    @TRACER.timed("MbedCommon.refresh_target")
     def refresh_target(target_id):
         """
         Refresh target with help of mbedls.
         :param target_id: target_id to be searched for
         :return: target or None
         """
-        mbedls = create_board_detect()
+        mbedls = board_detect()
 
         for _ in range(REFRESH_TARGET_RETRIES):
             mbeds = mbedls.list_mbeds(filter_function=lambda m: m["target_id"] == target_id)
@@ -71,6 +99,7 @@ class MbedCommon(object):
         return None
 
     @staticmethod
+    @TRACER.timed("MbedCommon.wait_for_file_disappear")
     def wait_for_file_disappear(target, source):
         """
         Wait for flashed binary to disappear from the mount point.
@@ -79,9 +108,12 @@ class MbedCommon(object):
         :param source: binary name
         :return: target object
         """
+        target_id = target["target_id"]
+        # Copying to the mount point remounts it, DETAILS.TXT may change
+        DETAILS_CACHE.invalidate(target_id)
         for _ in range(CHECK_BINARY_DISAPPEAR_RETRIES):
             try:
-                target = MbedCommon.refresh_target_once(target["target_id"])[0]
+                target = MbedCommon.refresh_target_once(target_id)[0]
             except IndexError:
                 # This is entered when mbedls fails to find the board,
                 # most likely due to remount in progress.
@@ -97,6 +129,8 @@ class MbedCommon(object):
                 try:
                     for file_name in os.listdir(target["mount_point"]):
                         if file_name.lower().endswith("htm"):
+                            # Drop details read from the old mount while waiting
+                            DETAILS_CACHE.invalidate(target_id)
                             return target
                 # Windows might raise WinError 21 when opening mount point too quickly.
                 except OSError:
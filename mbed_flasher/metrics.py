@@ -0,0 +1,369 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from contextlib import contextmanager
+import bisect
+import functools
+import os
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, concurrent merges of a textfile are not serialized
+    fcntl = None
+
+from six.moves import BaseHTTPServer
+
+from mbed_flasher import return_codes
+from mbed_flasher.common import FlashError, monotonic
+
+DURATION_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+DISCOVERY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 100)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+RETURN_CODE_NAMES = dict((getattr(return_codes, name), name[len("EXIT_CODE_"):].lower())
+                         for name in dir(return_codes) if name.startswith("EXIT_CODE_"))
+
+
+def return_code_name(return_code):
+    """
+    :param return_code: value of a return_codes constant
+    :return: constant name without EXIT_CODE_ prefix in lower case, e.g. success
+    """
+    return RETURN_CODE_NAMES.get(return_code, str(return_code))
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = [(name, str(value).replace("\\", "\\\\").replace("\"", "\\\"")
+                .replace("\n", "\\n")) for name, value in pairs]
+    return "{" + ",".join("{}=\"{}\"".format(name, value) for name, value in escaped) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _parse_value(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def read_samples(path):
+    """
+    :param path: file in Prometheus text exposition format
+    :return: dictionary of sample name with labels to value, empty if the file is missing
+    """
+    samples = {}
+    try:
+        with open(path) as metrics_file:
+            lines = metrics_file.read().splitlines()
+    except (IOError, OSError):
+        return samples
+    for line in lines:
+        if not line or line.startswith("#"):
+            continue
+        sample, _, value = line.rpartition(" ")
+        try:
+            samples[sample] = _parse_value(value)
+        except ValueError:
+            continue
+    return samples
+
+
+@contextmanager
+def _locked(path):
+    """
+    Hold an exclusive lock of path.lock while merging the textfile of several processes.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class Counter(object):
+    """
+    Monotonically increasing count per label values.
+    """
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        """
+        :param name: metric name
+        :param documentation: help text
+        :param labels: label names, values are given as keyword arguments
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def inc(self, amount=1, **labels):
+        """
+        :param amount: value added to the count
+        :param labels: label values
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """
+        :return: current count of the label values
+        """
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        """
+        :return: list of (name suffix, label names, label values, extra label, value)
+        """
+        with self._lock:
+            values = sorted(self._values.items())
+        return [("", self.labels, key, None, value) for key, value in values]
+
+
+class Histogram(object):
+    """
+    Distribution of observed values in cumulative buckets per label values.
+    """
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DURATION_BUCKETS):
+        """
+        :param name: metric name
+        :param documentation: help text
+        :param labels: label names, values are given as keyword arguments
+        :param buckets: sorted upper bounds of the buckets, +Inf is added
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def observe(self, value, **labels):
+        """
+        :param value: observed value, e.g. seconds
+        :param labels: label values
+        """
+        key = tuple(labels.get(name, "") for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def time(self, **labels):
+        """
+        Decorator observing the duration of every call in seconds.
+        :param labels: label values
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = monotonic()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(monotonic() - start, **labels)
+            return wrapper
+        return decorator
+
+    def count(self, **labels):
+        """
+        :return: number of observations of the label values
+        """
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            return sum(self._values[key][0]) if key in self._values else 0
+
+    def samples(self):
+        """
+        :return: list of (name suffix, label names, label values, extra label, value)
+        """
+        with self._lock:
+            values = sorted((key, (list(counts), total))
+                            for key, (counts, total) in self._values.items())
+        samples = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            bounds = [_format_value(float(bound)) for bound in self.buckets] + ["+Inf"]
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                samples.append(("_bucket", self.labels, key, ("le", bound), cumulative))
+            samples.append(("_count", self.labels, key, None, cumulative))
+            samples.append(("_sum", self.labels, key, None, total))
+        return samples
+
+
+class Registry(object):
+    """
+    Collection of metrics exported together.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = []
+
+    def register(self, metric):
+        """
+        :param metric: Counter or Histogram
+        :return: the metric
+        """
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self, previous=None):
+        """
+        :param previous: samples from read_samples added to the values of this process,
+        samples only in previous are kept
+        :return: metrics in Prometheus text exposition format
+        """
+        previous = dict(previous or {})
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append("# HELP {} {}".format(metric.name, metric.documentation))
+            lines.append("# TYPE {} {}".format(metric.name, metric.type_name))
+            for suffix, names, values, extra, value in metric.samples():
+                sample = "{}{}{}".format(metric.name, suffix,
+                                         _format_labels(names, values, extra))
+                value += previous.pop(sample, 0)
+                lines.append("{} {}".format(sample, _format_value(value)))
+            for sample in sorted(previous):
+                if sample.partition("{")[0] in [metric.name + suffix for suffix in
+                                                ("", "_bucket", "_count", "_sum")]:
+                    lines.append("{} {}".format(sample, _format_value(previous.pop(sample))))
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path, merge=False):
+        """
+        Write metrics for node-exporter textfile collector. The file is replaced
+        atomically so that the collector never reads a partial file.
+        :param path: .prom file path
+        :param merge: add the values already in the file, for processes that each count
+        one run, so that counters of the file keep increasing across runs
+        """
+        if merge:
+            with _locked(path):
+                self._write_textfile(path, self.render(read_samples(path)))
+        else:
+            self._write_textfile(path, self.render())
+
+    @staticmethod
+    def _write_textfile(path, text):
+        directory = os.path.dirname(os.path.abspath(path))
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "w") as metrics_file:
+                metrics_file.write(text)
+            # mkstemp creates the file readable by the owner only
+            os.chmod(temp_path, 0o644)
+            # os.rename does not replace an existing file on Windows, python 2 has no replace
+            getattr(os, "replace", os.rename)(temp_path, path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+    def serve(self, port, address="127.0.0.1"):
+        """
+        Serve metrics over HTTP from a daemon thread.
+        :param port: TCP port, 0 selects a free port
+        :param address: listen address
+        :return: HTTPServer, server_address gives the bound port, shutdown() stops it
+        """
+        registry = self
+
+        class MetricsHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+            """Answers every GET with the metrics of the registry."""
+            # pylint: disable=invalid-name
+            def do_GET(self):
+                """Send the metrics in text exposition format."""
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):  # pylint: disable=arguments-differ
+                """Requests are not logged, scrapes would flood stderr."""
+
+        server = BaseHTTPServer.HTTPServer((address, port), MetricsHandler)
+        thread = threading.Thread(target=server.serve_forever, name="mbedflash-metrics")
+        thread.daemon = True
+        thread.start()
+        return server
+
+
+REGISTRY = Registry()
+
+OPERATIONS = REGISTRY.register(Counter(
+    "mbedflash_operations_total", "Flash, erase and reset operations by result",
+    labels=("operation", "result")))
+OPERATION_DURATION = REGISTRY.register(Histogram(
+    "mbedflash_operation_duration_seconds", "Duration of flash, erase and reset operations",
+    labels=("operation",)))
+FLASH_RETRIES = REGISTRY.register(Counter(
+    "mbedflash_flash_retries_total", "Flash attempts retried after a transient failure",
+    labels=("result",)))
+DISCOVERY_DURATION = REGISTRY.register(Histogram(
+    "mbedflash_discovery_duration_seconds", "Time to find a target with mbedls",
+    buckets=DISCOVERY_BUCKETS))
+
+
+def count_operation(operation):
+    """
+    Decorator counting calls of an operation by return code and observing their duration.
+    :param operation: operation name, e.g. flash
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = monotonic()
+            return_code = return_codes.EXIT_CODE_UNHANDLED_EXCEPTION
+            try:
+                return_code = func(*args, **kwargs)
+                return return_code
+            except FlashError as error:
+                return_code = error.return_code
+                raise
+            finally:
+                OPERATIONS.inc(operation=operation, result=return_code_name(return_code))
+                OPERATION_DURATION.observe(monotonic() - start, operation=operation)
+        return wrapper
+    return decorator
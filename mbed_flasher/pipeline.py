@@ -0,0 +1,177 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import logging
+
+import six
+
+from mbed_flasher.common import FlashError, monotonic
+from mbed_flasher.flash import Flash
+from mbed_flasher.flashers.FlasherMbed import FlasherMbed
+from mbed_flasher.flashers.FlasherPyOCD import FlasherPyOCD, ConnectMode
+from mbed_flasher.flashers.session_pool import SessionPool
+from mbed_flasher.mbed_common import MbedCommon
+from mbed_flasher.metrics import count_operation
+from mbed_flasher.reset import Reset
+from mbed_flasher.return_codes import EXIT_CODE_SUCCESS
+from mbed_flasher.return_codes import EXIT_CODE_COULD_NOT_MAP_TARGET_ID_TO_DEVICE
+from mbed_flasher.return_codes import EXIT_CODE_MISUSE_CMD
+from mbed_flasher.return_codes import EXIT_CODE_TARGET_ID_MISSING
+from mbed_flasher.timings import TRACER
+
+STEPS = ("erase", "flash", "verify", "reset")
+STEP_SPAN = "Pipeline.step"
+
+
+def parse_steps(steps):
+    """
+    :param steps: comma separated step names or list of them, see STEPS
+    :return: list of step names in the given order
+    """
+    if isinstance(steps, six.string_types):
+        steps = [step.strip() for step in steps.split(",") if step.strip()]
+    steps = list(steps or [])
+    unknown = [step for step in steps if step not in STEPS]
+    if not steps or unknown:
+        raise FlashError(message="Invalid steps {}, expected some of {}".format(
+            ",".join(unknown) or "(none)", ",".join(STEPS)),
+                         return_code=EXIT_CODE_MISUSE_CMD)
+    return steps
+
+
+def step_durations(timings):
+    """
+    :param timings: span dictionary, e.g. OperationResult.timings
+    :return: list of (step, seconds) in the order the steps were run
+    """
+    durations = []
+    if not timings:
+        return durations
+    if timings.get("name") == STEP_SPAN:
+        durations.append((timings.get("step"), timings.get("duration")))
+    for child in timings.get("children", []):
+        durations.extend(step_durations(child))
+    return durations
+
+
+# pylint: disable=too-few-public-methods
+class Pipeline(object):
+    """
+    Runs several operations on one target: the target is looked up once and, with pyocd
+    method, all steps share one pyOCD session.
+    """
+    def __init__(self, logger=None, session_pool=None):
+        """
+        :param logger: logger object
+        :param session_pool: SessionPool used for the pyOCD session, a pool closed after
+        the run is used if None
+        """
+        self.logger = logger if logger else logging.getLogger("mbed-flasher")
+        self.session_pool = session_pool
+        self.target = None
+        self.durations = []
+
+    # pylint: disable=too-many-arguments, too-many-locals
+    @count_operation("run")
+    @TRACER.timed("Pipeline.run")
+    def run(self, steps, target_id=None, build=None, method=Flash.PYOCD_METHOD,
+            pyocd_platform=None, pyocd_pack=None,
+            pyocd_connect_mode=ConnectMode.UNDER_RESET.value,
+            pyocd_profile=None, pyocd_program_options=None, reset_method=None,
+            validate=True):
+        """
+        Run steps in the given order, stopping at the first failure.
+        :param steps: comma separated step names or list of them: erase, flash, verify, reset
+        :param target_id: target_id
+        :param build: string (file-path), or list of image specs merged to one image,
+        needed by flash and verify steps
+        :param method: msd or pyocd, method of erase, flash and reset steps. Verify always
+        uses pyocd
+        :param pyocd_platform: target platform to pyocd
+        :param pyocd_pack: pack file path to pyocd
+        :param pyocd_connect_mode: connect_mode used with pyocd method
+        :param pyocd_profile: programming profile used with pyocd, safe, fast or max
+        :param pyocd_program_options: raw programming options used with pyocd
+        :param reset_method: reset method of the reset step with msd method,
+        one of RESET_METHODS
+        :param validate: validate the image before the first step
+        :return: 0 on success, raises FlashError otherwise. Durations of the steps are
+        stored in self.durations
+        """
+        steps = parse_steps(steps)
+        if target_id is None:
+            raise FlashError(message="Target_id is missing",
+                             return_code=EXIT_CODE_TARGET_ID_MISSING)
+        if method not in (Flash.MSD_METHOD, Flash.PYOCD_METHOD):
+            raise FlashError(message="Selected method {} not supported".format(method),
+                             return_code=EXIT_CODE_MISUSE_CMD)
+        TRACER.current().set(target_id=target_id, method=method)
+        if build:
+            build = Flash(logger=self.logger).prepare_build(
+                build, target_id, pyocd_platform, pyocd_pack, validate and "flash" in steps)
+        elif "flash" in steps or "verify" in steps:
+            raise FlashError(message="Image is needed by flash and verify steps",
+                             return_code=EXIT_CODE_MISUSE_CMD)
+
+        target = self.target = MbedCommon.refresh_target(target_id)
+        if target is None:
+            raise FlashError(message="Did not find target: {}".format(target_id),
+                             return_code=EXIT_CODE_COULD_NOT_MAP_TARGET_ID_TO_DEVICE)
+
+        session_pool = self.session_pool or SessionPool(logger=self.logger)
+        pyocd = FlasherPyOCD(logger=self.logger, session_pool=session_pool)
+        # The same connect options keep the pooled session open between steps
+        connect_mode = (pyocd_connect_mode if method == Flash.PYOCD_METHOD
+                        else ConnectMode.ATTACH.value)
+
+        def erase():
+            if method == Flash.MSD_METHOD:
+                FlasherMbed(logger=self.logger).erase(target=target, no_reset=True)
+            else:
+                pyocd.erase(target, True, pyocd_platform, pyocd_pack, connect_mode)
+
+        def flash():
+            if method == Flash.MSD_METHOD:
+                FlasherMbed(logger=self.logger).flash(source=build, target=target,
+                                                      no_reset=True)
+            else:
+                pyocd.flash(build, target, True, pyocd_platform, pyocd_pack, connect_mode,
+                            profile=pyocd_profile, program_options=pyocd_program_options)
+
+        def verify():
+            pyocd.verify(build, target, pyocd_platform, pyocd_pack, connect_mode)
+
+        def reset():
+            if method == Flash.MSD_METHOD:
+                Reset(logger=self.logger).reset_target(target, reset_method or 'simple')
+            else:
+                pyocd.reset(target, pyocd_platform, pyocd_pack, connect_mode)
+
+        operations = {"erase": erase, "flash": flash, "verify": verify, "reset": reset}
+        self.durations = []
+        try:
+            for step in steps:
+                start = monotonic()
+                with TRACER.span(STEP_SPAN, step=step):
+                    operations[step]()
+                self.durations.append((step, monotonic() - start))
+                self.logger.info("%s step of %s done in %.3f seconds", step, target_id,
+                                 self.durations[-1][1])
+        finally:
+            if self.session_pool is None:
+                session_pool.close_all()
+
+        return EXIT_CODE_SUCCESS
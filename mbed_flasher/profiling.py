@@ -0,0 +1,138 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import cProfile
+import pstats
+import re
+
+PROFILE_MODES = ("cpu", "mem")
+PROFILE_OUTPUTS = {"cpu": "mbedflash.pstats", "mem": "mbedflash.tracemalloc"}
+PROFILE_TOP = 10
+
+# Built-in functions the time of which is not spent on CPU, checked in order
+TIME_CATEGORIES = (
+    ("sleep", re.compile(r"\bsleep\b|\bacquire\b|\bwait\b")),
+    ("io", re.compile(r"\b(read\w*|write\w*|open|close|listdir|scandir|stat|lstat|"
+                      r"select|poll|recv\w*|send\w*|fsync|waitpid|ioctl|flush)\b")),
+)
+
+
+def categorize(function):
+    """
+    :param function: pstats function key (file name, line number, function name)
+    :return: sleep, io or cpu
+    """
+    filename, _, name = function
+    if filename == "~":
+        for category, pattern in TIME_CATEGORIES:
+            if pattern.search(name):
+                return category
+    return "cpu"
+
+
+def _describe(function):
+    filename, line, name = function
+    if filename == "~":
+        return name
+    return "{}:{}({})".format(filename, line, name)
+
+
+def summarize_cpu(stats, top=PROFILE_TOP):
+    """
+    :param stats: pstats.Stats
+    :param top: number of hot spots
+    :return: report lines with time split to sleep, I/O and CPU and functions with most own time
+    """
+    # pylint: disable=no-member
+    own_times = [(timing[2], function) for function, timing in stats.stats.items()]
+    total = sum(own for own, _ in own_times) or 1e-9
+    shares = {"sleep": 0.0, "io": 0.0, "cpu": 0.0}
+    for own, function in own_times:
+        shares[categorize(function)] += own
+
+    lines = ["total {:.3f} s: sleep {:.3f} s ({:.0%}), I/O {:.3f} s ({:.0%}), "
+             "CPU {:.3f} s ({:.0%})".format(total,
+                                            shares["sleep"], shares["sleep"] / total,
+                                            shares["io"], shares["io"] / total,
+                                            shares["cpu"], shares["cpu"] / total),
+             "top functions by own time:"]
+    for own, function in sorted(own_times, key=lambda item: item[0], reverse=True)[:top]:
+        lines.append("  {:9.3f} s {:6.1%}  {:5}  {}".format(own, own / total,
+                                                             categorize(function),
+                                                             _describe(function)))
+    return lines
+
+
+def summarize_memory(snapshot, peak, top=PROFILE_TOP):
+    """
+    :param snapshot: tracemalloc.Snapshot
+    :param peak: peak traced memory in bytes
+    :param top: number of hot spots
+    :return: report lines with allocation sites holding most memory
+    """
+    statistics = snapshot.statistics("lineno")
+    lines = ["peak {:.1f} KiB, {:.1f} KiB allocated at exit".format(
+        peak / 1024.0, sum(stat.size for stat in statistics) / 1024.0),
+             "top allocation sites:"]
+    for stat in statistics[:top]:
+        frame = stat.traceback[0]
+        lines.append("  {:9.1f} KiB {:7d} blocks  {}:{}".format(
+            stat.size / 1024.0, stat.count, frame.filename, frame.lineno))
+    return lines
+
+
+def profile_call(mode, func, emit, output=None, top=PROFILE_TOP):
+    """
+    Run func under cProfile or tracemalloc, dump the result and report the hot spots.
+    The report is emitted also when func raises.
+    :param mode: cpu or mem
+    :param func: callable without arguments
+    :param emit: callable taking one report line
+    :param output: file the pstats or tracemalloc snapshot is dumped to,
+    PROFILE_OUTPUTS default if None
+    :param top: number of hot spots in the report
+    :return: func return value
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError("Unknown profile mode {}, use one of {}".format(
+            mode, ", ".join(PROFILE_MODES)))
+    output = output or PROFILE_OUTPUTS[mode]
+
+    if mode == "cpu":
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func)
+        finally:
+            profiler.dump_stats(output)
+            emit("CPU profile written to {}".format(output))
+            for line in summarize_cpu(pstats.Stats(profiler), top):
+                emit(line)
+
+    try:
+        import tracemalloc
+    except ImportError:
+        raise ValueError("Memory profiling requires python 3.4 or newer")
+    tracemalloc.start()
+    try:
+        return func()
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        snapshot.dump(output)
+        emit("Memory snapshot written to {}".format(output))
+        for line in summarize_memory(snapshot, peak, top):
+            emit(line)
@@ -0,0 +1,87 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import logging
+import re
+
+import six
+
+from mbed_flasher.common import FlashError, monotonic
+from mbed_flasher.return_codes import EXIT_CODE_BOOT_BANNER_TIMEOUT
+
+BOOT_BANNER_TIMEOUT = 10
+BOOT_PROBE_READ_TIMEOUT = 0.05
+# Bytes kept from previous reads so that a banner split over two reads still matches
+BOOT_PROBE_WINDOW = 1024
+
+
+class ReadinessProbe(object):
+    """
+    Wait for a boot banner to appear in the serial output of a freshly reset target.
+    """
+    def __init__(self, banner, timeout=BOOT_BANNER_TIMEOUT, logger=None):
+        """
+        :param banner: regular expression matched against the serial output
+        :param timeout: seconds to wait for the banner after reset
+        :param logger: logger object
+        """
+        self.logger = logger if logger else logging.getLogger('mbed-flasher')
+        if isinstance(banner, six.text_type):
+            banner = banner.encode('utf-8')
+        self.pattern = re.compile(banner)
+        self.timeout = timeout
+        self.latency = None
+
+    def wait(self, port, start=None):
+        """
+        Stream output from an open serial port until the banner is seen or the deadline expires.
+        :param port: open serial port, read right after the reset was given
+        :param start: monotonic time of the reset, defaults to now
+        :return: boot latency in seconds, None if the banner was not seen
+        """
+        if start is None:
+            start = monotonic()
+        deadline = start + self.timeout
+        port.timeout = BOOT_PROBE_READ_TIMEOUT
+        window = b""
+        self.latency = None
+
+        while monotonic() < deadline:
+            chunk = port.read(max(1, port.in_waiting))
+            if not chunk:
+                continue
+
+            window += chunk
+            if self.pattern.search(window):
+                self.latency = monotonic() - start
+                self.logger.info("boot banner seen after %.3f seconds", self.latency)
+                return self.latency
+
+            window = window[-BOOT_PROBE_WINDOW:]
+
+        self.logger.warning("boot banner not seen within %s seconds", self.timeout)
+        return None
+
+    def raise_if_not_ready(self):
+        """
+        Raise if the last wait did not see the banner.
+        :return: None on success, raise FlashError otherwise
+        """
+        if self.latency is None:
+            msg = "Boot banner '{}' not seen within {} seconds".format(
+                self.pattern.pattern.decode('utf-8', 'replace'), self.timeout)
+            self.logger.error(msg)
+            raise FlashError(message=msg, return_code=EXIT_CODE_BOOT_BANNER_TIMEOUT)
@@ -19,16 +19,14 @@ limitations under the License.
 
 import logging
 
-from serial.serialutil import SerialException
-from mbed_flasher.flashers.enhancedserial import EnhancedSerial
 from mbed_flasher.common import ResetError
 from mbed_flasher.mbed_common import MbedCommon
+from mbed_flasher.metrics import count_operation
+from mbed_flasher.reset_methods import get_reset_method, PyOCDReset, RESET_STATISTICS
 from mbed_flasher.return_codes import EXIT_CODE_SUCCESS
 from mbed_flasher.return_codes import EXIT_CODE_COULD_NOT_MAP_TARGET_ID_TO_DEVICE
-from mbed_flasher.return_codes import EXIT_CODE_MISUSE_CMD
-from mbed_flasher.return_codes import EXIT_CODE_SERIAL_PORT_OPEN_FAILED
-from mbed_flasher.return_codes import EXIT_CODE_SERIAL_RESET_FAILED
 from mbed_flasher.return_codes import EXIT_CODE_TARGET_ID_MISSING
+from mbed_flasher.timings import TRACER
 
 
 class Reset(object):
@@ -36,50 +34,62 @@ class Reset(object):
     """
     _flashers = []
 
-    def __init__(self, logger=None):
+    def __init__(self, logger=None, session_pool=None):
+        """
+        :param logger: logger object
+        :param session_pool: SessionPool reused by pyocd method resets
+        """
         self.logger = logger if logger else logging.getLogger("mbed-flasher")
+        self.session_pool = session_pool
+        self.latency = None
+        self.target = None
 
-    def reset_board(self, serial_port):
+    @TRACER.timed("Reset.reset_board")
+    def reset_board(self, serial_port, boot_probe=None, method='simple', duration=None):
         """
         :param serial_port: serial port
+        :param boot_probe: optional ReadinessProbe to run on the port right after the reset
+        :param method: serial reset method, one of RESET_METHODS
+        :param duration: seconds the reset signal is held, method default if None
         :return: return exit code if failed
         """
+        self.reset_target({"serial_port": serial_port}, method, duration, boot_probe)
+
+    def reset_target(self, target, method='simple', duration=None, boot_probe=None, **options):
+        """
+        Reset an already resolved target and record the reset latency.
+        :param target: mbedls given target dictionary
+        :param method: reset method, one of RESET_METHODS
+        :param duration: seconds the reset signal is held, method default if None
+        :param boot_probe: optional ReadinessProbe to run right after the reset
+        :param options: method specific options, e.g. reset_type and platform for pyocd
+        :return: None on success, raises ResetError otherwise
+        """
+        if method == PyOCDReset.name:
+            options.setdefault("session_pool", self.session_pool)
+        reset_method = get_reset_method(method, logger=self.logger, duration=duration,
+                                        **options)
+        platform_name = target.get("platform_name")
         try:
-            port = EnhancedSerial(serial_port)
-        except SerialException as err:
-            self.logger.info("reset could not be sent")
-            self.logger.error(err)
-            # SerialException.message is type "string"
-            # pylint: disable=no-member
-            if err.message.find('could not open port') != -1:
-                self.logger.error(
-                    "Reset could not be given. Close your Serial connection to device.")
-
-            raise ResetError(message="Reset failed",
-                             return_code=EXIT_CODE_SERIAL_PORT_OPEN_FAILED)
-
-        port.baudrate = 115200
-        port.timeout = 1
-        port.xonxoff = False
-        port.rtscts = False
-        port.flushInput()
-        port.flushOutput()
-
-        if port:
-            self.logger.info("sendBreak to device to reboot")
-            result = port.safe_send_break()
-            if result:
-                self.logger.info("reset completed")
-            else:
-                raise ResetError(message="Reset failed",
-                                 return_code=EXIT_CODE_SERIAL_RESET_FAILED)
-
-        port.close()
-
-    def reset(self, target_id=None, method=None):
+            reset_method.reset(target, boot_probe=boot_probe)
+        except ResetError:
+            RESET_STATISTICS.record(platform_name, method, None)
+            raise
+
+        self.latency = reset_method.latency
+        RESET_STATISTICS.record(platform_name, method, self.latency)
+
+    # pylint: disable=too-many-arguments
+    @count_operation("reset")
+    def reset(self, target_id=None, method=None, duration=None,
+              pyocd_platform=None, pyocd_pack=None, pyocd_reset_type=None):
         """Reset (mbed) device
         :param target_id: target_id
         :param method: method for reset i.e. simple
+        :param duration: seconds the reset signal is held, method default if None
+        :param pyocd_platform: target platform to pyocd, detected from the board if None
+        :param pyocd_pack: pack file path to pyocd
+        :param pyocd_reset_type: hw, sw or emulated, only used with pyocd method
         """
         if target_id is None:
             raise ResetError(message="target_id is missing",
@@ -87,15 +97,17 @@ class Reset(object):
 
         self.logger.info("Starting reset for target_id %s", target_id)
         self.logger.info("Method for reset: %s", method)
-        target_mbed = MbedCommon.refresh_target(target_id)
+        target_mbed = self.target = MbedCommon.refresh_target(target_id)
         if target_mbed is None:
             raise ResetError(message="Did not find target: {}".format(target_id),
                              return_code=EXIT_CODE_COULD_NOT_MAP_TARGET_ID_TO_DEVICE)
 
-        if method == 'simple' and 'serial_port' in target_mbed:
-            self.reset_board(target_mbed['serial_port'])
-        else:
-            raise ResetError(message="Selected method {} not supported".format(method),
-                             return_code=EXIT_CODE_MISUSE_CMD)
+        method = method or 'simple'
+        options = {}
+        if method == PyOCDReset.name:
+            options = {"platform": pyocd_platform, "pack": pyocd_pack}
+            if pyocd_reset_type:
+                options["reset_type"] = pyocd_reset_type
+        self.reset_target(target_mbed, method, duration, **options)
 
         return EXIT_CODE_SUCCESS
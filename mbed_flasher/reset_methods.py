@@ -0,0 +1,244 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import logging
+from time import sleep
+
+from serial.serialutil import SerialException
+from mbed_flasher.flashers.enhancedserial import EnhancedSerial, BREAK_DURATION
+from mbed_flasher.flashers.FlasherPyOCD import FlasherPyOCD, ConnectMode, DEFAULT_RESET_TYPE
+from mbed_flasher.common import ResetError, monotonic
+from mbed_flasher.return_codes import EXIT_CODE_MISUSE_CMD
+from mbed_flasher.return_codes import EXIT_CODE_SERIAL_PORT_MISSING
+from mbed_flasher.return_codes import EXIT_CODE_SERIAL_PORT_OPEN_FAILED
+from mbed_flasher.return_codes import EXIT_CODE_SERIAL_RESET_FAILED
+from mbed_flasher.statistics import OperationStatistics
+
+PULSE_DURATION = 0.1
+RESET_BAUDRATE = 115200
+RESET_STATISTICS_SIZE = 100
+
+
+class ResetMethod(object):
+    """
+    Base class for reset methods.
+    Subclasses implement reset() and store the time the reset took in latency.
+    """
+    name = None
+    default_duration = None
+
+    def __init__(self, logger=None, duration=None):
+        """
+        :param logger: logger object
+        :param duration: seconds the reset signal is held, method default if None
+        """
+        self.logger = logger if logger else logging.getLogger("mbed-flasher")
+        self.duration = self.default_duration if duration is None else duration
+        self.latency = None
+
+    def reset(self, target, boot_probe=None):
+        """
+        Reset target.
+        :param target: mbedls given target dictionary
+        :param boot_probe: optional ReadinessProbe to run right after the reset
+        :return: None on success, raises ResetError otherwise
+        """
+        raise NotImplementedError
+
+    def open_port(self, serial_port):
+        """
+        Open and configure the serial port in one go.
+        :param serial_port: serial port
+        :return: EnhancedSerial
+        """
+        try:
+            return EnhancedSerial(serial_port, baudrate=RESET_BAUDRATE, timeout=1,
+                                  xonxoff=False, rtscts=False)
+        except SerialException as err:
+            self.logger.info("reset could not be sent")
+            self.logger.error(err)
+            if str(err).find('could not open port') != -1:
+                self.logger.error(
+                    "Reset could not be given. Close your Serial connection to device.")
+
+            raise ResetError(message="Reset failed",
+                             return_code=EXIT_CODE_SERIAL_PORT_OPEN_FAILED)
+
+
+class SerialResetMethod(ResetMethod):
+    """
+    Reset method driving a signal on the target serial port.
+    """
+    def reset(self, target, boot_probe=None):
+        if not target.get("serial_port"):
+            raise ResetError(message="serial port missing from target",
+                             return_code=EXIT_CODE_SERIAL_PORT_MISSING)
+
+        port = self.open_port(target["serial_port"])
+        try:
+            port.flushInput()
+            port.flushOutput()
+            start = monotonic()
+            self.apply(port)
+            self.latency = monotonic() - start
+            self.logger.info("reset completed in %.3f seconds", self.latency)
+
+            if boot_probe is not None:
+                boot_probe.wait(port)
+        finally:
+            port.close()
+
+    def apply(self, port):
+        """
+        Drive the reset signal on an open port.
+        :param port: open EnhancedSerial
+        """
+        raise NotImplementedError
+
+
+class BreakReset(SerialResetMethod):
+    """
+    Reset by holding a serial break condition, DAPLink resets the target on break.
+    """
+    name = "break"
+    default_duration = BREAK_DURATION
+
+    def apply(self, port):
+        self.logger.info("sendBreak to device to reboot")
+        if not port.safe_send_break(self.duration):
+            raise ResetError(message="Reset failed",
+                             return_code=EXIT_CODE_SERIAL_RESET_FAILED)
+
+
+class PulseReset(SerialResetMethod):
+    """
+    Reset by pulsing a modem control line wired to the target reset pin.
+    """
+    default_duration = PULSE_DURATION
+    line = None
+
+    def apply(self, port):
+        self.logger.info("pulsing %s to reboot device", self.line.upper())
+        try:
+            setattr(port, self.line, True)
+            sleep(self.duration)
+            setattr(port, self.line, False)
+        except (SerialException, IOError, OSError) as error:
+            self.logger.error(error)
+            raise ResetError(message="Reset failed",
+                             return_code=EXIT_CODE_SERIAL_RESET_FAILED)
+
+
+class DtrReset(PulseReset):
+    """
+    Reset by pulsing DTR.
+    """
+    name = "dtr"
+    line = "dtr"
+
+
+class RtsReset(PulseReset):
+    """
+    Reset by pulsing RTS.
+    """
+    name = "rts"
+    line = "rts"
+
+
+class PyOCDReset(ResetMethod):
+    """
+    Reset through the debug probe with pyOCD, the serial port is not needed.
+    """
+    name = "pyocd"
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, logger=None, duration=None, reset_type=DEFAULT_RESET_TYPE,
+                 platform=None, pack=None, connect_mode=ConnectMode.ATTACH.value,
+                 session_pool=None):
+        """
+        :param logger: logger object
+        :param duration: not used, pyOCD controls the reset timing
+        :param reset_type: hw, sw or emulated
+        :param platform: pyOCD target platform, detected from the board if None
+        :param pack: path of pack file
+        :param connect_mode: mode used when connecting
+        :param session_pool: SessionPool to take the pyOCD session from
+        """
+        super(PyOCDReset, self).__init__(logger=logger, duration=duration)
+        self.reset_type = reset_type
+        self.platform = platform
+        self.pack = pack
+        self.connect_mode = connect_mode
+        self.session_pool = session_pool
+
+    def reset(self, target, boot_probe=None):
+        port = None
+        if boot_probe is not None:
+            if target.get("serial_port"):
+                # Opened before the reset so that the start of the boot output is not lost
+                port = self.open_port(target["serial_port"])
+            else:
+                self.logger.warning("serial port missing, boot banner can not be read")
+
+        try:
+            start = monotonic()
+            FlasherPyOCD(logger=self.logger, session_pool=self.session_pool).reset(
+                target, platform=self.platform, pack=self.pack,
+                connect_mode=self.connect_mode, reset_type=self.reset_type)
+            self.latency = monotonic() - start
+            self.logger.info("reset completed in %.3f seconds", self.latency)
+
+            if port is not None:
+                boot_probe.wait(port)
+        finally:
+            if port is not None:
+                port.close()
+
+
+RESET_METHODS = {
+    "simple": BreakReset,
+    BreakReset.name: BreakReset,
+    DtrReset.name: DtrReset,
+    RtsReset.name: RtsReset,
+    PyOCDReset.name: PyOCDReset,
+}
+
+
+def get_reset_method(name, logger=None, duration=None, **options):
+    """
+    Create a reset method by name.
+    :param name: one of RESET_METHODS keys
+    :param logger: logger object
+    :param duration: seconds the reset signal is held, method default if None
+    :param options: method specific options, e.g. reset_type and platform for pyocd
+    :return: ResetMethod instance, raises ResetError for unknown methods
+    """
+    if name not in RESET_METHODS:
+        raise ResetError(message="Selected method {} not supported".format(name),
+                         return_code=EXIT_CODE_MISUSE_CMD)
+    return RESET_METHODS[name](logger=logger, duration=duration, **options)
+
+
+class ResetStatistics(OperationStatistics):
+    """
+    Latest reset latencies in seconds and failures per board family and reset method,
+    the fastest method has the lowest median latency.
+    """
+    def __init__(self, size=RESET_STATISTICS_SIZE):
+        OperationStatistics.__init__(self, size, higher_is_better=False)
+
+
+RESET_STATISTICS = ResetStatistics()
@@ -0,0 +1,117 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from collections import defaultdict, deque
+import random
+import threading
+
+from mbed_flasher.common import monotonic
+from mbed_flasher.return_codes import EXIT_CODE_DAPLINK_SOFTWARE_ERROR
+from mbed_flasher.return_codes import EXIT_CODE_DAPLINK_TRANSIENT_ERROR
+from mbed_flasher.return_codes import EXIT_CODE_OS_ERROR
+
+RETRY_BACKOFF = 1.0
+RETRY_MAX_BACKOFF = 16.0
+RETRY_JITTER = 0.25
+RETRY_BUDGET_WINDOW = 3600
+
+RETRYABLE_RETURN_CODES = frozenset([
+    EXIT_CODE_DAPLINK_TRANSIENT_ERROR,
+])
+# Failures that are not always transient, retried only when the caller opts in
+EXTENDED_RETRYABLE_RETURN_CODES = RETRYABLE_RETURN_CODES | frozenset([
+    EXIT_CODE_DAPLINK_SOFTWARE_ERROR,
+    EXIT_CODE_OS_ERROR,
+])
+
+
+class RetryBudget(object):
+    """
+    Limits retries per target within a sliding time window,
+    so that a broken board can not keep a pipeline busy with retries.
+    """
+    def __init__(self, retries, window=RETRY_BUDGET_WINDOW):
+        """
+        :param retries: retries allowed per target within window
+        :param window: window length in seconds
+        """
+        self.retries = retries
+        self.window = window
+        self._lock = threading.Lock()
+        self._used = defaultdict(deque)
+
+    def consume(self, target_id):
+        """
+        Take one retry from the target budget.
+        :param target_id: target id
+        :return: True if the retry is allowed
+        """
+        now = monotonic()
+        with self._lock:
+            used = self._used[target_id]
+            while used and now - used[0] > self.window:
+                used.popleft()
+            if len(used) >= self.retries:
+                return False
+            used.append(now)
+            return True
+
+
+# pylint: disable=too-few-public-methods
+class RetryPolicy(object):
+    """
+    When and how failed flash attempts are retried. Default policy does not retry.
+    """
+    # pylint: disable=too-many-arguments
+    def __init__(self, attempts=1, backoff=RETRY_BACKOFF, max_backoff=RETRY_MAX_BACKOFF,
+                 jitter=RETRY_JITTER, reset_between=False, budget=None,
+                 retryable=RETRYABLE_RETURN_CODES):
+        """
+        :param attempts: maximum number of attempts, 1 disables retrying
+        :param backoff: seconds to wait before the first retry, doubled for each retry
+        :param max_backoff: upper limit of the wait before jitter
+        :param jitter: relative random variation of the wait, 0.25 gives +-25%
+        :param reset_between: reset the target before retrying
+        :param budget: RetryBudget shared between operations, unlimited if None
+        :param retryable: return codes that are retried, DAPLink transient errors by default,
+        EXTENDED_RETRYABLE_RETURN_CODES adds DAPLink software errors and OS errors
+        """
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.reset_between = reset_between
+        self.budget = budget
+        self.retryable = frozenset(retryable)
+
+    def should_retry(self, error, attempt, target_id):
+        """
+        :param error: FlashError of the failed attempt
+        :param attempt: number of the failed attempt, starting from 1
+        :param target_id: target id
+        :return: True if another attempt is made
+        """
+        if attempt >= self.attempts or error.return_code not in self.retryable:
+            return False
+        return self.budget is None or self.budget.consume(target_id)
+
+    def delay(self, attempt):
+        """
+        :param attempt: number of the failed attempt, starting from 1
+        :return: seconds to wait before the next attempt
+        """
+        delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
@@ -28,6 +28,7 @@ EXIT_CODE_KEYBOARD_INTERRUPT = 12
 EXIT_CODE_SYSTEM_INTERRUPT = 13
 EXIT_CODE_FLASH_FAILED = 14
 EXIT_CODE_RESET_FAIL = 15
+EXIT_CODE_VERIFY_FAILED = 16
 EXIT_CODE_FILE_COULD_NOT_BE_READ = 17
 EXIT_CODE_TARGET_ID_CONFLICT = 18
 
@@ -47,6 +48,13 @@ EXIT_CODE_SERIAL_PORT_OPEN_FAILED = 40
 EXIT_CODE_SERIAL_RESET_FAILED = 41
 EXIT_CODE_SERIAL_PORT_MISSING = 42
 EXIT_CODE_SERIAL_PORT_REAPPEAR_TIMEOUT = 43
+EXIT_CODE_BOOT_BANNER_TIMEOUT = 44
+
+# image related failure codes
+EXIT_CODE_IMAGE_CORRUPTED = 60
+EXIT_CODE_IMAGE_OUT_OF_RANGE = 61
+EXIT_CODE_IMAGE_INVALID_VECTOR_TABLE = 62
+EXIT_CODE_IMAGE_OVERLAP = 63
 
 # Mount point related failure codes
 EXIT_CODE_MOUNT_POINT_MISSING = 50
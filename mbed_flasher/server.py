@@ -0,0 +1,504 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from collections import defaultdict
+import itertools
+import json
+import logging
+import os
+import socket
+import stat
+import tempfile
+import threading
+
+from six.moves import socketserver
+
+from mbed_flasher.api import FlasherAPI, OperationResult
+from mbed_flasher.common import FlashError
+from mbed_flasher.flashers.session_pool import SessionPool
+from mbed_flasher.image_compose import parse_image_spec
+from mbed_flasher.mbed_common import share_board_detect
+from mbed_flasher.retry import RetryPolicy
+from mbed_flasher.return_codes import EXIT_CODE_OS_ERROR
+from mbed_flasher.return_codes import EXIT_CODE_UNHANDLED_EXCEPTION
+
+OPERATIONS = ("flash", "erase", "reset", "run")
+SERVER_CONCURRENCY = 8
+SERVER_CONNECT_TIMEOUT = 0.5
+RETRY_POLICY_FIELDS = ("attempts", "backoff", "max_backoff", "jitter", "reset_between",
+                       "retryable")
+SOCKET_DIR_MODE = 0o700
+SOCKET_MODE = 0o600
+
+
+def default_address():
+    """
+    :return: Unix socket path of the server of this user, in XDG_RUNTIME_DIR or in a
+    directory of the user in the temporary directory, localhost port on Windows
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return "127.0.0.1:8765"
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, "mbedflash.sock")
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return os.path.join(tempfile.gettempdir(), "mbedflash-{}".format(uid), "server.sock")
+
+
+def _owned_error(message):
+    return FlashError(message=message, return_code=EXIT_CODE_OS_ERROR)
+
+
+def check_socket_dir(directory):
+    """
+    Check that other users can not replace sockets in the directory: it belongs to this
+    user or root and is writable only by its owner, unless it has the sticky bit like /tmp.
+    :param directory: directory of a Unix socket
+    :return: None, raises FlashError otherwise
+    """
+    if not hasattr(os, "getuid"):
+        return
+    directory_stat = os.stat(directory)
+    if directory_stat.st_uid not in (os.getuid(), 0):
+        raise _owned_error("Socket directory {} is owned by another user".format(directory))
+    shared = directory_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+    if shared and not directory_stat.st_mode & stat.S_ISVTX:
+        raise _owned_error("Socket directory {} is writable by other users".format(directory))
+
+
+def check_socket_owner(path):
+    """
+    Check that the socket belongs to this user and is in a directory checked by
+    check_socket_dir.
+    :param path: Unix socket path
+    :return: None, raises FlashError otherwise
+    """
+    if not hasattr(os, "getuid"):
+        return
+    check_socket_dir(os.path.dirname(os.path.abspath(path)))
+    if os.stat(path).st_uid != os.getuid():
+        raise _owned_error("Socket {} is owned by another user".format(path))
+
+
+def _make_socket_dir(path):
+    """
+    Create the directory of the socket accessible only to this user if it does not exist,
+    raises FlashError if other users can replace the socket.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(directory):
+        os.makedirs(directory, SOCKET_DIR_MODE)
+        # makedirs mode is masked by umask
+        os.chmod(directory, SOCKET_DIR_MODE)
+    check_socket_dir(directory)
+
+
+def parse_address(address):
+    """
+    :param address: host:port for TCP, anything else is a Unix socket path
+    :return: tuple of socket family and socket address
+    """
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit() and os.sep not in address:
+        return socket.AF_INET, (host, int(port))
+    return socket.AF_UNIX, address
+
+
+def _absolute_spec(spec):
+    path, address = parse_image_spec(spec)
+    path = os.path.abspath(path)
+    return path if address is None else "{}@0x{:x}".format(path, address)
+
+
+def encode_args(args):
+    """
+    Turn operation arguments into JSON values, image paths become absolute as the server
+    runs in another working directory.
+    :param args: dictionary of FlasherAPI operation arguments
+    :return: dictionary
+    """
+    encoded = dict(args)
+    if isinstance(encoded.get("build"), (list, tuple)):
+        encoded["build"] = [_absolute_spec(spec) for spec in encoded["build"]]
+    elif encoded.get("build"):
+        encoded["build"] = os.path.abspath(encoded["build"])
+    if encoded.get("erase_image"):
+        encoded["erase_image"] = os.path.abspath(encoded["erase_image"])
+    policy = encoded.get("retry_policy")
+    if isinstance(policy, RetryPolicy):
+        encoded["retry_policy"] = dict((name, getattr(policy, name))
+                                       for name in RETRY_POLICY_FIELDS)
+        encoded["retry_policy"]["retryable"] = sorted(policy.retryable)
+    return encoded
+
+
+def decode_args(args):
+    """
+    :param args: dictionary from encode_args
+    :return: dictionary of FlasherAPI operation arguments
+    """
+    decoded = dict(args)
+    if isinstance(decoded.get("retry_policy"), dict):
+        decoded["retry_policy"] = RetryPolicy(**decoded["retry_policy"])
+    return decoded
+
+
+# pylint: disable=too-few-public-methods
+class _Job(object):
+    """
+    Queued operation, clients submitting the same operation share it.
+    """
+    def __init__(self, number, operation, args):
+        self.number = number
+        self.operation = operation
+        self.args = args
+        self.key = (operation, json.dumps(args, sort_keys=True))
+        self.listeners = []
+        self.result = None
+        self.done = threading.Event()
+
+
+# Queue state, the shared API and the listening socket are all owned by the server
+# pylint: disable=too-many-instance-attributes
+class FlashServer(object):
+    """
+    Runs flash, erase, reset and run jobs for clients of a local socket. Jobs are queued
+    per target, a job identical to one still waiting in the queue of its target is
+    coalesced with it.
+    Board detector and pyOCD sessions are kept open between jobs.
+    """
+    def __init__(self, address=None, concurrency=SERVER_CONCURRENCY, logger=None,
+                 session_pool=None):
+        """
+        :param address: Unix socket path or host:port, default_address() by default
+        :param concurrency: maximum number of jobs run at the same time
+        :param logger: logger object
+        :param session_pool: SessionPool for pyocd method jobs, a new one by default
+        """
+        self.address = address if address else default_address()
+        self.logger = logger if logger else logging.getLogger("mbed-flasher")
+        self.session_pool = session_pool if session_pool else SessionPool(logger=self.logger)
+        self.api = FlasherAPI(logger=self.logger, session_pool=self.session_pool)
+        self._running = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self._pending = defaultdict(list)
+        self._workers = {}
+        self._numbers = itertools.count(1)
+        self._server = None
+        self._thread = None
+
+    def submit(self, operation, args, listener=None):
+        """
+        Queue a job.
+        :param operation: flash, erase, reset or run
+        :param args: dictionary of FlasherAPI operation arguments, JSON values
+        :param listener: callable receiving status event dictionaries of the job
+        :return: _Job, wait for job.done and read job.result
+        """
+        if operation not in OPERATIONS:
+            raise ValueError("Unknown operation: {}".format(operation))
+        target_id = args.get("target_id")
+        # Under the lock so that the queued event is sent before the started event
+        with self._lock:
+            pending = self._pending[target_id]
+            job = None
+            for queued in pending:
+                if queued.key == (operation, json.dumps(args, sort_keys=True)):
+                    job = queued
+                    break
+            coalesced = job is not None
+            if not coalesced:
+                job = _Job(next(self._numbers), operation, args)
+                pending.append(job)
+            if listener:
+                job.listeners.append(listener)
+            position = pending.index(job)
+            if target_id not in self._workers:
+                worker = threading.Thread(target=self._work, args=(target_id,),
+                                          name="mbedflash-target-{}".format(target_id))
+                worker.daemon = True
+                self._workers[target_id] = worker
+                worker.start()
+            if listener:
+                self._notify([listener], {"event": "queued", "job": job.number,
+                                          "position": position, "coalesced": coalesced})
+
+        self.logger.info("%s job %d for %s queued%s", operation, job.number, target_id,
+                         " with an identical job" if coalesced else "")
+        return job
+
+    def _work(self, target_id):
+        while True:
+            with self._lock:
+                pending = self._pending[target_id]
+                if not pending:
+                    del self._pending[target_id]
+                    del self._workers[target_id]
+                    return
+                job = pending[0]
+
+            with self._running:
+                # Job stays first in the queue until it starts, so it still coalesces
+                with self._lock:
+                    self._pending[target_id].pop(0)
+                    listeners = list(job.listeners)
+                self._notify(listeners, {"event": "started", "job": job.number})
+                job.result = self._run(job)
+
+            with self._lock:
+                listeners = list(job.listeners)
+            self._notify(listeners, {"event": "finished", "job": job.number,
+                                     "result": job.result.as_dict()})
+            job.done.set()
+
+    def _run(self, job):
+        # pylint: disable=broad-except
+        try:
+            return getattr(self.api, job.operation)(**decode_args(job.args))
+        except Exception as error:
+            # e.g. an argument the operation does not have
+            result = OperationResult(job.operation, job.args.get("target_id"))
+            result.return_code = EXIT_CODE_UNHANDLED_EXCEPTION
+            result.message = str(error)
+            return result
+
+    def _notify(self, listeners, event):
+        for listener in listeners:
+            # pylint: disable=broad-except
+            try:
+                listener(event)
+            except Exception as error:
+                # Client went away, the job is run anyway
+                self.logger.debug("Could not send job status: %s", error)
+
+    def start(self):
+        """
+        Start serving in a background thread.
+        :raises FlashError: if a server already serves the address
+        """
+        family, address = parse_address(self.address)
+        if family == socket.AF_UNIX:
+            _make_socket_dir(address)
+        if family == socket.AF_UNIX and os.path.exists(address):
+            if ServerClient(self.address).available():
+                raise FlashError(message="Server already running at {}".format(self.address),
+                                 return_code=EXIT_CODE_OS_ERROR)
+            # Left behind by a server that did not stop cleanly
+            os.remove(address)
+
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            """
+            Reads one JSON request line, writes JSON status lines until the job is finished.
+            """
+            def handle(self):
+                server.handle(self.rfile, self.wfile)
+
+        if family == socket.AF_UNIX:
+            self._server = socketserver.ThreadingUnixStreamServer(address, Handler)
+            os.chmod(address, SOCKET_MODE)
+        else:
+            socketserver.ThreadingTCPServer.allow_reuse_address = True
+            self._server = socketserver.ThreadingTCPServer(address, Handler)
+        self._server.daemon_threads = True
+        share_board_detect()
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="mbedflash-server")
+        self._thread.daemon = True
+        self._thread.start()
+        self.logger.info("Serving at %s", self.address)
+
+    def stop(self):
+        """
+        Stop serving and close pyOCD sessions, queued jobs are not run.
+        """
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+        family, address = parse_address(self.address)
+        if family == socket.AF_UNIX and os.path.exists(address):
+            os.remove(address)
+        share_board_detect(False)
+        self.session_pool.close_all()
+
+    def serve_forever(self):
+        """
+        Serve until interrupted.
+        """
+        self.start()
+        try:
+            while self._thread.is_alive():
+                self._thread.join(1)
+        except KeyboardInterrupt:
+            self.logger.info("Stopping server")
+        finally:
+            self.stop()
+
+    def handle(self, rfile, wfile):
+        """
+        Serve one client connection.
+        :param rfile: readable file of the connection
+        :param wfile: writable file of the connection
+        """
+        write_lock = threading.Lock()
+
+        def send(event):
+            with write_lock:
+                wfile.write((json.dumps(event) + "\n").encode("utf-8"))
+                wfile.flush()
+
+        try:
+            request = json.loads(rfile.readline().decode("utf-8"))
+            if request.get("operation") == "ping":
+                send({"event": "pong"})
+                return
+            job = self.submit(request.get("operation"), request.get("args", {}), send)
+        except (ValueError, AttributeError) as error:
+            send({"event": "error", "message": str(error)})
+            return
+        job.done.wait()
+
+
+class ServerClient(object):
+    """
+    Forwards operations to a FlashServer, same interface as FlasherAPI.
+    """
+    def __init__(self, address=None, logger=None):
+        """
+        :param address: Unix socket path or host:port, default_address() by default
+        :param logger: logger object, status events are logged at info level
+        """
+        self.address = address if address else default_address()
+        self.logger = logger if logger else logging.getLogger("mbed-flasher")
+
+    def _connect(self, timeout=None):
+        family, address = parse_address(self.address)
+        if family == socket.AF_UNIX and os.path.exists(address):
+            # Jobs contain image paths, do not hand them to a socket of another user
+            check_socket_owner(address)
+        connection = socket.socket(family, socket.SOCK_STREAM)
+        connection.settimeout(timeout)
+        try:
+            connection.connect(address)
+        except (IOError, OSError):
+            connection.close()
+            raise
+        return connection
+
+    def available(self):
+        """
+        :return: True if a server answers at the address, raises FlashError if the socket
+        belongs to another user
+        """
+        try:
+            return self._request({"operation": "ping"},
+                                 timeout=SERVER_CONNECT_TIMEOUT)[-1]["event"] == "pong"
+        except (IOError, OSError, ValueError, IndexError):
+            return False
+
+    def _request(self, request, timeout=None):
+        connection = self._connect(timeout)
+        events = []
+        try:
+            connection.sendall((json.dumps(request) + "\n").encode("utf-8"))
+            for line in connection.makefile("rb"):
+                event = json.loads(line.decode("utf-8"))
+                events.append(event)
+                self._log(event)
+                if event["event"] in ("pong", "error", "finished"):
+                    break
+        finally:
+            connection.close()
+        return events
+
+    def _log(self, event):
+        if event["event"] == "queued":
+            self.logger.info("Job %d queued at position %d%s", event["job"], event["position"],
+                             " with an identical job" if event["coalesced"] else "")
+        elif event["event"] == "started":
+            self.logger.info("Job %d started", event["job"])
+        elif event["event"] == "finished":
+            self.logger.info("Job %d finished with return code %d", event["job"],
+                             event["result"]["return_code"])
+
+    def submit(self, operation, target_id=None, **args):
+        """
+        Run an operation in the server and wait for it.
+        :param operation: flash, erase, reset or run
+        :param target_id: target id
+        :param args: other operation arguments
+        :return: OperationResult
+        """
+        args["target_id"] = target_id
+        events = self._request({"operation": operation, "args": encode_args(args)})
+        event = events[-1] if events else {"event": "error",
+                                           "message": "Server closed the connection"}
+        if event["event"] == "error":
+            result = OperationResult(operation, target_id, args.get("method"))
+            result.return_code = EXIT_CODE_UNHANDLED_EXCEPTION
+            result.message = event["message"]
+        else:
+            result = OperationResult.from_dict(event["result"])
+        return result
+
+    def flash(self, build, target_id=None, **options):
+        """
+        :param build: image file path
+        :param target_id: target id
+        :param options: other Flash.flash arguments
+        :return: OperationResult
+        """
+        return self.submit("flash", target_id, build=build, **options)
+
+    def erase(self, target_id=None, **options):
+        """
+        :param target_id: target id
+        :param options: other Erase.erase arguments
+        :return: OperationResult
+        """
+        return self.submit("erase", target_id, **options)
+
+    def reset(self, target_id=None, **options):
+        """
+        :param target_id: target id
+        :param options: other Reset.reset arguments
+        :return: OperationResult
+        """
+        return self.submit("reset", target_id, **options)
+
+    def run(self, steps, target_id=None, **options):
+        """
+        :param steps: comma separated step names or list of them
+        :param target_id: target id
+        :param options: other Pipeline.run arguments
+        :return: OperationResult
+        """
+        return self.submit("run", target_id, steps=steps, **options)
+
+
+def client_if_running(address=None, logger=None):
+    """
+    :param address: server address, default_address() by default
+    :param logger: logger object
+    :return: ServerClient if a server answers at the address, otherwise None. Raises
+    FlashError if the socket belongs to another user
+    """
+    client = ServerClient(address, logger)
+    return client if client.available() else None
@@ -0,0 +1,297 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from collections import deque
+from contextlib import contextmanager
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from mbed_flasher import mbed_common
+
+SIMULATED_PROGRAMMING_DELAY = 0.5
+SIMULATED_REMOUNT_DELAY = 0.2
+SIMULATED_POLL_INTERVAL = 0.02
+SIMULATED_INTERFACE_VERSION = 253
+SIMULATED_TARGET_ID = "0240000032044e4500257009997b00386781000097969900"
+SIMULATED_ERROR = "An error occurred during the transfer"
+
+IMAGE_EXTENSIONS = (".bin", ".hex")
+ERASE_FILE = "ERASE.ACT"
+
+DETAILS_TEMPLATE = """# DAPLink Firmware - see https://mbed.com/daplink
+Unique ID: {target_id}
+HIC ID: 97969900
+Auto Reset: 1
+Automation allowed: 1
+Overflow detection: 0
+Daplink Mode: Interface
+Interface Version: {interface_version:04d}
+Bootloader Version: 0244
+Git SHA: 0000000000000000000000000000000000000000
+Local Mods: 0
+USB Interfaces: MSD, CDC, HID
+Bootloader CRC: 0x00000000
+Interface CRC: 0x00000000
+Remount count: {remount_count}
+"""
+
+MBED_HTM_TEMPLATE = """<!-- mbed Microcontroller Website and Authentication Shortcut -->
+<html>
+<head>
+<meta http-equiv="refresh" content="0; url=https://mbed.org/device/?code={target_id}"/>
+<title>mbed Website Shortcut</title>
+</head>
+<body></body>
+</html>
+"""
+
+
+# pylint: disable=too-many-instance-attributes
+class VirtualDaplink(object):
+    """
+    DAPLink-like mass storage device in a directory. Images dropped to the mount point are
+    consumed after the programming delay, then the mount point disappears for the remount
+    delay and comes back with DETAILS.TXT and MBED.HTM, and FAIL.TXT on an injected error.
+    """
+    # pylint: disable=too-many-arguments
+    def __init__(self, target_id=SIMULATED_TARGET_ID, root=None, platform_name="K64F",
+                 programming_delay=SIMULATED_PROGRAMMING_DELAY,
+                 remount_delay=SIMULATED_REMOUNT_DELAY,
+                 interface_version=SIMULATED_INTERFACE_VERSION, serial=True, logger=None):
+        """
+        :param target_id: target id, also the USB unique id
+        :param root: directory the mount point is created in, temporary directory if None
+        :param platform_name: platform name reported to board detection
+        :param programming_delay: seconds from a dropped image to the remount
+        :param remount_delay: seconds the mount point is missing during the remount
+        :param interface_version: interface version in DETAILS.TXT
+        :param serial: provide a pseudo terminal as the serial port, POSIX only
+        :param logger: logger object
+        """
+        self.logger = logger if logger else logging.getLogger("mbed-flasher")
+        self.target_id = target_id
+        self.platform_name = platform_name
+        self.programming_delay = programming_delay
+        self.remount_delay = remount_delay
+        self.interface_version = interface_version
+        self.serial = serial
+        self.images = []
+        self.erase_count = 0
+        self.remount_count = 0
+        self._root = root
+        self._own_root = root is None
+        self._errors = deque()
+        self._lock = threading.Lock()
+        self._mounted = False
+        self._stop = threading.Event()
+        self._thread = None
+        self._pty = None
+        self.mount_point = None
+        self.serial_port = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        """
+        Mount the device and start consuming dropped files.
+        """
+        if self._own_root:
+            self._root = tempfile.mkdtemp(prefix="daplink-")
+        self.mount_point = os.path.join(self._root, "DAPLINK-" + self.target_id[:8])
+        if self.serial:
+            import pty
+            self._pty = pty.openpty()
+            self.serial_port = os.ttyname(self._pty[1])
+        self._mount()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="daplink-" + self.target_id[:8])
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the device and remove its files.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._pty is not None:
+            for descriptor in self._pty:
+                os.close(descriptor)
+            self._pty = None
+            self.serial_port = None
+        with self._lock:
+            self._mounted = False
+        if self._own_root and self._root:
+            shutil.rmtree(self._root, ignore_errors=True)
+        elif self.mount_point:
+            shutil.rmtree(self.mount_point, ignore_errors=True)
+
+    def inject_error(self, message=SIMULATED_ERROR):
+        """
+        Fail programming of the next dropped image.
+        :param message: FAIL.TXT contents, e.g. a key of DAPLINK_ERRORS
+        """
+        with self._lock:
+            self._errors.append(message)
+
+    @property
+    def mounted(self):
+        """
+        :return: True unless a remount is in progress
+        """
+        with self._lock:
+            return self._mounted
+
+    @property
+    def info(self):
+        """
+        :return: board dictionary as listed by mbedls, None while remounting
+        """
+        with self._lock:
+            if not self._mounted:
+                return None
+        info = {"target_id": self.target_id,
+                "target_id_usb_id": self.target_id,
+                "target_id_mbed_htm": self.target_id,
+                "platform_name": self.platform_name,
+                "mount_point": self.mount_point,
+                "daplink_version": "{:04d}".format(self.interface_version)}
+        if self.serial_port:
+            info["serial_port"] = self.serial_port
+        return info
+
+    def _mount(self, fault=None):
+        os.mkdir(self.mount_point)
+        self._write("DETAILS.TXT", DETAILS_TEMPLATE.format(
+            target_id=self.target_id, interface_version=self.interface_version,
+            remount_count=self.remount_count))
+        self._write("MBED.HTM", MBED_HTM_TEMPLATE.format(target_id=self.target_id))
+        if fault:
+            self._write("FAIL.TXT", fault + "\r\n")
+        with self._lock:
+            self._mounted = True
+
+    def _write(self, name, contents):
+        with open(os.path.join(self.mount_point, name), "w") as status_file:
+            status_file.write(contents)
+
+    def _remount(self, fault=None):
+        with self._lock:
+            self._mounted = False
+        shutil.rmtree(self.mount_point, ignore_errors=True)
+        self.remount_count += 1
+        if not self._stop.wait(self.remount_delay):
+            self._mount(fault)
+
+    def _dropped_file(self, sizes):
+        """
+        :param sizes: sizes seen on the previous poll, updated in place
+        :return: name of a dropped file the size of which did not change since last poll
+        """
+        try:
+            names = os.listdir(self.mount_point)
+        except OSError:
+            return None
+        current = {}
+        for name in names:
+            if name.lower().endswith(IMAGE_EXTENSIONS) or name.upper() == ERASE_FILE:
+                try:
+                    current[name] = os.path.getsize(os.path.join(self.mount_point, name))
+                except OSError:
+                    continue
+        stable = [name for name, size in current.items() if sizes.get(name) == size]
+        sizes.clear()
+        sizes.update(current)
+        return stable[0] if stable else None
+
+    def _run(self):
+        sizes = {}
+        while not self._stop.wait(SIMULATED_POLL_INTERVAL):
+            name = self._dropped_file(sizes)
+            if name is None:
+                continue
+            sizes.clear()
+            path = os.path.join(self.mount_point, name)
+            with open(path, "rb") as dropped:
+                data = dropped.read()
+            if self._stop.wait(self.programming_delay):
+                return
+            with self._lock:
+                fault = self._errors.popleft() if self._errors else None
+            if fault is None:
+                if name.upper() == ERASE_FILE:
+                    self.erase_count += 1
+                else:
+                    self.images.append((name, data))
+            self.logger.debug("simulated %s consumed %s%s", self.target_id[:8], name,
+                              ", failed: " + fault if fault else "")
+            self._remount(fault)
+
+
+class FakeBoardDetect(object):
+    """
+    Board detection backend listing virtual devices and board dictionaries,
+    a replacement of mbed_os_tools.detect.create().
+    """
+    def __init__(self, boards=None, scan_delay=0):
+        """
+        :param boards: VirtualDaplink objects or mbedls board dictionaries
+        :param scan_delay: seconds every list_mbeds call takes
+        """
+        self.boards = list(boards or [])
+        self.scan_delay = scan_delay
+        self.scans = 0
+        self.examined = 0
+
+    # pylint: disable=unused-argument
+    def list_mbeds(self, filter_function=None, **kwargs):
+        """
+        :param filter_function: callable selecting boards from board dictionaries
+        :return: list of mounted boards
+        """
+        self.scans += 1
+        self.examined += len(self.boards)
+        if self.scan_delay:
+            time.sleep(self.scan_delay)
+        mbeds = []
+        for board in self.boards:
+            info = board.info if isinstance(board, VirtualDaplink) else dict(board)
+            if info is not None and (filter_function is None or filter_function(info)):
+                mbeds.append(info)
+        return mbeds
+
+    @contextmanager
+    def installed(self):
+        """
+        Context manager making MbedCommon find boards through this backend.
+        """
+        original = mbed_common.create_board_detect
+        mbed_common.create_board_detect = lambda: self
+        try:
+            yield self
+        finally:
+            mbed_common.create_board_detect = original
@@ -0,0 +1,78 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from collections import defaultdict, deque
+import threading
+
+STATISTICS_SIZE = 100
+
+
+class OperationStatistics(object):
+    """
+    Latest measurements and failures of the variants of an operation, e.g. reset methods,
+    per platform.
+    """
+    def __init__(self, size=STATISTICS_SIZE, higher_is_better=False):
+        """
+        :param size: number of latest measurements kept per platform and variant
+        :param higher_is_better: True for throughputs, False for latencies
+        """
+        self.higher_is_better = higher_is_better
+        self._lock = threading.Lock()
+        self._values = defaultdict(lambda: deque(maxlen=size))
+        self._failures = defaultdict(int)
+
+    def record(self, platform, variant, value):
+        """
+        :param platform: platform name
+        :param variant: name of the variant, e.g. reset method or programming profile
+        :param value: measurement, None if the operation failed
+        """
+        with self._lock:
+            if value is None:
+                self._failures[(platform, variant)] += 1
+            else:
+                self._values[(platform, variant)].append(value)
+
+    def summary(self, platform):
+        """
+        :param platform: platform name
+        :return: dictionary of variant name to count, failures and median measurement
+        """
+        with self._lock:
+            keys = set(self._values) | set(self._failures)
+            summary = {}
+            for key_platform, variant in keys:
+                if key_platform != platform:
+                    continue
+                values = sorted(self._values[(key_platform, variant)])
+                median = values[len(values) // 2] if values else None
+                summary[variant] = {"count": len(values),
+                                    "failures": self._failures[(key_platform, variant)],
+                                    "median": median}
+            return summary
+
+    def fastest(self, platform):
+        """
+        :param platform: platform name
+        :return: name of the variant with the best median and no failures, or None
+        """
+        reliable = [(stats["median"], variant)
+                    for variant, stats in self.summary(platform).items()
+                    if stats["median"] is not None and not stats["failures"]]
+        if not reliable:
+            return None
+        return (max if self.higher_is_better else min)(reliable)[1]
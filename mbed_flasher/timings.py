@@ -0,0 +1,239 @@
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from contextlib import contextmanager
+import functools
+import json
+import os
+import threading
+
+from mbed_flasher.common import monotonic
+
+
+class Span(object):
+    """
+    Timed phase of an operation, spans started while it is open become its children.
+    """
+    def __init__(self, name, args=None):
+        """
+        :param name: phase name
+        :param args: dictionary of extra values, e.g. target_id or bytes
+        """
+        self.name = name
+        self.args = dict(args or {})
+        self.thread = threading.current_thread().ident
+        self.start = monotonic()
+        self.end = None
+        self.children = []
+
+    @property
+    def duration(self):
+        """
+        :return: seconds the span was open, up to now if it is still open
+        """
+        return (monotonic() if self.end is None else self.end) - self.start
+
+    def set(self, **args):
+        """
+        Add values to the span, bytes also gives throughput in the breakdown.
+        """
+        self.args.update(args)
+
+    def as_dict(self, origin):
+        """
+        :param origin: monotonic time the offsets are relative to
+        :return: JSON serializable breakdown of the span and its children
+        """
+        result = {"name": self.name,
+                  "start": round(self.start - origin, 6),
+                  "duration": round(self.duration, 6)}
+        result.update(self.args)
+        if "bytes" in self.args and self.duration > 0:
+            result["throughput"] = round(self.args["bytes"] / self.duration, 1)
+        if self.children:
+            result["children"] = [child.as_dict(origin) for child in self.children]
+        return result
+
+
+# pylint: disable=too-few-public-methods
+class _NullSpan(object):
+    """
+    Span used while tracing is disabled, ignores everything.
+    """
+    def set(self, **args):
+        """
+        Values are dropped while tracing is disabled.
+        """
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer(object):
+    """
+    Collects nested timing spans per thread. Disabled by default,
+    disabled spans cost a couple of attribute checks.
+    """
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.spans = []
+        self.origin = monotonic()
+
+    def enable(self):
+        """
+        Start collecting spans, clears earlier spans.
+        """
+        self.clear()
+        self.enabled = True
+
+    def disable(self):
+        """
+        Stop collecting spans, collected spans are kept.
+        """
+        self.enabled = False
+
+    def clear(self):
+        """
+        Forget collected spans.
+        """
+        with self._lock:
+            self.spans = []
+            self.origin = monotonic()
+
+    def _recording(self):
+        return self.enabled or getattr(self._local, "capturing", 0) > 0
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def span(self, name, **args):
+        """
+        Time the enclosed block.
+        :param name: phase name
+        :param args: extra values stored with the span
+        :return: context manager yielding the Span
+        """
+        if not self._recording():
+            yield NULL_SPAN
+            return
+        with self._record(name, args) as span:
+            yield span
+
+    @contextmanager
+    def _record(self, name, args):
+        span = Span(name, args)
+        stack = self._stack()
+        if stack:
+            stack[-1].children.append(span)
+        elif self.enabled:
+            with self._lock:
+                self.spans.append(span)
+        stack.append(span)
+        try:
+            yield span
+        except Exception as error:
+            span.set(error=str(error))
+            raise
+        finally:
+            span.end = monotonic()
+            stack.pop()
+
+    def current(self):
+        """
+        :return: innermost open span of the calling thread, NULL_SPAN if none
+        """
+        stack = self._stack() if self._recording() else None
+        return stack[-1] if stack else NULL_SPAN
+
+    @contextmanager
+    def capture(self, name, **args):
+        """
+        Record the spans of the calling thread under a root span also while tracing is
+        disabled, the root span is kept by the tracer only if tracing is enabled.
+        :param name: root span name
+        :param args: extra values stored with the root span
+        :return: context manager yielding the root Span
+        """
+        self._local.capturing = getattr(self._local, "capturing", 0) + 1
+        try:
+            with self._record(name, args) as span:
+                yield span
+        finally:
+            self._local.capturing -= 1
+
+    def timed(self, name):
+        """
+        Decorator timing every call of the function as a span.
+        :param name: phase name
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self._recording():
+                    return func(*args, **kwargs)
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def breakdown(self):
+        """
+        :return: JSON serializable list of top level spans with their children
+        """
+        with self._lock:
+            spans = list(self.spans)
+        return [span.as_dict(self.origin) for span in spans]
+
+    def chrome_trace(self):
+        """
+        :return: spans in Chrome trace event format, viewable in chrome://tracing
+        or Perfetto, one track per thread
+        """
+        events = []
+        pid = os.getpid()
+
+        def add(span):
+            events.append({"name": span.name,
+                           "ph": "X",
+                           "ts": round((span.start - self.origin) * 1e6, 1),
+                           "dur": round(span.duration * 1e6, 1),
+                           "pid": pid,
+                           "tid": span.thread,
+                           "args": span.args})
+            for child in span.children:
+                add(child)
+
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            add(span)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path):
+        """
+        :param path: file the Chrome trace is written to
+        """
+        with open(path, "w") as trace_file:
+            json.dump(self.chrome_trace(), trace_file)
+
+
+TRACER = Tracer()
@@ -62,7 +62,8 @@ setup(name="mbed-flasher",
           "mbed-os-tools==0.0.15",
           "six>=1.0,<2.0",
           "pyocd @ git+https://github.com/ARMmbed/pyOCD@v0.28.3#egg=pyOCD-0.28.3",
-          "pyserial>=3.0,<4.0"
+          "pyserial>=3.0,<4.0",
+          "selectors2>=2.0,<3.0; python_version < '3.4'"
       ],
       classifiers=[
           "Development Status :: 5 - Production/Stable",
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Discovery scaling benchmark. Synthetic mbedls inventories are listed through
+FakeBoardDetect, which counts scans and boards examined.
+
+Run from the repository root:
+    python -m test.benchmark.discovery
+    python -m test.benchmark.discovery --update-baseline
+"""
+# pylint:disable=missing-docstring
+
+from __future__ import print_function
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+
+import mock
+
+from mbed_flasher.common import monotonic
+from mbed_flasher.flash import Flash
+from mbed_flasher.mbed_common import MbedCommon
+from mbed_flasher.simulator import VirtualDaplink, FakeBoardDetect
+
+try:
+    import tracemalloc
+except ImportError:
+    # python 2, allocations are not measured
+    tracemalloc = None
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+INVENTORY_SIZES = (10, 100, 1000)
+LOOKUP_REPEATS = 20
+IMAGE_PATH = os.path.join("test", "helloworld.bin")
+PLATFORMS = ("K64F", "NUCLEO_F429ZI", "NRF52_DK", "DISCO_L475VG_IOT01A")
+
+
+def synthetic_inventory(count, seed=0):
+    """
+    :param count: number of boards
+    :param seed: random seed, same seed gives the same inventory
+    :return: list of mbedls board dictionaries
+    """
+    generator = random.Random(seed)
+    boards = []
+    for index in range(count):
+        target_id = "".join(generator.choice("0123456789abcdef") for _ in range(48))
+        boards.append({"target_id": target_id,
+                       "target_id_usb_id": target_id,
+                       "target_id_mbed_htm": target_id,
+                       "platform_name": PLATFORMS[index % len(PLATFORMS)],
+                       "mount_point": "/media/DAPLINK{}".format(index),
+                       "serial_port": "/dev/ttyACM{}".format(index),
+                       "daplink_version": "0253"})
+    return boards
+
+
+def _allocated(func):
+    """
+    :return: (func return value, peak bytes allocated during the call or None)
+    """
+    if tracemalloc is None:
+        return func(), None
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+def measure_lookup(count, function, repeats=LOOKUP_REPEATS):
+    """
+    Look up the last board of an inventory.
+    :param count: inventory size
+    :param function: refresh_target or refresh_target_once
+    :param repeats: number of timed lookups
+    :return: dictionary of median latency, peak allocation, scans and boards examined
+    per lookup
+    """
+    inventory = synthetic_inventory(count)
+    target_id = inventory[-1]["target_id"]
+    detector = FakeBoardDetect(inventory)
+    lookup = getattr(MbedCommon, function)
+    latencies = []
+    with detector.installed():
+        for _ in range(repeats):
+            start = monotonic()
+            assert lookup(target_id)
+            latencies.append(monotonic() - start)
+        scans, examined = detector.scans, detector.examined
+        _, allocated = _allocated(lambda: lookup(target_id))
+    return {"latency": sorted(latencies)[len(latencies) // 2],
+            "allocated": allocated,
+            "scans": scans // repeats,
+            "examined": examined // repeats}
+
+
+def measure_flash(count):
+    """
+    Flash a virtual device among count - 1 synthetic boards with status polls shortened.
+    :param count: inventory size
+    :return: dictionary of latency, scans and boards examined per flash operation
+    """
+    with mock.patch("mbed_flasher.mbed_common.CHECK_BINARY_DISAPPEAR_SLEEP", 0.01), \
+            VirtualDaplink(programming_delay=0.02, remount_delay=0.02) as device:
+        detector = FakeBoardDetect(synthetic_inventory(count - 1) + [device])
+        with detector.installed():
+            start = monotonic()
+            Flash().flash(build=IMAGE_PATH, target_id=device.target_id, no_reset=True)
+            latency = monotonic() - start
+    return {"latency": latency, "scans": detector.scans, "examined": detector.examined}
+
+
+def run(sizes=INVENTORY_SIZES, flash=True):
+    """
+    :param sizes: inventory sizes
+    :param flash: include the flash path, needs a POSIX host
+    :return: results keyed by benchmark name and inventory size
+    """
+    results = {"refresh_target": {}, "refresh_target_once": {}}
+    if flash:
+        results["flash"] = {}
+    for count in sizes:
+        results["refresh_target"][str(count)] = measure_lookup(count, "refresh_target")
+        results["refresh_target_once"][str(count)] = measure_lookup(count, "refresh_target_once")
+        if flash:
+            results["flash"][str(count)] = measure_flash(count)
+    return results
+
+
+def load_baseline(path=BASELINE_PATH):
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
+
+
+def write_baseline(results, path=BASELINE_PATH):
+    with open(path, "w") as baseline_file:
+        json.dump(results, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write("\n")
+
+
+def print_results(results):
+    print("{:22} {:>6} {:>12} {:>12} {:>6} {:>9}".format(
+        "benchmark", "boards", "latency ms", "allocated B", "scans", "examined"))
+    for name in sorted(results):
+        for count in sorted(results[name], key=int):
+            result = results[name][count]
+            allocated = result.get("allocated")
+            print("{:22} {:>6} {:>12.3f} {:>12} {:>6} {:>9}".format(
+                name, count, result["latency"] * 1000,
+                "-" if allocated is None else allocated, result["scans"], result["examined"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="mbed-flasher discovery scaling benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(INVENTORY_SIZES),
+                        help="Inventory sizes")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Store the results as the new baseline")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    results = run(args.sizes, flash=os.name == "posix")
+    print_results(results)
+    if args.update_baseline:
+        write_baseline(results)
+        print("baseline written to {}".format(BASELINE_PATH))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
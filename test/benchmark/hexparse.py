@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Intel HEX parsing benchmark. Synthetic images are read with mbed_flasher.hexfile and
+with intelhex the way pyOCD FileProgrammer loads them.
+
+Run from the repository root:
+    python -m test.benchmark.hexparse
+    python -m test.benchmark.hexparse --sizes 1024 8192
+"""
+# pylint:disable=missing-docstring
+
+from __future__ import print_function
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+from intelhex import IntelHex
+
+from mbed_flasher.common import monotonic
+from mbed_flasher.hexfile import parse_hex, write_hex
+
+# Image sizes in KiB
+IMAGE_SIZES = (256, 1024, 4096)
+FLASH_BASE = 0x08000000
+# Gap between the application and its data, images have two segments
+DATA_GAP = 0x1000
+PARSE_REPEATS = 3
+
+
+def synthetic_image(path, size, seed=0):
+    """
+    Write an image of size bytes in two segments.
+    :param path: .hex file
+    :param size: number of data bytes
+    :param seed: random seed, same seed gives the same image
+    """
+    generator = random.Random(seed)
+    data = bytearray(generator.getrandbits(8) for _ in range(size))
+    split = size * 3 // 4
+    write_hex(path, [(FLASH_BASE, data[:split]), (FLASH_BASE + split + DATA_GAP, data[split:])])
+
+
+def parse_intelhex(path):
+    ihex = IntelHex(path)
+    return [(start, ihex.tobinstr(start=start, end=end - 1)) for start, end in ihex.segments()]
+
+
+def parse_hexfile(path):
+    return [(address, bytes(data)) for address, data in parse_hex(path).segments]
+
+
+def _best(func, path, repeats):
+    best = None
+    for _ in range(repeats):
+        start = monotonic()
+        func(path)
+        elapsed = monotonic() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(sizes=IMAGE_SIZES, repeats=PARSE_REPEATS):
+    """
+    :param sizes: image sizes in KiB
+    :param repeats: parses per parser, the fastest is reported
+    :return: dictionary of size to dictionary of parse seconds per parser
+    """
+    results = {}
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for size in sizes:
+            path = os.path.join(tmp_dir, "image{}.hex".format(size))
+            synthetic_image(path, size * 1024)
+            assert parse_hexfile(path) == parse_intelhex(path)
+            results[str(size)] = {"hexfile": _best(parse_hexfile, path, repeats),
+                                  "intelhex": _best(parse_intelhex, path, repeats)}
+    finally:
+        shutil.rmtree(tmp_dir)
+    return results
+
+
+def print_results(results):
+    print("{:>8} {:>12} {:>12} {:>8}".format("KiB", "hexfile ms", "intelhex ms", "speedup"))
+    for size in sorted(results, key=int):
+        result = results[size]
+        print("{:>8} {:>12.1f} {:>12.1f} {:>7.1f}x".format(
+            size, result["hexfile"] * 1000, result["intelhex"] * 1000,
+            result["intelhex"] / result["hexfile"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="mbed-flasher Intel HEX parsing benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(IMAGE_SIZES),
+                        help="Image sizes in KiB")
+    parser.add_argument("--repeats", type=int, default=PARSE_REPEATS,
+                        help="Parses per parser, the fastest is reported")
+    args = parser.parse_args()
+    print_results(run(args.sizes, args.repeats))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
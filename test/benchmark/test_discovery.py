@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=invalid-name
+
+import logging
+import os
+import unittest
+
+from test.benchmark.discovery import run, load_baseline, INVENTORY_SIZES
+
+# Allocations are deterministic apart from interpreter internals
+ALLOCATION_TOLERANCE = 1.5
+# Absolute latencies depend on the host, growth with board count is compared instead
+SCALING_TOLERANCE = 3.0
+# Flash path polls the remounting device, the poll count depends on timing
+FLASH_SCAN_TOLERANCE = 2.0
+
+
+class DiscoveryBenchmarkTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.CRITICAL)
+        cls.baseline = load_baseline()
+        cls.results = run(INVENTORY_SIZES, flash=os.name == "posix")
+        logging.disable(logging.NOTSET)
+
+    def _pairs(self, name):
+        for count in sorted(self.results[name], key=int):
+            yield count, self.results[name][count], self.baseline[name][count]
+
+    def check_lookup(self, name):
+        for count, result, baseline in self._pairs(name):
+            self.assertLessEqual(result["scans"], baseline["scans"], count)
+            self.assertLessEqual(result["examined"], baseline["examined"], count)
+            if result["allocated"] is not None and baseline["allocated"] is not None:
+                self.assertLessEqual(result["allocated"],
+                                     baseline["allocated"] * ALLOCATION_TOLERANCE, count)
+
+        smallest, largest = str(min(INVENTORY_SIZES)), str(max(INVENTORY_SIZES))
+        growth = self.results[name][largest]["latency"] / self.results[name][smallest]["latency"]
+        baseline_growth = (self.baseline[name][largest]["latency"] /
+                           self.baseline[name][smallest]["latency"])
+        self.assertLessEqual(growth, baseline_growth * SCALING_TOLERANCE)
+
+    def test_refresh_target(self):
+        self.check_lookup("refresh_target")
+
+    def test_refresh_target_once(self):
+        self.check_lookup("refresh_target_once")
+
+    @unittest.skipIf(os.name != "posix", "Simulator serial port needs a pty")
+    def test_flash_scans(self):
+        for count, result, baseline in self._pairs("flash"):
+            self.assertLessEqual(result["scans"], baseline["scans"] * FLASH_SCAN_TOLERANCE,
+                                 count)
+
+
+if __name__ == '__main__':
+    unittest.main()
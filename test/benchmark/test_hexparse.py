@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=invalid-name
+
+import unittest
+
+from test.benchmark.hexparse import run
+
+# Measured speedup is above 10x, the margin absorbs noisy hosts
+MIN_SPEEDUP = 4.0
+BENCHMARK_SIZE = 512
+
+
+class HexParseBenchmarkTestCase(unittest.TestCase):
+    def test_faster_than_intelhex(self):
+        result = run(sizes=(BENCHMARK_SIZE,))[str(BENCHMARK_SIZE)]
+        self.assertGreaterEqual(result["intelhex"] / result["hexfile"], MIN_SPEEDUP)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -72,6 +72,7 @@ class ApiTests(unittest.TestCase):
 
     # PyOCD does not have verification for .bin files.
     # Success is expected as K64F moves to PyOCD.
+    # Image validation is skipped, it would reject the image before pyOCD.
     def test_flash_user_error_k64f(self):
         first_or_default = self.find_platform('K64F')
         filename = self.bin_corrupted
@@ -79,6 +80,7 @@ class ApiTests(unittest.TestCase):
         parameters = [
             'flash',
             '--no-reset',
+            '--no-validate',
             '-i', filename,
             '--tid', target_id,
             '--pyocd_platform', 'k64f',
@@ -94,6 +96,7 @@ class ApiTests(unittest.TestCase):
         parameters = [
             'flash',
             '--no-reset',
+            '--no-validate',
             '-i', self.nucleo_f429zi_invalid,
             '--tid', target_id,
             '--method', 'pyocd',
@@ -135,7 +135,8 @@ class FlashTestCaseHW(unittest.TestCase):
             build=fail_bin_path,
             target_id=target_id,
             method='pyocd',
-            pyocd_platform='k64f')
+            pyocd_platform='k64f',
+            validate=False)
         self.assertEqual(return_code, EXIT_CODE_SUCCESS)
 
     # NUCLEO_F429ZI is flashed with PyOCD
@@ -158,7 +159,8 @@ class FlashTestCaseHW(unittest.TestCase):
                 build=fail_bin_path,
                 target_id=target_id,
                 method='pyocd',
-                pyocd_platform='stm32f429xi')
+                pyocd_platform='stm32f429xi',
+                validate=False)
 
         self.assertEqual(context.exception.return_code, EXIT_CODE_PYOCD_USER_ERROR)
 
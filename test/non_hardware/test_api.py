@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=invalid-name
+# pylint:disable=unused-argument
+
+import logging
+import os
+import platform
+import threading
+import time
+import unittest
+
+import mock
+
+from mbed_flasher.api import FlasherAPI, OperationResult
+from mbed_flasher.common import FlashError
+from mbed_flasher.retry import RetryPolicy
+from mbed_flasher.simulator import VirtualDaplink, FakeBoardDetect
+from mbed_flasher.return_codes import EXIT_CODE_SUCCESS
+from mbed_flasher.return_codes import EXIT_CODE_DAPLINK_TRANSIENT_ERROR
+from mbed_flasher.return_codes import EXIT_CODE_COULD_NOT_MAP_DEVICE
+from mbed_flasher.return_codes import EXIT_CODE_UNHANDLED_EXCEPTION
+from mbed_flasher.timings import TRACER
+
+
+class OperationResultTestCase(unittest.TestCase):
+    def test_defaults(self):
+        result = OperationResult("flash", "0240", "msd")
+        self.assertTrue(result.succeeded)
+        self.assertEqual(result.retries, 0)
+        result.raise_for_error()
+        self.assertEqual(result.as_dict()["target_id"], "0240")
+
+    def test_raise_for_error(self):
+        result = OperationResult("erase", "0240")
+        result.error = FlashError(message="boom", return_code=EXIT_CODE_COULD_NOT_MAP_DEVICE)
+        result.return_code = EXIT_CODE_COULD_NOT_MAP_DEVICE
+        self.assertFalse(result.succeeded)
+        with self.assertRaises(FlashError):
+            result.raise_for_error()
+
+
+class FlasherAPITestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    @mock.patch("mbed_flasher.api.Reset")
+    def test_reset_success(self, mock_reset):
+        mock_reset.return_value.reset.return_value = EXIT_CODE_SUCCESS
+        mock_reset.return_value.target = {"target_id": "0240"}
+        result = FlasherAPI().reset(target_id="0240", method="simple")
+        self.assertTrue(result.succeeded)
+        self.assertEqual(result.method, "simple")
+        self.assertEqual(result.target, {"target_id": "0240"})
+        self.assertEqual(result.timings["name"], "reset")
+        self.assertGreaterEqual(result.duration, 0)
+        mock_reset.return_value.reset.assert_called_once_with(target_id="0240", method="simple")
+
+    @mock.patch("mbed_flasher.api.Erase")
+    def test_erase_error(self, mock_erase):
+        error = FlashError(message="not found", return_code=EXIT_CODE_COULD_NOT_MAP_DEVICE)
+        mock_erase.return_value.erase.side_effect = error
+        mock_erase.return_value.target = None
+        result = FlasherAPI().erase(target_id="0240")
+        self.assertEqual(result.return_code, EXIT_CODE_COULD_NOT_MAP_DEVICE)
+        self.assertEqual(result.message, "not found")
+        self.assertIs(result.error, error)
+
+    @mock.patch("mbed_flasher.api.Erase")
+    def test_erase_skipped(self, mock_erase):
+        mock_erase.return_value.erase.return_value = EXIT_CODE_SUCCESS
+        mock_erase.return_value.target = None
+        mock_erase.return_value.skipped = True
+        result = FlasherAPI().erase(target_id="0240", blank_check=True)
+        self.assertTrue(result.skipped)
+        self.assertTrue(OperationResult.from_dict(result.as_dict()).skipped)
+
+    @mock.patch("mbed_flasher.api.Erase")
+    def test_unhandled_exception(self, mock_erase):
+        mock_erase.return_value.erase.side_effect = KeyError("target_id")
+        mock_erase.return_value.target = None
+        result = FlasherAPI().erase(target_id="0240")
+        self.assertEqual(result.return_code, EXIT_CODE_UNHANDLED_EXCEPTION)
+        with self.assertRaises(KeyError):
+            result.raise_for_error()
+
+    def test_tracer_stays_disabled(self):
+        with mock.patch("mbed_flasher.api.Reset") as mock_reset:
+            mock_reset.return_value.reset.return_value = EXIT_CODE_SUCCESS
+            mock_reset.return_value.target = None
+            FlasherAPI().reset(target_id="0240")
+        self.assertEqual(TRACER.breakdown(), [])
+
+    @mock.patch("mbed_flasher.api.Erase")
+    def test_erase_many_serializes_target(self, mock_erase):
+        running = {}
+        overlaps = []
+        lock = threading.Lock()
+
+        def erase(target_id, **kwargs):
+            with lock:
+                if running.get(target_id):
+                    overlaps.append(target_id)
+                running[target_id] = True
+            time.sleep(0.02)
+            running[target_id] = False
+            return EXIT_CODE_SUCCESS
+
+        mock_erase.return_value.erase.side_effect = erase
+        mock_erase.return_value.target = None
+        jobs = [{"target_id": target_id} for target_id in ["1", "2", "1", "3", "1"]]
+        results = FlasherAPI().erase_many(jobs, concurrency=4)
+        self.assertEqual([result.target_id for result in results], ["1", "2", "1", "3", "1"])
+        self.assertTrue(all(result.succeeded for result in results))
+        self.assertEqual(overlaps, [])
+
+    def test_flash_many_invalid_job(self):
+        results = FlasherAPI().flash_many([{"target_id": "0240"}])
+        self.assertEqual(results[0].operation, "flash")
+        self.assertEqual(results[0].return_code, EXIT_CODE_UNHANDLED_EXCEPTION)
+
+
+@unittest.skipIf(platform.system() == "Windows", "Simulator serial port needs a pty")
+@mock.patch("mbed_flasher.mbed_common.CHECK_BINARY_DISAPPEAR_SLEEP", 0.05)
+class FlasherAPISimulatorTestCase(unittest.TestCase):
+    bin_path = os.path.join('test', 'helloworld.bin')
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.devices = [VirtualDaplink(target_id="{:048d}".format(index),
+                                       programming_delay=0.05, remount_delay=0.05)
+                        for index in range(2)]
+        for device in self.devices:
+            device.start()
+
+    def tearDown(self):
+        for device in self.devices:
+            device.stop()
+        logging.disable(logging.NOTSET)
+
+    def test_flash_result(self):
+        device = self.devices[0]
+        with FakeBoardDetect([device]).installed():
+            result = FlasherAPI().flash(self.bin_path, target_id=device.target_id)
+        self.assertTrue(result.succeeded)
+        self.assertEqual(result.method, "msd")
+        self.assertEqual(result.target["target_id"], device.target_id)
+        self.assertEqual(result.bytes_written, os.path.getsize(self.bin_path))
+        self.assertEqual(result.retries, 0)
+        self.assertEqual(len(result.attempts), 1)
+        self.assertEqual(result.timings["children"][0]["name"], "Flash.flash")
+
+    def test_flash_retried(self):
+        device = self.devices[0]
+        device.inject_error()
+        with FakeBoardDetect([device]).installed():
+            result = FlasherAPI().flash(self.bin_path, target_id=device.target_id,
+                                        retry_policy=RetryPolicy(attempts=2, backoff=0))
+        self.assertTrue(result.succeeded)
+        self.assertEqual(result.retries, 1)
+        self.assertEqual(result.attempts[0]["return_code"], EXIT_CODE_DAPLINK_TRANSIENT_ERROR)
+
+    def test_flash_many(self):
+        jobs = [{"build": self.bin_path, "target_id": device.target_id}
+                for device in self.devices]
+        with FakeBoardDetect(self.devices).installed():
+            results = FlasherAPI().flash_many(jobs, concurrency=2)
+        self.assertEqual([result.target_id for result in results],
+                         [device.target_id for device in self.devices])
+        self.assertTrue(all(result.succeeded for result in results))
+        for device in self.devices:
+            self.assertEqual(len(device.images), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
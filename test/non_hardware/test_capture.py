@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=too-few-public-methods
+# pylint:disable=invalid-name
+
+import logging
+import os
+import platform
+import re
+import shutil
+import tempfile
+import unittest
+
+from mbed_flasher.capture import SerialCapture
+
+
+class PipePort(object):
+    def __init__(self, name):
+        self.name = name
+        self.read_fd, self.write_fd = os.pipe()
+
+    def fileno(self):
+        return self.read_fd
+
+    def send(self, data):
+        os.write(self.write_fd, data)
+
+    def close(self):
+        os.close(self.read_fd)
+
+
+@unittest.skipIf(platform.system() == 'Windows', 'require posix')
+class SerialCaptureTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _read(self, name):
+        with open(os.path.join(self.tmp_dir, name), "rb") as output:
+            return output.read()
+
+    def test_streams_are_written_to_own_files(self):
+        capture = SerialCapture(timestamps=False)
+        ports = [PipePort("port{}".format(index)) for index in range(3)]
+        for port in ports:
+            capture.add(port, os.path.join(self.tmp_dir, port.name))
+            port.send(port.name.encode() + b" says hello\n")
+
+        while capture.poll(timeout=0.1):
+            pass
+        capture.close()
+
+        for port in ports:
+            self.assertEqual(self._read(port.name), port.name.encode() + b" says hello\n")
+            os.close(port.write_fd)
+
+    def test_every_line_is_timestamped(self):
+        capture = SerialCapture()
+        port = PipePort("port")
+        capture.add(port, os.path.join(self.tmp_dir, "port"))
+
+        port.send(b"first\nsec")
+        capture.poll(timeout=0.1)
+        port.send(b"ond\nthird\n")
+        capture.poll(timeout=0.1)
+        capture.close()
+        os.close(port.write_fd)
+
+        lines = self._read("port").splitlines()
+        self.assertEqual(len(lines), 3)
+        for line, text in zip(lines, [b"first", b"second", b"third"]):
+            self.assertTrue(re.match(br"^\[\d+\.\d{6}\] " + text + b"$", line), line)
+
+    def test_statistics_and_closed_port(self):
+        capture = SerialCapture(timestamps=False)
+        port = PipePort("port")
+        capture.add(port, os.path.join(self.tmp_dir, "port"))
+        port.send(b"x" * 1000)
+        os.close(port.write_fd)
+
+        capture.run(duration=1)
+        stats = capture.statistics()
+
+        self.assertEqual(len(stats), 1)
+        self.assertEqual(stats[0]["port"], "port")
+        self.assertEqual(stats[0]["bytes"], 1000)
+        self.assertGreater(stats[0]["bytes_per_second"], 0)
+        self.assertIsNone(stats[0]["dropped"])
+        capture.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -23,6 +23,7 @@ import unittest
 
 import mock
 
+from mbed_flasher.common import EraseError
 from mbed_flasher.return_codes import EXIT_CODE_SUCCESS
 from mbed_flasher.return_codes import EXIT_CODE_MISUSE_CMD
 from mbed_flasher.flash import Flash
@@ -69,16 +70,36 @@ class EraseAPITest(unittest.TestCase):
             no_reset=True,
             platform="someplatform",
             pack="somepack",
-            connect_mode="halt"
+            connect_mode="halt",
+            ranges=[],
+            image=None,
+            blank_check=False
         )
 
+    @mock.patch('mbed_flasher.mbed_common.MbedCommon.refresh_target')
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.FlasherPyOCD.erase')
+    def test_erase_ranges_are_relayed_to_pyocd(self, mock_erase, mock_refresh_target):
+        mock_refresh_target.return_value = {"target_id": "1"}
+        parameters = ['--no-server', 'erase', '--tid', '1', '--method', Flash.PYOCD_METHOD,
+                      '--erase-range', '0x8000-0x10000', '--erase-range', '0x20000+0x1000']
+        self.assertEqual(FlasherCLI(args=parameters).execute(), EXIT_CODE_SUCCESS)
+        self.assertEqual(mock_erase.call_args[1]["ranges"],
+                         [(0x8000, 0x10000), (0x20000, 0x21000)])
+
+    def test_erase_ranges_need_pyocd(self):
+        parameters = ['--no-server', 'erase', '--tid', '1', '--erase-range', '0x8000-0x10000']
+        with self.assertRaises(EraseError) as context:
+            FlasherCLI(args=parameters).execute()
+        self.assertEqual(context.exception.return_code, EXIT_CODE_MISUSE_CMD)
+
 
 class FlashAPITest(unittest.TestCase):
+    @mock.patch('mbed_flasher.flash.validate_image')
     @mock.patch('mbed_flasher.flash.check_file_exists')
     @mock.patch('mbed_flasher.mbed_common.MbedCommon.refresh_target')
     @mock.patch('mbed_flasher.flashers.FlasherPyOCD.FlasherPyOCD.flash')
     def test_parameters_are_relayed_to_pyocd(
-            self, mock_flash, mock_refresh_target, mock_file_exists):
+            self, mock_flash, mock_refresh_target, mock_file_exists, mock_validate):
         device = {"target_id": "1"}
         mock_refresh_target.return_value = device
         mock_file_exists.return_value = True
@@ -89,6 +110,9 @@ class FlashAPITest(unittest.TestCase):
                       '--pyocd_platform', 'someplatform',
                       '--pyocd_pack', 'somepack',
                       '--pyocd_connect_mode', 'halt',
+                      '--pyocd_profile', 'fast',
+                      '--pyocd_program_option', 'trust_crc=true',
+                      '--verify',
                       '-i', 'test_file.hex']
 
         cli = FlasherCLI(args=parameters)
@@ -103,5 +127,11 @@ class FlashAPITest(unittest.TestCase):
             no_reset=True,
             platform="someplatform",
             pack="somepack",
-            connect_mode="halt"
+            connect_mode="halt",
+            profile="fast",
+            program_options=["trust_crc=true"],
+            verify=True
         )
+        mock_validate.assert_called_once_with('test_file.hex', target_id='1',
+                                              platform='someplatform', pack='somepack',
+                                              logger=mock.ANY)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=too-few-public-methods
+# pylint:disable=invalid-name
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+import zlib
+
+import mock
+from intelhex import IntelHex
+
+from mbed_flasher.common import FlashError
+from mbed_flasher.flashers.FlasherPyOCD import FlasherPyOCD
+from mbed_flasher.flashers.crc_verify import CrcVerifier, load_image, split_blocks
+from mbed_flasher.return_codes import EXIT_CODE_VERIFY_FAILED
+
+FLASH_START = 0x08000000
+FLASH_SIZE = 0x10000
+
+
+class FakeFlash(object):
+    Operation = mock.MagicMock()
+
+    def __init__(self, memory, use_analyzer=True):
+        self.memory = memory
+        self.use_analyzer = use_analyzer
+        self.crc_calls = 0
+        self.init = mock.MagicMock()
+        self.cleanup = mock.MagicMock()
+
+    def get_page_info(self, _address):
+        return mock.MagicMock(size=256)
+
+    def compute_crcs(self, sectors):
+        self.crc_calls += 1
+        for address, size in sectors:
+            assert size & (size - 1) == 0 and address % size == 0
+            assert address // size <= 0xFFFF
+        return [zlib.crc32(self.read(address, size)) & 0xFFFFFFFF for address, size in sectors]
+
+    def read(self, address, size):
+        offset = address - FLASH_START
+        return bytes(self.memory[offset:offset + size])
+
+
+class FakeSession(object):
+    def __init__(self, flash):
+        region = mock.MagicMock(is_flash=True, start=FLASH_START,
+                                end=FLASH_START + FLASH_SIZE - 1, flash=flash,
+                                erased_byte_value=0xFF)
+        ram = mock.MagicMock(is_flash=False)
+        self.target = mock.MagicMock()
+        self.target.memory_map = [region, ram]
+        self.target.read_memory_block8.side_effect = \
+            lambda address, size: list(bytearray(flash.read(address, size)))
+
+
+class SplitBlocksTestCase(unittest.TestCase):
+    def test_blocks_are_aligned_powers_of_two(self):
+        for address, size in [(0, 1000), (FLASH_START + 0x100, 0x5432), (3, 7), (0x1000, 0x1000)]:
+            blocks = split_blocks(address, size)
+            self.assertEqual(blocks[0][0], address)
+            self.assertEqual(sum(block for _, block in blocks), size)
+            for block_address, block in blocks:
+                self.assertEqual(block & (block - 1), 0)
+                self.assertEqual(block_address % block, 0)
+
+        self.assertEqual(split_blocks(0x1000, 0x1000), [(0x1000, 0x1000)])
+
+
+class CrcVerifierTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.memory = bytearray(os.urandom(FLASH_SIZE))
+        self.image = bytes(self.memory[0x100:0x100 + 0x4321])
+        self.segments = [(FLASH_START + 0x100, self.image), (0x20000000, b"ram data")]
+
+    def test_matching_contents(self):
+        flash = FakeFlash(self.memory)
+        CrcVerifier(FakeSession(flash)).verify(self.segments)
+
+        self.assertGreater(flash.crc_calls, 0)
+        flash.cleanup.assert_called_once_with()
+
+    def test_mismatch_is_reported(self):
+        self.memory[0x2000] ^= 0xFF
+        flash = FakeFlash(self.memory)
+        with self.assertRaises(FlashError) as cm:
+            CrcVerifier(FakeSession(flash)).verify(self.segments)
+
+        self.assertEqual(cm.exception.return_code, EXIT_CODE_VERIFY_FAILED)
+
+    def test_readback_without_analyzer(self):
+        self.memory[0x4000] ^= 0x01
+        flash = FakeFlash(self.memory, use_analyzer=False)
+        session = FakeSession(flash)
+        verifier = CrcVerifier(session)
+        with self.assertRaises(FlashError):
+            verifier.verify(self.segments)
+
+        self.assertEqual(flash.crc_calls, 0)
+        self.assertTrue(session.target.read_memory_block8.called)
+        self.assertEqual(len(verifier.mismatches), 1)
+
+
+class LoadImageTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_bin_and_hex(self):
+        bin_path = os.path.join(self.tmp_dir, "image.bin")
+        with open(bin_path, "wb") as image:
+            image.write(b"\x01\x02\x03")
+        self.assertEqual(load_image(bin_path, FLASH_START), [(FLASH_START, b"\x01\x02\x03")])
+
+        ihex = IntelHex()
+        ihex.puts(0x1000, b"abcd")
+        ihex.puts(0x2000, b"ef")
+        hex_path = os.path.join(self.tmp_dir, "image.hex")
+        ihex.write_hex_file(hex_path)
+        self.assertEqual(load_image(hex_path), [(0x1000, b"abcd"), (0x2000, b"ef")])
+
+
+class FlasherPyOCDVerifyTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.load_image')
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.CrcVerifier')
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.FlasherPyOCD._get_session')
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.FileProgrammer')
+    def test_flash_verifies_before_reset(self, mock_programmer, mock_get_session,
+                                         mock_verifier, mock_load_image):
+        session = mock_get_session.return_value
+        session.target.memory_map.get_boot_memory.return_value.start = FLASH_START
+        calls = []
+        mock_programmer.return_value.program.side_effect = lambda _: calls.append("program")
+        mock_verifier.return_value.verify.side_effect = lambda _: calls.append("verify")
+        session.target.reset.side_effect = lambda: calls.append("reset")
+
+        FlasherPyOCD().flash('image.bin', '', False, 'k64f', None, 'halt', verify=True)
+
+        mock_load_image.assert_called_once_with('image.bin', FLASH_START)
+        mock_verifier.return_value.verify.assert_called_once_with(mock_load_image.return_value)
+        mock_programmer.return_value.program.assert_called_once_with('image.bin')
+        self.assertEqual(calls, ["program", "verify", "reset"])
+
+
+@mock.patch('mbed_flasher.flashers.FlasherPyOCD.FlashEraser')
+@mock.patch('mbed_flasher.flashers.FlasherPyOCD.FlasherPyOCD._get_session')
+class BlankCheckTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def erase(self, mock_get_session, memory, use_analyzer=True, **kwargs):
+        flash = FakeFlash(memory, use_analyzer)
+        mock_get_session.return_value.target = FakeSession(flash).target
+        flasher = FlasherPyOCD()
+        flasher.erase('', True, 'k64f', None, 'halt', blank_check=True, **kwargs)
+        return flasher, flash
+
+    def test_blank_flash_is_not_erased(self, mock_get_session, mock_flash_eraser):
+        for use_analyzer in (True, False):
+            flasher, _ = self.erase(mock_get_session, bytearray(b"\xff" * FLASH_SIZE),
+                                    use_analyzer)
+            self.assertTrue(flasher.erase_skipped)
+        self.assertFalse(mock_flash_eraser.called)
+
+    def test_programmed_flash_is_erased(self, mock_get_session, mock_flash_eraser):
+        memory = bytearray(b"\xff" * FLASH_SIZE)
+        memory[0] = 0
+        flasher, flash = self.erase(mock_get_session, memory)
+        self.assertFalse(flasher.erase_skipped)
+        # Checking stops at the first batch that is not blank
+        self.assertEqual(flash.crc_calls, 1)
+        mock_flash_eraser.return_value.erase.assert_called_once_with()
+
+    def test_ranges(self, mock_get_session, mock_flash_eraser):
+        memory = bytearray(b"\xff" * FLASH_SIZE)
+        memory[0] = 0
+        ranges = [(FLASH_START + 0x1000, FLASH_START + 0x2000)]
+        flasher, _ = self.erase(mock_get_session, memory, ranges=ranges)
+        self.assertTrue(flasher.erase_skipped)
+        self.assertFalse(mock_flash_eraser.called)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=invalid-name
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from mbed_flasher.api import FlasherAPI, OperationResult
+from mbed_flasher.common import EraseError
+from mbed_flasher.daplink_status import DaplinkStatus, DETAILS_CACHE
+from mbed_flasher.daplink_status import find_daplink_errors, parse_details
+from mbed_flasher.flashers.FlasherMbed import FlasherMbed
+from mbed_flasher.return_codes import EXIT_CODE_IMPLEMENTATION_MISSING
+
+DETAILS_TXT = """# DAPLink Firmware - see https://mbed.com/daplink
+Unique ID: 0240000032044e4500257009997b00386781000097969900
+HIC ID: 97969900
+Auto Reset: 1
+Automation allowed: 1
+Overflow detection: 1
+Daplink Mode: Interface
+Interface Version: 0244
+Bootloader Version: 0242
+"""
+
+
+class DaplinkStatusTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.mount = tempfile.mkdtemp()
+        DETAILS_CACHE.invalidate()
+
+    def tearDown(self):
+        shutil.rmtree(self.mount)
+        DETAILS_CACHE.invalidate()
+
+    def _write(self, name, text):
+        with open(os.path.join(self.mount, name), "w") as status_file:
+            status_file.write(text)
+
+    def test_snapshot(self):
+        self._write("fail.txt", "The transfer timed out.\n")
+        self._write("MBED.HTM", "")
+        status = DaplinkStatus(self.mount)
+
+        self.assertTrue(status.failed)
+        self.assertFalse(status.asserted)
+        self.assertTrue(status.has_file("mbed.htm"))
+        self.assertEqual(status.read("FAIL.TXT"), "The transfer timed out.")
+
+    def test_missing_mount_point_has_no_files(self):
+        status = DaplinkStatus(os.path.join(self.mount, "missing"))
+        self.assertFalse(status.failed)
+
+    def test_find_errors(self):
+        self.assertEqual(find_daplink_errors("error: The transfer timed out.\n"),
+                         ["The transfer timed out."])
+        self.assertEqual(len(find_daplink_errors(
+            "An error has occurred\nAn error occurred during the transfer")), 2)
+        self.assertEqual(find_daplink_errors("something else"), [])
+
+    def test_parse_details(self):
+        self.assertEqual(parse_details(DETAILS_TXT.replace("\n", "\r\n")),
+                         {"interface_version": 244, "automation_allowed": True,
+                          "auto_reset": True})
+        self.assertIsNone(parse_details("Interface Version: abc")["interface_version"])
+        self.assertFalse(parse_details("Automation allowed: 0")["automation_allowed"])
+
+    def test_details_are_cached_until_remount(self):
+        self._write("DETAILS.TXT", DETAILS_TXT)
+        with mock.patch('mbed_flasher.daplink_status.parse_details',
+                        wraps=parse_details) as mock_parse:
+            DaplinkStatus(self.mount, "123").details()
+            DaplinkStatus(self.mount, "123").details()
+            self.assertEqual(mock_parse.call_count, 1)
+
+            DETAILS_CACHE.invalidate("123")
+            DaplinkStatus(self.mount, "123").details()
+            self.assertEqual(mock_parse.call_count, 2)
+
+    def test_details_changed_on_mount(self):
+        self._write("DETAILS.TXT", DETAILS_TXT)
+        self.assertEqual(DaplinkStatus(self.mount, "123").details()["interface_version"], 244)
+        path = os.path.join(self.mount, "DETAILS.TXT")
+        mtime = os.stat(path).st_mtime
+        self._write("DETAILS.TXT", DETAILS_TXT.replace("Interface Version: 0244",
+                                                       "Interface Version: 0253"))
+        os.utime(path, (mtime + 2, mtime + 2))
+        self.assertEqual(DaplinkStatus(self.mount, "123").details()["interface_version"], 253)
+
+    @mock.patch("mbed_flasher.api.DaplinkStatus")
+    def test_api_result_details_not_stale(self, mock_status):
+        DETAILS_CACHE.get("123", self.mount, lambda: DETAILS_TXT)
+        operation = mock.Mock(target={"target_id": "123", "mount_point": self.mount})
+        # pylint: disable=protected-access
+        result = FlasherAPI()._run(OperationResult("reset", "123"), operation, lambda: 0)
+        mock_status.assert_called_once_with(self.mount, "123")
+        self.assertIs(result.details, mock_status.return_value.details.return_value)
+        with mock.patch('mbed_flasher.daplink_status.parse_details',
+                        wraps=parse_details) as mock_parse:
+            DETAILS_CACHE.get("123", self.mount, lambda: DETAILS_TXT)
+            self.assertEqual(mock_parse.call_count, 1)
+
+    def test_can_be_erased(self):
+        target = {"target_id": "123", "mount_point": self.mount}
+        with self.assertRaises(EraseError) as cm:
+            FlasherMbed._can_be_erased(target)  # pylint: disable=protected-access
+        self.assertEqual(cm.exception.message, "No DETAILS.TXT found")
+
+        self._write("DETAILS.TXT", DETAILS_TXT.replace("Interface Version: 0244",
+                                                       "Interface Version: 0241"))
+        with self.assertRaises(EraseError) as cm:
+            FlasherMbed._can_be_erased(target)  # pylint: disable=protected-access
+        self.assertEqual(cm.exception.return_code, EXIT_CODE_IMPLEMENTATION_MISSING)
+
+        DETAILS_CACHE.invalidate("123")
+        self._write("DETAILS.TXT", DETAILS_TXT)
+        FlasherMbed._can_be_erased(target)  # pylint: disable=protected-access
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -22,7 +22,8 @@ import unittest
 import mock
 
 from mbed_flasher.common import EraseError
-from mbed_flasher.erase import Erase
+from mbed_flasher.erase import Erase, parse_erase_range
+from mbed_flasher.return_codes import EXIT_CODE_MISUSE_CMD
 from mbed_flasher.return_codes import EXIT_CODE_TARGET_ID_MISSING
 from mbed_flasher.return_codes import EXIT_CODE_COULD_NOT_MAP_TARGET_ID_TO_DEVICE
 from mbed_flasher.return_codes import EXIT_CODE_IMPLEMENTATION_MISSING
@@ -99,5 +100,58 @@ class EraseTestCase(unittest.TestCase):
         self.assertEqual(cm.exception.return_code, EXIT_CODE_SERIAL_PORT_MISSING)
 
 
+@mock.patch('mbed_flasher.flashers.FlasherMbed.FlasherMbed.erase')
+@mock.patch('mbed_flasher.mbed_common.MbedCommon.refresh_target',
+            return_value={"target_id": "123"})
+class EraseBlankCheckTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.FlasherPyOCD.blank_check',
+                return_value=True)
+    def test_msd_erase_skipped(self, mock_blank_check, mock_refresh_target, mock_erase):
+        eraser = Erase()
+        self.assertEqual(eraser.erase(target_id="123", method="msd", blank_check=True), 0)
+        self.assertTrue(eraser.skipped)
+        self.assertTrue(mock_blank_check.called)
+        mock_refresh_target.assert_called_once_with("123")
+        self.assertFalse(mock_erase.called)
+
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.FlasherPyOCD.blank_check',
+                side_effect=EraseError(message="no probe", return_code=1))
+    def test_msd_erase_when_check_fails(self, mock_blank_check, mock_refresh_target,
+                                        mock_erase):
+        eraser = Erase()
+        eraser.erase(target_id="123", method="msd", blank_check=True)
+        self.assertTrue(mock_blank_check.called)
+        mock_refresh_target.assert_called_once_with("123")
+        self.assertFalse(eraser.skipped)
+        self.assertTrue(mock_erase.called)
+
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.FlasherPyOCD.blank_check')
+    def test_no_blank_check_by_default(self, mock_blank_check, mock_refresh_target,
+                                       mock_erase):
+        Erase().erase(target_id="123", method="msd")
+        mock_refresh_target.assert_called_once_with("123")
+        self.assertFalse(mock_blank_check.called)
+        self.assertTrue(mock_erase.called)
+
+
+class EraseRangeTestCase(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_erase_range("0x8000-0x10000"), (0x8000, 0x10000))
+        self.assertEqual(parse_erase_range("4096+4096"), (0x1000, 0x2000))
+        self.assertEqual(parse_erase_range([0x1000, 0x2000]), (0x1000, 0x2000))
+
+    def test_invalid(self):
+        for spec in ("0x8000", "0x8000-0x4000", "a-b", "0x100+0", "-1-5"):
+            with self.assertRaises(EraseError) as cm:
+                parse_erase_range(spec)
+            self.assertEqual(cm.exception.return_code, EXIT_CODE_MISUSE_CMD, spec)
+
+
 if __name__ == '__main__':
     unittest.main()
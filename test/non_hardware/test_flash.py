@@ -136,24 +136,19 @@ class FlashTestCase(unittest.TestCase):
 
 
 class FlashVerify(unittest.TestCase):
-    @mock.patch('mbed_flasher.flashers.FlasherMbed.isfile')
-    def test_verify_flash_success_ok(self, mock_isfile):
-        mock_isfile.return_value = False
+    @mock.patch('mbed_flasher.daplink_status._list_names')
+    def test_verify_flash_success_ok(self, mock_list_names):
+        mock_list_names.return_value = ["DETAILS.TXT", "MBED.HTM"]
 
         return_value = FlasherMbed().verify_flash_success(target={"mount_point": ""}, file_path="")
         self.assertEqual(return_value, EXIT_CODE_SUCCESS)
 
     # test with name longer than 30, disable the warning here
     # pylint: disable=invalid-name
-    @mock.patch('mbed_flasher.flashers.FlasherMbed.FlasherMbed._read_file')
-    @mock.patch('mbed_flasher.flashers.FlasherMbed.isfile')
-    def test_verify_flash_success_fail_no_reason(self, mock_isfile, mock_read_file):
-        def isfile_function(path):
-            if "FAIL" in path:
-                return True
-            return False
-
-        mock_isfile.side_effect = isfile_function
+    @mock.patch('mbed_flasher.daplink_status.DaplinkStatus.read')
+    @mock.patch('mbed_flasher.daplink_status._list_names')
+    def test_verify_flash_success_fail_no_reason(self, mock_list_names, mock_read_file):
+        mock_list_names.return_value = ["FAIL.TXT", "MBED.HTM"]
         mock_read_file.return_value = ""
 
         target = {"target_id": "", "mount_point": ""}
@@ -166,15 +161,10 @@ class FlashVerify(unittest.TestCase):
 
     # test with name longer than 30, disable the warning here
     # pylint: disable=invalid-name
-    @mock.patch('mbed_flasher.flashers.FlasherMbed.FlasherMbed._read_file')
-    @mock.patch('mbed_flasher.flashers.FlasherMbed.isfile')
-    def test_verify_flash_success_fail_reasons(self, mock_isfile, mock_read_file):
-        def isfile_function(path):
-            if "FAIL" in path:
-                return True
-            return False
-
-        mock_isfile.side_effect = isfile_function
+    @mock.patch('mbed_flasher.daplink_status.DaplinkStatus.read')
+    @mock.patch('mbed_flasher.daplink_status._list_names')
+    def test_verify_flash_success_fail_reasons(self, mock_list_names, mock_read_file):
+        mock_list_names.return_value = ["FAIL.TXT", "MBED.HTM"]
         target = {"target_id": "", "mount_point": ""}
 
         def check(reason, code):
@@ -247,20 +237,15 @@ class FlashVerify(unittest.TestCase):
               EXIT_CODE_DAPLINK_INTERFACE_ERROR)
         check("The bootloader CRC did not pass.", EXIT_CODE_DAPLINK_INTERFACE_ERROR)
 
-    @mock.patch('mbed_flasher.flashers.FlasherMbed.FlasherMbed._read_file')
-    @mock.patch('mbed_flasher.flashers.FlasherMbed.isfile')
-    def test_verify_flash_success_new_style(self, mock_isfile, mock_read_file):
-        def isfile_function(path):
-            if "FAIL" in path:
-                return True
-            return False
-
+    @mock.patch('mbed_flasher.daplink_status.DaplinkStatus.read')
+    @mock.patch('mbed_flasher.daplink_status._list_names')
+    def test_verify_flash_success_new_style(self, mock_list_names, mock_read_file):
         return_value = """
 error: File sent out of order by PC. Target might not be programmed correctly.
 error type: transient, user
         """
 
-        mock_isfile.side_effect = isfile_function
+        mock_list_names.return_value = ["FAIL.TXT", "MBED.HTM"]
         mock_read_file.return_value = return_value
 
         target = {"target_id": "", "mount_point": ""}
@@ -270,21 +255,16 @@ error type: transient, user
         self.assertEqual(cm.exception.return_code, EXIT_CODE_DAPLINK_TRANSIENT_ERROR)
         self.assertEqual(cm.exception.message, return_value)
 
-    @mock.patch('mbed_flasher.flashers.FlasherMbed.FlasherMbed._read_file')
-    @mock.patch('mbed_flasher.flashers.FlasherMbed.isfile')
-    def test_verify_flash_success_multiple_hits(self, mock_isfile, mock_read_file):
-        def isfile_function(path):
-            if "FAIL" in path:
-                return True
-            return False
-
+    @mock.patch('mbed_flasher.daplink_status.DaplinkStatus.read')
+    @mock.patch('mbed_flasher.daplink_status._list_names')
+    def test_verify_flash_success_multiple_hits(self, mock_list_names, mock_read_file):
         return_value = """
 error: File sent out of order by PC. Target might not be programmed correctly.
 An error occurred during the transfer.
 error type: transient, user
         """
 
-        mock_isfile.side_effect = isfile_function
+        mock_list_names.return_value = ["FAIL.TXT", "MBED.HTM"]
         mock_read_file.return_value = return_value
 
         target = {"target_id": "", "mount_point": ""}
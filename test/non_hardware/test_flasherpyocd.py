@@ -19,18 +19,21 @@ limitations under the License.
 # pylint:disable=invalid-name
 # pylint:disable=unused-argument
 import logging
+import os
 import unittest
 
 import mock
 from pyocd.core.helpers import ConnectHelper, Session
 from pyocd.flash.file_programmer import FileProgrammer
 from pyocd.flash.eraser import FlashEraser
+from pyocd.target.builtin.target_MK64FN1M0xxx12 import K64F
 
 from mbed_flasher.flashers.FlasherPyOCD import FlasherPyOCD
 from mbed_flasher.common import FlashError, EraseError
 from mbed_flasher.return_codes import EXIT_CODE_PYOCD_USER_ERROR
 from mbed_flasher.return_codes import EXIT_CODE_PYOCD_UNHANDLED_EXCEPTION
 from mbed_flasher.return_codes import EXIT_CODE_COULD_NOT_MAP_TARGET_ID_TO_DEVICE
+from mbed_flasher.return_codes import EXIT_CODE_MISUSE_CMD
 
 
 class FlasherPyOCDTestCase(unittest.TestCase):
@@ -178,5 +181,41 @@ class FlasherPyOCDTestCase(unittest.TestCase):
         self.assertEqual(cm.exception.return_code, EXIT_CODE_PYOCD_UNHANDLED_EXCEPTION)
 
 
+@mock.patch('mbed_flasher.flashers.FlasherPyOCD.FlashEraser', autospec=FlashEraser)
+@mock.patch('mbed_flasher.flashers.FlasherPyOCD.FlasherPyOCD._get_session')
+class FlasherPyOCDSectorEraseTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    @staticmethod
+    def k64f_session(mock_get_session):
+        session = mock_get_session.return_value
+        session.target.memory_map = K64F.MEMORY_MAP
+        return session
+
+    def test_ranges_use_sector_mode(self, mock_get_session, mock_flash_eraser):
+        self.k64f_session(mock_get_session)
+        FlasherPyOCD().erase('', True, '', '', None, ranges=[(0x8000, 0x10000)])
+        self.assertEqual(mock_flash_eraser.call_args[0][1], mock_flash_eraser.Mode.SECTOR)
+        mock_flash_eraser.return_value.erase.assert_called_once_with([(0x8000, 0x10000)])
+
+    def test_image_ranges(self, mock_get_session, mock_flash_eraser):
+        self.k64f_session(mock_get_session)
+        FlasherPyOCD().erase('', True, '', '', None, image='test/helloworld.bin')
+        size = os.path.getsize('test/helloworld.bin')
+        mock_flash_eraser.return_value.erase.assert_called_once_with([(0, size)])
+
+    def test_range_outside_flash(self, mock_get_session, mock_flash_eraser):
+        self.k64f_session(mock_get_session)
+        with self.assertRaises(EraseError) as cm:
+            FlasherPyOCD().erase('', True, '', '', None, ranges=[(0xFF000, 0x101000)])
+        self.assertEqual(cm.exception.return_code, EXIT_CODE_MISUSE_CMD)
+        self.assertIn("0x00100000", cm.exception.message)
+        self.assertFalse(mock_flash_eraser.return_value.erase.called)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=invalid-name
+# pylint:disable=unused-argument
+# pylint:disable=protected-access
+
+import logging
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import mock
+from intelhex import IntelHex
+
+from mbed_flasher.flashers.FlasherPyOCD import FlasherPyOCD
+from mbed_flasher.hexfile import HexFormatError, parse_hex, write_hex, merge_segments
+from mbed_flasher.hexfile import HEX_RECORD_START_LINEAR
+
+
+def random_data(size, seed=0):
+    generator = random.Random(seed)
+    return bytearray(generator.getrandbits(8) for _ in range(size))
+
+
+class HexFileTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "image.hex")
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        shutil.rmtree(self.tmp_dir)
+
+    def write_lines(self, lines):
+        with open(self.path, "w") as hex_file:
+            hex_file.write("\n".join(lines) + "\n")
+
+    def hex_lines(self):
+        with open(self.path) as hex_file:
+            return hex_file.read().split()
+
+    def assertMalformed(self, reason):
+        with self.assertRaises(HexFormatError) as context:
+            parse_hex(self.path)
+        self.assertIn(reason, str(context.exception))
+
+    def test_matches_intelhex(self):
+        ihex = IntelHex()
+        ihex.frombytes(random_data(70000), offset=0x0800FF00)
+        ihex.frombytes(random_data(100, seed=1), offset=0x20000000)
+        ihex.start_addr = {"EIP": 0x08000101}
+        ihex.write_hex_file(self.path)
+        image = parse_hex(self.path)
+        self.assertEqual([(address, address + len(data)) for address, data in image.segments],
+                         ihex.segments())
+        for address, data in image.segments:
+            self.assertEqual(bytes(data), ihex.tobinstr(start=address, size=len(data)))
+        self.assertEqual(image.start_record, (HEX_RECORD_START_LINEAR, b"\x08\x00\x01\x01"))
+        self.assertEqual(image.size, 70100)
+
+    def test_extended_segment_address(self):
+        self.write_lines([":020000021000EC", ":0400100001020304E2", ":00000001FF"])
+        self.assertEqual(parse_hex(self.path).segments,
+                         [(0x10010, bytearray(b"\x01\x02\x03\x04"))])
+
+    def test_many_batches(self):
+        data = random_data(200000)
+        write_hex(self.path, [(0, data)])
+        self.assertEqual(parse_hex(self.path).segments, [(0, data)])
+
+    def test_write_round_trip(self):
+        segments = [(0xFFF0, random_data(40)), (0x20000, random_data(3, seed=1))]
+        write_hex(self.path, segments, (HEX_RECORD_START_LINEAR, b"\x00\x00\x01\x01"))
+        ihex = IntelHex(self.path)
+        self.assertEqual(ihex.segments(), [(0xFFF0, 0x10018), (0x20000, 0x20003)])
+        self.assertEqual(ihex.tobinstr(start=0xFFF0, size=40), bytes(segments[0][1]))
+        self.assertEqual(ihex.start_addr, {"EIP": 0x101})
+        self.assertEqual(parse_hex(self.path).segments, segments)
+
+    def test_start_code(self):
+        write_hex(self.path, [(0, random_data(100))])
+        lines = self.hex_lines()
+        lines[1] = "0" + lines[1][1:]
+        self.write_lines(lines)
+        self.assertMalformed("line 2: not a hex record")
+
+    def test_not_hex(self):
+        write_hex(self.path, [(0, random_data(100))])
+        lines = self.hex_lines()
+        lines[2] = lines[2][:5] + "xx" + lines[2][7:]
+        self.write_lines(lines)
+        self.assertMalformed("line 3: not a hex record")
+
+    def test_record_length(self):
+        write_hex(self.path, [(0, random_data(100))])
+        lines = self.hex_lines()
+        lines[2] = lines[2][:-2]
+        self.write_lines(lines)
+        self.assertMalformed("line 3: wrong record length")
+        self.write_lines([":", ":00000001FF"])
+        self.assertMalformed("line 1: wrong record length")
+
+    def test_checksum(self):
+        write_hex(self.path, [(0, random_data(100))])
+        lines = self.hex_lines()
+        lines[3] = lines[3][:-2] + ("00" if lines[3][-2:] != "00" else "01")
+        self.write_lines(lines)
+        self.assertMalformed("line 4: checksum mismatch")
+
+    def test_unknown_record_type(self):
+        self.write_lines([":00000006FA", ":00000001FF"])
+        self.assertMalformed("line 1: unknown record type 6")
+
+    def test_missing_eof(self):
+        write_hex(self.path, [(0, random_data(100))])
+        self.write_lines(self.hex_lines()[:-1])
+        self.assertMalformed("end of file record missing")
+
+    def test_overlap(self):
+        self.write_lines([":0400000001020304F2", ":020002000506F1", ":00000001FF"])
+        self.assertMalformed("overlaps")
+
+    def test_merge_segments(self):
+        self.assertEqual(merge_segments([(4, b"\x02"), (0, b"\x00"), (1, b"\x01"), (8, b"")]),
+                         [(0, bytearray(b"\x00\x01")), (4, bytearray(b"\x02"))])
+
+
+class FlasherPyOCDHexTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_hex_segments_added_as_binary(self):
+        path = os.path.join(self.tmp_dir, "image.hex")
+        write_hex(path, [(0x1000, b"\x01\x02"), (0x2000, b"\x03")])
+        file_programmer = mock.Mock()
+        # data bytes are counted, not the size of the hex file
+        self.assertEqual(FlasherPyOCD()._program(file_programmer, path), 3)
+        calls = file_programmer.add_file.call_args_list
+        self.assertEqual([(call[0][0].read(), call[1]) for call in calls],
+                         [(b"\x01\x02", {"file_format": "bin", "base_address": 0x1000}),
+                          (b"\x03", {"file_format": "bin", "base_address": 0x2000})])
+        file_programmer.commit.assert_called_once_with()
+        self.assertFalse(file_programmer.program.called)
+
+    def test_bin_programmed_directly(self):
+        file_programmer = mock.Mock()
+        path = os.path.join(self.tmp_dir, "image.bin")
+        with open(path, "wb") as image:
+            image.write(b"\0" * 16)
+        self.assertEqual(FlasherPyOCD()._program(file_programmer, path), 16)
+        file_programmer.program.assert_called_once_with(path)
+
+    def test_segment_outside_memory_not_counted(self):
+        path = os.path.join(self.tmp_dir, "image.hex")
+        write_hex(path, [(0x1000, b"\x01\x02"), (0x2000, b"\x03")])
+        file_programmer = mock.Mock()
+        file_programmer.add_file.side_effect = [None, ValueError("outside")]
+        self.assertEqual(FlasherPyOCD()._program(file_programmer, path), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
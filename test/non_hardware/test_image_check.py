@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=invalid-name
+# pylint:disable=unused-argument
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+from intelhex import IntelHex
+
+from mbed_flasher.common import FlashError
+from mbed_flasher.flash import Flash
+from mbed_flasher.hexfile import parse_hex
+from mbed_flasher.image_check import validate_image, merge_ranges
+from mbed_flasher.image_check import image_head, target_memory_map
+from mbed_flasher.return_codes import EXIT_CODE_IMAGE_CORRUPTED
+from mbed_flasher.return_codes import EXIT_CODE_IMAGE_OUT_OF_RANGE
+from mbed_flasher.return_codes import EXIT_CODE_IMAGE_INVALID_VECTOR_TABLE
+
+K64F_TARGET_ID = "0240000032044e4500257009997b00386781000097969900"
+UNKNOWN_TARGET_ID = "fffe000032044e4500257009997b00386781000097969900"
+
+
+class ImageCheckTestCase(unittest.TestCase):
+    bin_path = os.path.join('test', 'helloworld.bin')
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        shutil.rmtree(self.tmp_dir)
+
+    def write_hex(self, address, source=None):
+        ihex = IntelHex()
+        ihex.loadbin(source or self.bin_path, offset=address)
+        path = os.path.join(self.tmp_dir, "image.hex")
+        ihex.write_hex_file(path)
+        return path
+
+    def write_bin(self, data):
+        path = os.path.join(self.tmp_dir, "image.bin")
+        with open(path, "wb") as image:
+            image.write(data)
+        return path
+
+    def assertInvalid(self, return_code, path, **kwargs):
+        with self.assertRaises(FlashError) as context:
+            validate_image(path, **kwargs)
+        self.assertEqual(context.exception.return_code, return_code)
+        return context.exception.message
+
+    def test_valid_images(self):
+        validate_image(self.bin_path, target_id=K64F_TARGET_ID)
+        validate_image(self.write_hex(0), target_id=K64F_TARGET_ID)
+        validate_image(self.bin_path, target_id=UNKNOWN_TARGET_ID)
+        validate_image(self.bin_path)
+
+    def test_hex_records(self):
+        records = parse_hex(self.write_hex(0x100)).segments
+        with open(self.bin_path, "rb") as image:
+            data = image.read()
+        self.assertEqual(merge_ranges(records), [(0x100, 0x100 + len(data))])
+        self.assertEqual(image_head(records), data[:8])
+
+    def test_corrupt_hex(self):
+        path = os.path.join('test', 'corrupt_app_NUCLEO_F429ZI.hex')
+        message = self.assertInvalid(EXIT_CODE_IMAGE_CORRUPTED, path, platform="stm32f429xi")
+        self.assertIn("line 1", message)
+
+    def test_hex_checksum(self):
+        path = self.write_hex(0)
+        with open(path) as hex_file:
+            lines = hex_file.readlines()
+        lines[2] = lines[2][:9] + ("0" if lines[2][9] != "0" else "1") + lines[2][10:]
+        with open(path, "w") as hex_file:
+            hex_file.writelines(lines)
+        message = self.assertInvalid(EXIT_CODE_IMAGE_CORRUPTED, path)
+        self.assertIn("line 3: checksum mismatch", message)
+
+    def test_hex_truncated(self):
+        path = self.write_hex(0)
+        with open(path) as hex_file:
+            lines = hex_file.readlines()
+        with open(path, "w") as hex_file:
+            hex_file.writelines(lines[:-1])
+        message = self.assertInvalid(EXIT_CODE_IMAGE_CORRUPTED, path)
+        self.assertIn("end of file record missing", message)
+
+    def test_empty(self):
+        self.assertInvalid(EXIT_CODE_IMAGE_CORRUPTED, self.write_bin(b""))
+
+    def test_config_files_skipped(self):
+        for name, data in (("auto_on.cfg", b""), ("details.cfg", b"not a vector table"),
+                           ("auto_rst.act", b"")):
+            path = os.path.join(self.tmp_dir, name)
+            with open(path, "wb") as config:
+                config.write(data)
+            validate_image(path, target_id=K64F_TARGET_ID)
+
+    def test_out_of_range(self):
+        message = self.assertInvalid(EXIT_CODE_IMAGE_OUT_OF_RANGE, self.write_hex(0x08000000),
+                                     target_id=K64F_TARGET_ID)
+        self.assertIn("0x08000000", message)
+        with open(self.bin_path, "rb") as image:
+            too_large = image.read().ljust(0x100001, b"\xff")
+        self.assertInvalid(EXIT_CODE_IMAGE_OUT_OF_RANGE, self.write_bin(too_large),
+                           target_id=K64F_TARGET_ID)
+
+    def test_wrong_target(self):
+        # K64F image linked to address 0, flash of STM32F429 starts from 0x08000000
+        message = self.assertInvalid(EXIT_CODE_IMAGE_INVALID_VECTOR_TABLE,
+                                     self.write_hex(0x08000000), platform="stm32f429xi")
+        self.assertIn("reset vector 0x000004d1 is outside flash", message)
+
+    def test_vector_table(self):
+        self.assertInvalid(EXIT_CODE_IMAGE_INVALID_VECTOR_TABLE,
+                           os.path.join('test', 'corrupted.bin'), target_id=K64F_TARGET_ID)
+        self.assertInvalid(EXIT_CODE_IMAGE_INVALID_VECTOR_TABLE,
+                           self.write_bin(b"\xff" * 64))
+        self.assertInvalid(EXIT_CODE_IMAGE_INVALID_VECTOR_TABLE,
+                           self.write_bin(b"\x00\x00\x01\x20\x00\x01\x00\x00"))
+        message = self.assertInvalid(EXIT_CODE_IMAGE_INVALID_VECTOR_TABLE,
+                                     self.write_bin(b"\x00\x00\x01\x10\xd1\x04\x00\x00"),
+                                     target_id=K64F_TARGET_ID)
+        self.assertIn("outside RAM", message)
+
+    def test_target_memory_map(self):
+        self.assertIsNotNone(target_memory_map(K64F_TARGET_ID))
+        self.assertIsNotNone(target_memory_map(platform="K64F"))
+        self.assertIsNone(target_memory_map(UNKNOWN_TARGET_ID))
+        self.assertIsNone(target_memory_map(platform="nosuchtarget"))
+
+    @mock.patch("mbed_flasher.mbed_common.MbedCommon.refresh_target")
+    def test_flash_fails_before_discovery(self, mock_refresh_target):
+        with self.assertRaises(FlashError) as context:
+            Flash().flash(build=os.path.join('test', 'corrupted.bin'), target_id=K64F_TARGET_ID)
+        self.assertEqual(context.exception.return_code, EXIT_CODE_IMAGE_INVALID_VECTOR_TABLE)
+        self.assertFalse(mock_refresh_target.called)
+
+    @mock.patch("mbed_flasher.mbed_common.MbedCommon.refresh_target", return_value=None)
+    def test_flash_validate_disabled(self, mock_refresh_target):
+        with self.assertRaises(FlashError):
+            Flash().flash(build=os.path.join('test', 'corrupted.bin'), target_id=K64F_TARGET_ID,
+                          validate=False)
+        self.assertTrue(mock_refresh_target.called)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=invalid-name
+# pylint:disable=unused-argument
+
+import logging
+import os
+import platform
+import shutil
+import tempfile
+import unittest
+
+import mock
+from intelhex import IntelHex
+
+from mbed_flasher.common import FlashError
+from mbed_flasher.flash import Flash
+from mbed_flasher.image_compose import ImageComposer, IMAGE_COMPOSER
+from mbed_flasher.image_compose import parse_image_spec, needs_composing
+from mbed_flasher.simulator import VirtualDaplink, FakeBoardDetect
+from mbed_flasher.return_codes import EXIT_CODE_FILE_MISSING
+from mbed_flasher.return_codes import EXIT_CODE_IMAGE_CORRUPTED
+from mbed_flasher.return_codes import EXIT_CODE_IMAGE_OVERLAP
+from mbed_flasher.return_codes import EXIT_CODE_MISUSE_CMD
+from mbed_flasher.return_codes import EXIT_CODE_SUCCESS
+
+BIN_PATH = os.path.join('test', 'helloworld.bin')
+
+
+def read_bin():
+    with open(BIN_PATH, "rb") as image:
+        return image.read()
+
+
+class ImageSpecTestCase(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_image_spec("boot.bin@0x8000"), ("boot.bin", 0x8000))
+        self.assertEqual(parse_image_spec("boot.bin@4096"), ("boot.bin", 4096))
+        self.assertEqual(parse_image_spec("app.hex"), ("app.hex", None))
+        self.assertEqual(parse_image_spec("builds@1/app.bin"), ("builds@1/app.bin", None))
+
+    def test_hex_address(self):
+        with self.assertRaises(FlashError) as context:
+            parse_image_spec("app.hex@0x8000")
+        self.assertEqual(context.exception.return_code, EXIT_CODE_MISUSE_CMD)
+
+    def test_needs_composing(self):
+        self.assertFalse(needs_composing("app.bin"))
+        self.assertFalse(needs_composing(["app.bin"]))
+        self.assertTrue(needs_composing(["app.bin@0x8000"]))
+        self.assertTrue(needs_composing(["boot.bin", "app.hex"]))
+
+
+class ImageComposerTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.composer = ImageComposer(cache_dir=os.path.join(self.tmp_dir, "cache"))
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        shutil.rmtree(self.tmp_dir)
+
+    def write_hex(self, address):
+        ihex = IntelHex()
+        ihex.loadbin(BIN_PATH, offset=address)
+        ihex.start_addr = {"EIP": address + 1}
+        path = os.path.join(self.tmp_dir, "app{:x}.hex".format(address))
+        ihex.write_hex_file(path)
+        return path
+
+    def test_compose(self):
+        path = self.composer.compose([BIN_PATH, self.write_hex(0x20000)])
+        merged = IntelHex(path)
+        data = read_bin()
+        self.assertEqual(merged.segments(), [(0, len(data)), (0x20000, 0x20000 + len(data))])
+        self.assertEqual(merged.tobinstr(start=0x20000, size=len(data)), data)
+        self.assertEqual(merged.start_addr, {"EIP": 0x20001})
+
+    def test_base_address(self):
+        path = self.composer.compose([BIN_PATH, BIN_PATH + "@0x8000"], base_address=0x4000)
+        self.assertEqual(IntelHex(path).minaddr(), 0x4000)
+
+    def test_cached(self):
+        specs = [BIN_PATH, BIN_PATH + "@0x10000"]
+        path = self.composer.compose(specs)
+        with mock.patch("mbed_flasher.image_compose.write_hex") as mock_write_hex:
+            self.assertEqual(self.composer.compose(specs), path)
+        self.assertFalse(mock_write_hex.called)
+        self.assertNotEqual(self.composer.compose([BIN_PATH, BIN_PATH + "@0x20000"]), path)
+
+    def test_overlap(self):
+        with self.assertRaises(FlashError) as context:
+            self.composer.compose([BIN_PATH, BIN_PATH + "@0x100"])
+        self.assertEqual(context.exception.return_code, EXIT_CODE_IMAGE_OVERLAP)
+
+    def test_corrupt_hex(self):
+        path = os.path.join(self.tmp_dir, "corrupt.hex")
+        with open(path, "wb") as image:
+            image.write(b":10000000ZZ\n")
+        with self.assertRaises(FlashError) as context:
+            self.composer.compose([path, BIN_PATH + "@0x08100000"])
+        self.assertEqual(context.exception.return_code, EXIT_CODE_IMAGE_CORRUPTED)
+        self.assertIn("corrupt.hex", context.exception.message)
+
+    def test_unreadable_part(self):
+        specs = [BIN_PATH, BIN_PATH + "@0x10000"]
+        with mock.patch.object(self.composer, "_digest", return_value="0" * 40):
+            with mock.patch("mbed_flasher.image_compose.open", create=True,
+                            side_effect=IOError("gone")):
+                with self.assertRaises(FlashError) as context:
+                    self.composer.compose(specs)
+        self.assertEqual(context.exception.return_code, EXIT_CODE_FILE_MISSING)
+        with self.assertRaises(FlashError) as context:
+            self.composer.compose([os.path.join(self.tmp_dir, "missing.bin@0x100"), BIN_PATH])
+        self.assertEqual(context.exception.return_code, EXIT_CODE_FILE_MISSING)
+
+    def test_prune(self):
+        for address in (0x10000, 0x20000, 0x30000):
+            self.composer.compose([BIN_PATH, BIN_PATH + "@0x{:x}".format(address)])
+        self.composer.prune(keep=1)
+        self.assertEqual(len(os.listdir(self.composer.cache_dir)), 1)
+
+
+@unittest.skipIf(platform.system() == "Windows", "Simulator serial port needs a pty")
+@mock.patch("mbed_flasher.mbed_common.CHECK_BINARY_DISAPPEAR_SLEEP", 0.05)
+class ComposedFlashTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.device = VirtualDaplink(programming_delay=0.05, remount_delay=0.05)
+        self.device.start()
+
+    def tearDown(self):
+        self.device.stop()
+        shutil.rmtree(self.tmp_dir)
+        logging.disable(logging.NOTSET)
+
+    def test_single_copy(self):
+        with mock.patch.object(IMAGE_COMPOSER, "cache_dir", self.tmp_dir):
+            with FakeBoardDetect([self.device]).installed():
+                result = Flash().flash(build=[BIN_PATH, BIN_PATH + "@0x80000"],
+                                       target_id=self.device.target_id)
+        self.assertEqual(result, EXIT_CODE_SUCCESS)
+        self.assertEqual(len(self.device.images), 1)
+        name, contents = self.device.images[0]
+        self.assertTrue(name.endswith(".hex"))
+        merged_path = os.path.join(self.tmp_dir, name)
+        self.assertEqual(IntelHex(merged_path).tobinstr(start=0x80000, size=len(read_bin())),
+                         read_bin())
+        with open(merged_path, "rb") as merged:
+            self.assertEqual(merged.read(), contents)
+        self.assertEqual(self.device.remount_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=invalid-name
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import mock
+
+from mbed_flasher.flashers.FlasherMbed import FlasherMbed
+from mbed_flasher.log_pipeline import LogPipeline, target_logger
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self, level=logging.NOTSET):
+        logging.Handler.__init__(self, level)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((record.name, record.getMessage(), threading.current_thread()))
+
+
+class LogPipelineTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.NOTSET)
+        self.logger = logging.getLogger("mbed-flasher-test-log-pipeline")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.handler = RecordingHandler(logging.INFO)
+        self.logger.handlers = [self.handler]
+        self.log_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.logger.handlers = []
+        shutil.rmtree(self.log_dir)
+
+    def test_target_logger(self):
+        self.assertEqual(target_logger(self.logger, "1234").name, self.logger.name + ".1234")
+        self.assertIs(target_logger(self.logger, None), self.logger)
+
+    def test_records_are_handled_in_listener(self):
+        pipeline = LogPipeline(self.logger)
+        pipeline.start()
+        self.assertNotIn(self.handler, self.logger.handlers)
+        target_logger(self.logger, "1234").info("flashing %s", "image")
+        self.logger.debug("below handler level")
+        pipeline.stop()
+
+        self.assertEqual(self.logger.handlers, [self.handler])
+        self.assertEqual(len(self.handler.records), 1)
+        name, message, thread = self.handler.records[0]
+        self.assertEqual(name, self.logger.name + ".1234")
+        self.assertEqual(message, "flashing image")
+        self.assertIsNot(thread, threading.current_thread())
+
+    def test_target_log_files(self):
+        with LogPipeline(self.logger, log_dir=self.log_dir):
+            target_logger(self.logger, "1234").debug("first")
+            target_logger(self.logger, "5678").info("second")
+            self.logger.info("not for a target")
+
+        with open(os.path.join(self.log_dir, "1234.log")) as log_file:
+            self.assertIn("[DEBUG]", log_file.read())
+        with open(os.path.join(self.log_dir, "5678.log")) as log_file:
+            lines = log_file.readlines()
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].rstrip().endswith("second"))
+        self.assertEqual(sorted(os.listdir(self.log_dir)), ["1234.log", "5678.log"])
+
+
+class CopyFileLoggingTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.NOTSET)
+        self.temp_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.temp_dir, "image.bin")
+        with open(self.source, "wb") as image:
+            image.write(b"\x00" * 16)
+        self.destination = os.path.join(self.temp_dir, "copy.bin")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    @mock.patch("mbed_flasher.flashers.FlasherMbed.hashlib")
+    def test_hash_skipped_without_debug(self, mock_hashlib):
+        logger = logging.getLogger("mbed-flasher-test-copy-file")
+        logger.setLevel(logging.INFO)
+        FlasherMbed(logger=logger).copy_file(self.source, self.destination)
+        mock_hashlib.sha1.assert_not_called()
+
+    @mock.patch("mbed_flasher.flashers.FlasherMbed.hashlib")
+    def test_hash_with_debug(self, mock_hashlib):
+        logger = logging.getLogger("mbed-flasher-test-copy-file-debug")
+        logger.setLevel(logging.DEBUG)
+        FlasherMbed(logger=logger).copy_file(self.source, self.destination)
+        mock_hashlib.sha1.assert_called_once_with(b"\x00" * 16)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=invalid-name
+# pylint:disable=unused-argument
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+from six.moves.urllib.request import urlopen
+
+from mbed_flasher.common import FlashError
+from mbed_flasher.flash import Flash
+from mbed_flasher.metrics import Counter, Histogram, Registry, OPERATIONS, FLASH_RETRIES
+from mbed_flasher.metrics import count_operation, return_code_name
+from mbed_flasher.retry import RetryPolicy
+from mbed_flasher.return_codes import EXIT_CODE_SUCCESS
+from mbed_flasher.return_codes import EXIT_CODE_DAPLINK_TRANSIENT_ERROR
+from mbed_flasher.return_codes import EXIT_CODE_TARGET_ID_MISSING
+
+
+class MetricsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.registry = Registry()
+        self.counter = self.registry.register(
+            Counter("test_operations_total", "Operations", labels=("result",)))
+        self.histogram = self.registry.register(
+            Histogram("test_duration_seconds", "Duration", buckets=(1, 5)))
+
+    def test_return_code_name(self):
+        self.assertEqual(return_code_name(EXIT_CODE_SUCCESS), "success")
+        self.assertEqual(return_code_name(EXIT_CODE_DAPLINK_TRANSIENT_ERROR),
+                         "daplink_transient_error")
+        self.assertEqual(return_code_name(1234), "1234")
+
+    def test_render(self):
+        self.counter.inc(result="success")
+        self.counter.inc(2, result="os_error")
+        self.histogram.observe(0.5)
+        self.histogram.observe(3)
+        self.histogram.observe(10)
+        lines = self.registry.render().splitlines()
+        self.assertIn("# TYPE test_operations_total counter", lines)
+        self.assertIn('test_operations_total{result="success"} 1', lines)
+        self.assertIn('test_operations_total{result="os_error"} 2', lines)
+        self.assertIn("# TYPE test_duration_seconds histogram", lines)
+        self.assertIn('test_duration_seconds_bucket{le="1.0"} 1', lines)
+        self.assertIn('test_duration_seconds_bucket{le="5.0"} 2', lines)
+        self.assertIn('test_duration_seconds_bucket{le="+Inf"} 3', lines)
+        self.assertIn("test_duration_seconds_count 3", lines)
+        self.assertIn("test_duration_seconds_sum 13.5", lines)
+
+    def test_label_escaping(self):
+        self.counter.inc(result='a"b\\c')
+        self.assertIn('result="a\\"b\\\\c"', self.registry.render())
+
+    def test_write_textfile(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, "mbedflash.prom")
+            self.counter.inc(result="success")
+            self.registry.write_textfile(path)
+            self.registry.write_textfile(path)
+            with open(path) as metrics_file:
+                self.assertEqual(metrics_file.read(), self.registry.render())
+            self.assertEqual(os.listdir(tmp_dir), ["mbedflash.prom"])
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_merge_textfile(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, "mbedflash.prom")
+            with open(path, "w") as metrics_file:
+                metrics_file.write('test_operations_total{result="success"} 2\n'
+                                   'test_operations_total{result="os_error"} 1\n'
+                                   'test_duration_seconds_bucket{le="+Inf"} 4\n'
+                                   'test_duration_seconds_sum 6.5\n'
+                                   'other_metric 7\n')
+            self.counter.inc(result="success")
+            self.histogram.observe(3)
+            self.registry.write_textfile(path, merge=True)
+            with open(path) as metrics_file:
+                lines = metrics_file.read().splitlines()
+            self.assertIn('test_operations_total{result="success"} 3', lines)
+            self.assertIn('test_operations_total{result="os_error"} 1', lines)
+            self.assertIn('test_duration_seconds_bucket{le="+Inf"} 5', lines)
+            self.assertIn("test_duration_seconds_sum 9.5", lines)
+            self.assertNotIn("other_metric 7", lines)
+            self.assertEqual(len([line for line in lines if line.startswith("# TYPE")]), 2)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_serve(self):
+        self.counter.inc(result="success")
+        server = self.registry.serve(0)
+        try:
+            url = "http://127.0.0.1:{}/metrics".format(server.server_address[1])
+            body = urlopen(url, timeout=5).read().decode("utf-8")
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(body, self.registry.render())
+
+    def test_count_operation(self):
+        @count_operation("test")
+        def operation(fail):
+            if fail:
+                raise FlashError(message="missing", return_code=EXIT_CODE_TARGET_ID_MISSING)
+            return EXIT_CODE_SUCCESS
+
+        success = OPERATIONS.value(operation="test", result="success")
+        missing = OPERATIONS.value(operation="test", result="target_id_missing")
+        operation(False)
+        with self.assertRaises(FlashError):
+            operation(True)
+        self.assertEqual(OPERATIONS.value(operation="test", result="success"), success + 1)
+        self.assertEqual(OPERATIONS.value(operation="test", result="target_id_missing"),
+                         missing + 1)
+
+
+class FlashMetricsTestCase(unittest.TestCase):
+    bin_path = os.path.join('test', 'helloworld.bin')
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    @mock.patch("mbed_flasher.flash.time.sleep")
+    @mock.patch("mbed_flasher.flash.MbedCommon.refresh_target",
+                return_value={"target_id": "0240"})
+    @mock.patch("mbed_flasher.flash.FlasherMbed.flash")
+    def test_flash_counts_retries(self, mock_flash, mock_refresh, mock_sleep):
+        mock_flash.side_effect = [FlashError(message="transfer",
+                                             return_code=EXIT_CODE_DAPLINK_TRANSIENT_ERROR),
+                                  None]
+        retries = FLASH_RETRIES.value(result="daplink_transient_error")
+        success = OPERATIONS.value(operation="flash", result="success")
+        Flash().flash(build=self.bin_path, target_id="0240",
+                      retry_policy=RetryPolicy(attempts=2))
+        self.assertEqual(FLASH_RETRIES.value(result="daplink_transient_error"), retries + 1)
+        self.assertEqual(OPERATIONS.value(operation="flash", result="success"), success + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=too-few-public-methods
+# pylint:disable=invalid-name
+# pylint:disable=unused-argument
+
+import io
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+from pyocd.core.memory_map import FlashRegion, MemoryMap, RamRegion
+
+from mbed_flasher.flashers.FlasherPyOCD import FlasherPyOCD
+from mbed_flasher.flashers.pack_cache import PackCache
+
+
+class FakeAlgo(object):
+    def __init__(self, stream):
+        start, size = stream.read().decode().split(":")
+        self.flash_start = int(start)
+        self.flash_size = int(size)
+
+
+class FakeElement(object):
+    def __init__(self, name):
+        self.attrib = {"name": name}
+
+
+class FakeDevice(object):
+    part_number = "TEST-PART1"
+    vendor = "ARM"
+    families = ["Test"]
+
+    def __init__(self):
+        self._info = mock.MagicMock()
+        self._info.algos = [FakeElement("Flash/main.FLM"), FakeElement("Flash/data.FLM")]
+
+    @property
+    def memory_map(self):
+        return MemoryMap(
+            FlashRegion(name="main", start=0, length=0x10000, blocksize=0x400,
+                        is_boot_memory=True),
+            FlashRegion(name="data", start=0x100000, length=0x1000, blocksize=0x100),
+            RamRegion(name="ram", start=0x20000000, length=0x4000))
+
+
+class FakePack(object):
+    files = {"Flash/main.FLM": b"0:65536", "Flash/data.FLM": b"1048576:4096"}
+
+    def __init__(self, path):
+        self.devices = [FakeDevice()]
+
+    def get_file(self, name):
+        return io.BytesIO(self.files[name])
+
+
+@mock.patch('mbed_flasher.flashers.pack_cache.PackFlashAlgo', FakeAlgo)
+class PackCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.pack = os.path.join(self.tmp_dir, "test.pack")
+        with open(self.pack, "wb") as pack_file:
+            pack_file.write(b"pack contents")
+        self.cache = PackCache(cache_dir=os.path.join(self.tmp_dir, "cache"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    @mock.patch('mbed_flasher.flashers.pack_cache.CmsisPack', side_effect=FakePack)
+    def test_round_trip(self, mock_pack):
+        device = self.cache.get(self.pack, "test_part1")
+
+        self.assertEqual(device.part_number, "TEST-PART1")
+        self.assertEqual(device.families, ["Test"])
+        regions = list(device.memory_map)
+        self.assertEqual([region.name for region in regions], ["main", "data", "ram"])
+        self.assertEqual(regions[0].blocksize, 0x400)
+        self.assertTrue(regions[0].is_boot_memory)
+        self.assertEqual(regions[0].flm.flash_size, 65536)
+        self.assertEqual(regions[1].flm.flash_start, 0x100000)
+        self.assertEqual(regions[2].length, 0x4000)
+
+    @mock.patch('mbed_flasher.flashers.pack_cache.CmsisPack', side_effect=FakePack)
+    def test_hit_does_not_parse_pack(self, mock_pack):
+        self.cache.get(self.pack, "TEST-PART1")
+        self.cache.get(self.pack, "test_part1")
+        PackCache(cache_dir=self.cache.cache_dir).get(self.pack, "TEST-PART1")
+
+        self.assertEqual(mock_pack.call_count, 1)
+
+    @mock.patch('mbed_flasher.flashers.pack_cache.CmsisPack', side_effect=FakePack)
+    def test_changed_pack_is_parsed_again(self, mock_pack):
+        self.cache.get(self.pack, "TEST-PART1")
+        with open(self.pack, "ab") as pack_file:
+            pack_file.write(b" updated")
+        self.cache.get(self.pack, "TEST-PART1")
+
+        self.assertEqual(mock_pack.call_count, 2)
+
+    @mock.patch('mbed_flasher.flashers.pack_cache.CmsisPack', side_effect=FakePack)
+    def test_unknown_target(self, mock_pack):
+        self.assertIsNone(self.cache.get(self.pack, "other"))
+        self.assertFalse(self.cache.populate(self.pack, "other"))
+
+    def test_populate_requires_pack_file(self):
+        self.assertFalse(self.cache.populate(None, "k64f"))
+        self.assertFalse(self.cache.populate("missing.pack", "k64f"))
+
+
+class FlasherPyOCDPackCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.PACK_CACHE')
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.ConnectHelper')
+    def test_cached_target_skips_pack(self, mock_helper, mock_cache):
+        mock_cache.populate.return_value = True
+        target = {'target_id_usb_id': 'test_id'}
+
+        FlasherPyOCD()._get_session(target, 'test_part1', 'test.pack', 'halt', None)
+
+        mock_cache.populate.assert_called_once_with('test.pack', 'test_part1')
+        self.assertIsNone(mock_helper.session_with_chosen_probe.call_args[1]['pack'])
+
+
+if __name__ == '__main__':
+    unittest.main()
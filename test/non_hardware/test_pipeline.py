@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=invalid-name
+# pylint:disable=unused-argument
+
+import logging
+import os
+import platform
+import unittest
+
+import mock
+
+from mbed_flasher.api import FlasherAPI
+from mbed_flasher.common import FlashError
+from mbed_flasher.pipeline import Pipeline, parse_steps, step_durations
+from mbed_flasher.simulator import VirtualDaplink, FakeBoardDetect
+from mbed_flasher.return_codes import EXIT_CODE_MISUSE_CMD
+from mbed_flasher.return_codes import EXIT_CODE_SUCCESS
+
+BIN_PATH = os.path.join('test', 'helloworld.bin')
+TARGET = {"target_id": "0240000032044e4500257009997b00386781000097969900",
+          "target_id_usb_id": "0240000032044e4500257009997b00386781000097969900",
+          "platform_name": "K64F"}
+
+
+class ParseStepsTestCase(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_steps("erase, flash,reset"), ["erase", "flash", "reset"])
+        self.assertEqual(parse_steps(["verify"]), ["verify"])
+
+    def test_invalid(self):
+        for steps in ("", "erase,program", None):
+            with self.assertRaises(FlashError) as context:
+                parse_steps(steps)
+            self.assertEqual(context.exception.return_code, EXIT_CODE_MISUSE_CMD)
+
+    def test_step_durations(self):
+        timings = {"name": "run", "duration": 3,
+                   "children": [{"name": "Pipeline.run", "duration": 3, "children": [
+                       {"name": "Pipeline.step", "step": "erase", "duration": 1},
+                       {"name": "Pipeline.step", "step": "flash", "duration": 2}]}]}
+        self.assertEqual(step_durations(timings), [("erase", 1), ("flash", 2)])
+        self.assertEqual(step_durations(None), [])
+
+
+@mock.patch('mbed_flasher.flashers.FlasherPyOCD.CrcVerifier')
+@mock.patch('mbed_flasher.flashers.FlasherPyOCD.FileProgrammer')
+@mock.patch('mbed_flasher.flashers.FlasherPyOCD.FlashEraser')
+@mock.patch('mbed_flasher.flashers.FlasherPyOCD.FlasherPyOCD._get_session')
+@mock.patch('mbed_flasher.mbed_common.MbedCommon.refresh_target', return_value=TARGET)
+class PyOCDPipelineTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_one_lookup_and_session(self, mock_refresh_target, mock_get_session,
+                                    mock_eraser, mock_programmer, mock_verifier):
+        session = mock_get_session.return_value
+        calls = []
+        mock_eraser.return_value.erase.side_effect = lambda: calls.append("erase")
+        mock_programmer.return_value.program.side_effect = lambda _: calls.append("flash")
+        mock_verifier.return_value.verify.side_effect = lambda _: calls.append("verify")
+        session.target.reset.side_effect = lambda _: calls.append("reset")
+
+        pipeline = Pipeline()
+        result = pipeline.run("erase,flash,verify,reset", target_id=TARGET["target_id"],
+                              build=BIN_PATH)
+
+        self.assertEqual(result, EXIT_CODE_SUCCESS)
+        self.assertEqual(calls, ["erase", "flash", "verify", "reset"])
+        self.assertEqual(mock_refresh_target.call_count, 1)
+        self.assertEqual(mock_get_session.call_count, 1)
+        session.open.assert_called_once_with()
+        session.close.assert_called_once_with()
+        self.assertEqual([step for step, _ in pipeline.durations],
+                         ["erase", "flash", "verify", "reset"])
+
+    def test_stops_at_failure(self, mock_refresh_target, mock_get_session, mock_eraser,
+                              mock_programmer, mock_verifier):
+        mock_programmer.return_value.program.side_effect = ValueError("bad image")
+        pipeline = Pipeline()
+        with self.assertRaises(FlashError):
+            pipeline.run(["erase", "flash", "reset"], target_id=TARGET["target_id"],
+                         build=BIN_PATH)
+        self.assertEqual([step for step, _ in pipeline.durations], ["erase"])
+        self.assertFalse(mock_get_session.return_value.target.reset.called)
+
+    def test_image_needed(self, mock_refresh_target, mock_get_session, mock_eraser,
+                          mock_programmer, mock_verifier):
+        with self.assertRaises(FlashError) as context:
+            Pipeline().run("erase,flash", target_id=TARGET["target_id"])
+        self.assertEqual(context.exception.return_code, EXIT_CODE_MISUSE_CMD)
+        self.assertFalse(mock_refresh_target.called)
+
+    def test_api_result(self, mock_refresh_target, mock_get_session, mock_eraser,
+                        mock_programmer, mock_verifier):
+        result = FlasherAPI().run("erase,reset", target_id=TARGET["target_id"])
+        self.assertTrue(result.succeeded)
+        self.assertEqual(result.operation, "run")
+        self.assertEqual([step for step, _ in step_durations(result.timings)],
+                         ["erase", "reset"])
+
+
+@unittest.skipIf(platform.system() == "Windows", "Simulator serial port needs a pty")
+@mock.patch("mbed_flasher.mbed_common.CHECK_BINARY_DISAPPEAR_SLEEP", 0.05)
+class MsdPipelineTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.device = VirtualDaplink(programming_delay=0.05, remount_delay=0.05)
+        self.device.start()
+
+    def tearDown(self):
+        self.device.stop()
+        logging.disable(logging.NOTSET)
+
+    def test_erase_flash_reset(self):
+        with FakeBoardDetect([self.device]).installed():
+            pipeline = Pipeline()
+            result = pipeline.run("erase,flash,reset", target_id=self.device.target_id,
+                                  build=BIN_PATH, method="msd")
+        self.assertEqual(result, EXIT_CODE_SUCCESS)
+        self.assertEqual([name for name, _ in self.device.images], ["helloworld.bin"])
+        self.assertEqual([step for step, _ in pipeline.durations], ["erase", "flash", "reset"])
+
+
+if __name__ == '__main__':
+    unittest.main()
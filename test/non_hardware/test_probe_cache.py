@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=invalid-name
+# pylint:disable=unused-argument
+
+import logging
+import unittest
+
+import mock
+from pyocd.core.exceptions import ProbeError, TransferFaultError
+from pyocd.core.helpers import ConnectHelper
+
+from mbed_flasher.common import FlashError
+from mbed_flasher.flashers.FlasherPyOCD import FlasherPyOCD
+from mbed_flasher.flashers.probe_cache import ProbeCache
+
+
+def make_probe(unique_id):
+    probe = mock.MagicMock()
+    probe.unique_id = unique_id
+    return probe
+
+
+@mock.patch('mbed_flasher.flashers.probe_cache.usb_topology', return_value=("1-1",))
+@mock.patch('mbed_flasher.flashers.probe_cache.monotonic', return_value=100)
+class ProbeCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def test_probe_is_cached_until_ttl(self, mock_monotonic, mock_topology):
+        cache = ProbeCache(ttl=10)
+        probe = make_probe("id1")
+        cache.add("id1", probe)
+
+        mock_monotonic.return_value = 109
+        self.assertIs(cache.get("id1"), probe)
+        self.assertIsNone(cache.get("id2"))
+
+        mock_monotonic.return_value = 111
+        self.assertIsNone(cache.get("id1"))
+
+    def test_usb_hotplug_clears_cache(self, mock_monotonic, mock_topology):
+        cache = ProbeCache()
+        cache.add("id1", make_probe("id1"))
+
+        mock_topology.return_value = ("1-1", "1-2")
+        self.assertIsNone(cache.get("id1"))
+
+    def test_only_matching_probes_are_added(self, mock_monotonic, mock_topology):
+        cache = ProbeCache()
+        cache.add("id1", make_probe("other"))
+        cache.add("id2", mock.MagicMock())
+        self.assertIsNone(cache.get("id1"))
+        self.assertIsNone(cache.get("id2"))
+
+        disabled = ProbeCache(ttl=0)
+        disabled.add("id1", make_probe("id1"))
+        self.assertIsNone(disabled.get("id1"))
+
+    def test_discard_and_invalidate(self, mock_monotonic, mock_topology):
+        cache = ProbeCache()
+        probe1 = make_probe("id1")
+        cache.add("id1", probe1)
+        cache.add("id2", make_probe("id2"))
+
+        cache.discard(probe1)
+        self.assertIsNone(cache.get("id1"))
+        self.assertIsNotNone(cache.get("id2"))
+        cache.invalidate()
+        self.assertIsNone(cache.get("id2"))
+
+
+class FlasherPyOCDProbeCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.PROBE_CACHE', new_callable=ProbeCache)
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.Session')
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.ConnectHelper', autospec=ConnectHelper)
+    def test_second_session_skips_enumeration(self, mock_helper, mock_session, mock_cache):
+        probe = make_probe("test_id")
+        mock_helper.session_with_chosen_probe.return_value.probe = probe
+        target = {'target_id_usb_id': 'test_id'}
+
+        FlasherPyOCD()._get_session(target, 'k64f', None, 'halt', FlashError)
+        session = FlasherPyOCD()._get_session(target, 'k64f', None, 'halt', FlashError)
+
+        self.assertEqual(mock_helper.session_with_chosen_probe.call_count, 1)
+        self.assertIs(session, mock_session.return_value)
+        mock_session.assert_called_once_with(
+            probe, target_override='k64f', connect_mode='halt', resume_on_disconnect=False,
+            hide_programming_progress=True, pack=None)
+
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.PROBE_CACHE', new_callable=ProbeCache)
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.FlasherPyOCD._get_session')
+    def test_failing_session_discards_probe(self, mock_get_session, mock_cache):
+        probe = make_probe("test_id")
+        mock_cache.add("test_id", probe)
+        session = mock_get_session.return_value
+        session.probe = probe
+        session.__enter__.side_effect = IOError
+
+        with self.assertRaises(FlashError):
+            FlasherPyOCD().flash('', {'target_id_usb_id': 'test_id'}, True, 'k64f', None, 'halt')
+
+        self.assertIsNone(mock_cache.get("test_id"))
+
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.PROBE_CACHE', new_callable=ProbeCache)
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.FlasherPyOCD._get_session')
+    def test_operation_error_keeps_probe(self, mock_get_session, mock_cache):
+        probe = make_probe("test_id")
+        mock_cache.add("test_id", probe)
+        mock_get_session.return_value.probe = probe
+        target = {'target_id_usb_id': 'test_id'}
+
+        for error in (ValueError("bad image"), TransferFaultError("fault")):
+            with self.assertRaises(type(error)):
+                with FlasherPyOCD()._session(target, 'k64f', None, 'halt', FlashError):
+                    raise error
+            self.assertIs(mock_cache.get("test_id"), probe)
+
+        with self.assertRaises(ProbeError):
+            with FlasherPyOCD()._session(target, 'k64f', None, 'halt', FlashError):
+                raise ProbeError("disconnected")
+        self.assertIsNone(mock_cache.get("test_id"))
+
+
+if __name__ == '__main__':
+    unittest.main()
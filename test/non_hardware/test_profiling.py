@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=invalid-name
+# pylint:disable=unused-argument
+
+import logging
+import os
+import pstats
+import shutil
+import tempfile
+import time
+import unittest
+
+import mock
+
+from mbed_flasher.main import FlasherCLI
+from mbed_flasher.profiling import categorize, profile_call
+
+
+def work():
+    time.sleep(0.05)
+    total = 0
+    for value in range(20000):
+        total += value
+    return total
+
+
+class ProfilingTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.lines = []
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_categorize(self):
+        self.assertEqual(categorize(("~", 0, "<built-in method time.sleep>")), "sleep")
+        self.assertEqual(categorize(("~", 0, "<built-in method posix.listdir>")), "io")
+        self.assertEqual(categorize(("~", 0, "<method 'read' of '_io.BufferedReader' objects>")),
+                         "io")
+        self.assertEqual(categorize(("flash.py", 10, "sleep")), "cpu")
+        self.assertEqual(categorize(("~", 0, "<built-in method builtins.sorted>")), "cpu")
+
+    def test_cpu_profile(self):
+        output = os.path.join(self.tmp_dir, "out.pstats")
+        result = profile_call("cpu", work, self.lines.append, output=output)
+        self.assertEqual(result, sum(range(20000)))
+        self.assertTrue(pstats.Stats(output).stats)
+        self.assertIn("CPU profile written to", self.lines[0])
+        self.assertIn("sleep", self.lines[1])
+        self.assertIn("time.sleep", "\n".join(self.lines[2:]))
+
+    def test_mem_profile(self):
+        output = os.path.join(self.tmp_dir, "out.tracemalloc")
+        result = profile_call("mem", lambda: [bytearray(1024) for _ in range(100)],
+                              self.lines.append, output=output)
+        self.assertEqual(len(result), 100)
+        self.assertTrue(os.path.isfile(output))
+        self.assertIn("peak", self.lines[1])
+
+    def test_report_on_exception(self):
+        def fail():
+            raise RuntimeError("boom")
+
+        output = os.path.join(self.tmp_dir, "out.pstats")
+        with self.assertRaises(RuntimeError):
+            profile_call("cpu", fail, self.lines.append, output=output)
+        self.assertTrue(os.path.isfile(output))
+        self.assertTrue(self.lines)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            profile_call("gpu", work, self.lines.append)
+
+    @mock.patch("mbed_flasher.api.Reset")
+    def test_cli_profile(self, mock_reset):
+        mock_reset.return_value.reset.return_value = 0
+        output = os.path.join(self.tmp_dir, "reset.pstats")
+        cli = FlasherCLI(["--profile", "cpu", "--profile-output", output,
+                          "reset", "--tid", "0240"])
+        with mock.patch("sys.stderr"):
+            self.assertEqual(cli.execute(), 0)
+        self.assertTrue(os.path.isfile(output))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=invalid-name
+# pylint:disable=unused-argument
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+from pyocd.flash.file_programmer import FileProgrammer
+
+from mbed_flasher.common import FlashError
+from mbed_flasher.flashers.FlasherPyOCD import FlasherPyOCD
+from mbed_flasher.flashers.programming_profiles import get_programming_options
+from mbed_flasher.flashers.programming_profiles import parse_program_option
+from mbed_flasher.flashers.programming_profiles import ProgrammingStatistics
+from mbed_flasher.return_codes import EXIT_CODE_MISUSE_CMD
+
+
+class ProgrammingProfilesTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def test_default_profile_is_safe(self):
+        self.assertEqual(get_programming_options(), {"chip_erase": "sector"})
+
+    def test_raw_options_override_profile(self):
+        options = get_programming_options("max", ["chip-erase=chip", "trust_crc=off"])
+        self.assertEqual(options["chip_erase"], "chip")
+        self.assertFalse(options["trust_crc"])
+        self.assertTrue(options["double_buffer"])
+
+        options = get_programming_options("safe", {"smart_flash": False})
+        self.assertEqual(options, {"chip_erase": "sector", "smart_flash": False})
+
+    def test_invalid_options(self):
+        for option in ["chip_erase", "chip_erase=all", "trust_crc=maybe", "speed=11"]:
+            with self.assertRaises(FlashError) as cm:
+                parse_program_option(option)
+            self.assertEqual(cm.exception.return_code, EXIT_CODE_MISUSE_CMD)
+
+        with self.assertRaises(FlashError):
+            get_programming_options("turbo")
+
+    def test_fastest_reliable_profile(self):
+        statistics = ProgrammingStatistics()
+        statistics.record("k64f", "safe", 10000)
+        statistics.record("k64f", "fast", 30000)
+        statistics.record("k64f", "max", 50000)
+        statistics.record("k64f", "max", None)
+        statistics.record("nrf52", "max", 90000)
+
+        self.assertEqual(statistics.summary("k64f")["max"]["failures"], 1)
+        self.assertEqual(statistics.fastest("k64f"), "fast")
+        self.assertIsNone(statistics.fastest("unknown"))
+
+
+class FlasherPyOCDProfileTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmp_dir, "image.bin")
+        with open(self.source, "wb") as image:
+            image.write(b"\0" * 4096)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.PROGRAMMING_STATISTICS')
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.FlasherPyOCD._get_session')
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.FileProgrammer', autospec=FileProgrammer)
+    def test_profile_options_are_used(self, mock_programmer, mock_get_session, mock_statistics):
+        session = mock.MagicMock()
+        flash_region = mock.MagicMock(is_flash=True)
+        flash_region.flash.double_buffer_supported = True
+        session.target.memory_map = [flash_region, mock.MagicMock(is_flash=False)]
+        mock_get_session.return_value = session
+        programmed_with = []
+        mock_programmer.return_value.program.side_effect = lambda source: \
+            programmed_with.append(flash_region.flash.double_buffer_supported)
+        flasher = FlasherPyOCD()
+
+        flasher.flash(self.source, '', True, 'k64f', None, None,
+                      profile='fast', program_options=['double_buffer=false'])
+
+        self.assertEqual(mock_programmer.call_args[1],
+                         {'chip_erase': 'auto', 'smart_flash': True})
+        self.assertEqual(programmed_with, [False])
+        # pooled sessions are reused by other jobs, the original value is restored
+        self.assertTrue(flash_region.flash.double_buffer_supported)
+        self.assertGreater(flasher.throughput, 0)
+        mock_statistics.record.assert_called_once_with('k64f', 'fast', flasher.throughput)
+
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.PROGRAMMING_STATISTICS')
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.FlasherPyOCD._get_session',
+                side_effect=IOError)
+    def test_failure_is_recorded(self, mock_get_session, mock_statistics):
+        with self.assertRaises(FlashError):
+            FlasherPyOCD().flash(self.source, '', True, 'k64f', None, None, profile='max')
+
+        mock_statistics.record.assert_called_once_with('k64f', 'max', None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=too-few-public-methods
+# pylint:disable=invalid-name
+# pylint:disable=unused-argument
+
+import logging
+import unittest
+
+import mock
+
+from mbed_flasher.common import FlashError
+from mbed_flasher.flashers.FlasherMbed import FlasherMbed
+from mbed_flasher.readiness import ReadinessProbe
+from mbed_flasher.return_codes import EXIT_CODE_BOOT_BANNER_TIMEOUT
+from mbed_flasher.return_codes import EXIT_CODE_SUCCESS
+
+
+class FakePort(object):
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.timeout = 1
+
+    @property
+    def in_waiting(self):
+        return len(self.chunks[0]) if self.chunks else 0
+
+    def read(self, size=1):
+        if self.chunks:
+            return self.chunks.pop(0)
+        return b""
+
+
+class ReadinessProbeTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def test_banner_found_returns_latency(self):
+        probe = ReadinessProbe(r"mbed OS \d+\.\d+")
+        port = FakePort([b"booting...\r\n", b"welcome to mbed OS 5.15\r\n"])
+        latency = probe.wait(port)
+
+        self.assertIsNotNone(latency)
+        self.assertEqual(probe.latency, latency)
+        probe.raise_if_not_ready()
+
+    def test_banner_split_over_reads(self):
+        probe = ReadinessProbe("READY")
+        port = FakePort([b"xxRE", b"A", b"DYxx"])
+        self.assertIsNotNone(probe.wait(port))
+
+    def test_timeout_raises(self):
+        probe = ReadinessProbe("READY", timeout=0.01)
+        port = FakePort([b"nothing interesting"])
+        self.assertIsNone(probe.wait(port))
+
+        with self.assertRaises(FlashError) as cm:
+            probe.raise_if_not_ready()
+
+        self.assertEqual(cm.exception.return_code, EXIT_CODE_BOOT_BANNER_TIMEOUT)
+
+
+class FlasherMbedBootProbeTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    @mock.patch('mbed_flasher.flashers.FlasherMbed.sleep')
+    @mock.patch('mbed_flasher.flashers.FlasherMbed.FlasherMbed.verify_flash_success')
+    @mock.patch('mbed_flasher.flashers.FlasherMbed.FlasherMbed.copy_file')
+    @mock.patch('mbed_flasher.flashers.FlasherMbed.Reset')
+    @mock.patch('mbed_flasher.mbed_common.MbedCommon.wait_for_file_disappear')
+    @mock.patch('mbed_flasher.mbed_common.MbedCommon.refresh_target')
+    def test_probe_replaces_fixed_sleep(self, mock_refresh_target, mock_wait, mock_reset,
+                                        mock_copy_file, mock_verify, mock_sleep):
+        target = {"target_id": "123", "mount_point": "/mnt", "serial_port": "/dev/tty"}
+        mock_refresh_target.return_value = target
+        mock_wait.return_value = target
+        mock_verify.return_value = EXIT_CODE_SUCCESS
+        probe = mock.MagicMock()
+
+        result = FlasherMbed().flash("test.bin", target, False, boot_probe=probe)
+
+        self.assertEqual(result, EXIT_CODE_SUCCESS)
+        mock_reset.return_value.reset_target.assert_called_with(
+            target, 'simple', boot_probe=probe)
+        probe.raise_if_not_ready.assert_called_once_with()
+        self.assertNotIn(mock.call(0.4), mock_sleep.call_args_list)
+
+
+if __name__ == '__main__':
+    unittest.main()
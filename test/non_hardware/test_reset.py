@@ -28,9 +28,14 @@ except ImportError:
 import mock
 
 from mbed_flasher.common import ResetError
+from mbed_flasher.flashers.FlasherPyOCD import get_reset_type
 from mbed_flasher.reset import Reset
+from mbed_flasher.reset_methods import ResetStatistics
 from mbed_flasher.return_codes import EXIT_CODE_TARGET_ID_MISSING
 from mbed_flasher.return_codes import EXIT_CODE_COULD_NOT_MAP_TARGET_ID_TO_DEVICE
+from mbed_flasher.return_codes import EXIT_CODE_MISUSE_CMD
+from mbed_flasher.return_codes import EXIT_CODE_SERIAL_PORT_MISSING
+from mbed_flasher.return_codes import EXIT_CODE_SERIAL_RESET_FAILED
 
 
 class ResetTestCase(unittest.TestCase):
@@ -56,5 +61,99 @@ class ResetTestCase(unittest.TestCase):
         self.assertEqual(cm.exception.return_code, EXIT_CODE_COULD_NOT_MAP_TARGET_ID_TO_DEVICE)
 
 
+class ResetMethodTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def test_unknown_method_is_misuse(self):
+        with self.assertRaises(ResetError) as cm:
+            Reset().reset_target({"serial_port": "/dev/tty"}, method='unknown')
+
+        self.assertEqual(cm.exception.return_code, EXIT_CODE_MISUSE_CMD)
+
+    def test_serial_port_missing(self):
+        with self.assertRaises(ResetError) as cm:
+            Reset().reset_target({"target_id": "123"}, method='simple')
+
+        self.assertEqual(cm.exception.return_code, EXIT_CODE_SERIAL_PORT_MISSING)
+
+    @mock.patch('mbed_flasher.reset_methods.EnhancedSerial')
+    def test_break_duration_is_used_and_latency_recorded(self, mock_serial):
+        port = mock_serial.return_value
+        port.safe_send_break.return_value = True
+        resetter = Reset()
+        resetter.reset_board("/dev/tty", method='break', duration=0.01)
+
+        port.safe_send_break.assert_called_once_with(0.01)
+        port.close.assert_called_once_with()
+        self.assertIsNotNone(resetter.latency)
+
+    @mock.patch('mbed_flasher.reset_methods.EnhancedSerial')
+    def test_break_failure_closes_port(self, mock_serial):
+        port = mock_serial.return_value
+        port.safe_send_break.return_value = False
+        with self.assertRaises(ResetError) as cm:
+            Reset().reset_board("/dev/tty")
+
+        self.assertEqual(cm.exception.return_code, EXIT_CODE_SERIAL_RESET_FAILED)
+        port.close.assert_called_once_with()
+
+    @mock.patch('mbed_flasher.reset_methods.sleep')
+    @mock.patch('mbed_flasher.reset_methods.EnhancedSerial')
+    def test_dtr_is_pulsed(self, mock_serial, mock_sleep):
+        port = mock_serial.return_value
+        states = []
+        type(port).dtr = mock.PropertyMock(side_effect=states.append)
+        Reset().reset_board("/dev/tty", method='dtr')
+
+        self.assertEqual(states, [True, False])
+        mock_sleep.assert_called_once_with(0.1)
+
+    def test_statistics_pick_fastest_reliable_method(self):
+        statistics = ResetStatistics()
+        statistics.record("K64F", "break", 0.3)
+        statistics.record("K64F", "dtr", 0.1)
+        statistics.record("K64F", "dtr", None)
+        statistics.record("K64F", "rts", 0.2)
+        statistics.record("NRF52_DK", "dtr", 0.05)
+
+        self.assertEqual(statistics.fastest("K64F"), "rts")
+        self.assertEqual(statistics.summary("K64F")["dtr"]["failures"], 1)
+        self.assertIsNone(statistics.fastest("UNKNOWN"))
+
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.FlasherPyOCD._get_session')
+    @mock.patch('mbed_flasher.mbed_common.MbedCommon.refresh_target')
+    def test_pyocd_reset_without_serial_port(self, mock_refresh_target, mock_get_session):
+        target = {"target_id": "123", "target_id_usb_id": "123", "serial_port": None}
+        mock_refresh_target.return_value = target
+        session = mock_get_session.return_value
+        resetter = Reset()
+
+        resetter.reset(target_id="123", method='pyocd', pyocd_platform='k64f',
+                       pyocd_reset_type='sw')
+
+        session.target.reset.assert_called_once_with(get_reset_type('sw'))
+        mock_get_session.assert_called_once_with(target, 'k64f', None, 'attach', ResetError)
+        self.assertIsNotNone(resetter.latency)
+
+    @mock.patch('mbed_flasher.reset_methods.EnhancedSerial')
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.FlasherPyOCD._get_session')
+    def test_pyocd_reset_opens_port_for_boot_probe(self, mock_get_session, mock_serial):
+        target = {"target_id_usb_id": "123", "serial_port": "/dev/tty"}
+        probe = mock.MagicMock()
+
+        Reset().reset_target(target, 'pyocd', boot_probe=probe)
+
+        mock_get_session.return_value.target.reset.assert_called_once_with(get_reset_type('hw'))
+        probe.wait.assert_called_once_with(mock_serial.return_value)
+        mock_serial.return_value.close.assert_called_once_with()
+
+    def test_unknown_pyocd_reset_type(self):
+        with self.assertRaises(ResetError) as cm:
+            get_reset_type('cold')
+
+        self.assertEqual(cm.exception.return_code, EXIT_CODE_MISUSE_CMD)
+
+
 if __name__ == '__main__':
     unittest.main()
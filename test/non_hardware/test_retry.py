@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=invalid-name
+# pylint:disable=unused-argument
+
+import logging
+import os
+import unittest
+
+import mock
+
+from mbed_flasher.common import FlashError
+from mbed_flasher.flash import Flash
+from mbed_flasher.retry import RetryPolicy, RetryBudget, EXTENDED_RETRYABLE_RETURN_CODES
+from mbed_flasher.return_codes import EXIT_CODE_SUCCESS
+from mbed_flasher.return_codes import EXIT_CODE_DAPLINK_TRANSIENT_ERROR
+from mbed_flasher.return_codes import EXIT_CODE_DAPLINK_USER_ERROR
+from mbed_flasher.return_codes import EXIT_CODE_OS_ERROR
+
+TARGET = {"target_id": "0240", "mount_point": "/mnt/a", "serial_port": "/dev/ttyACM0"}
+
+
+def transient():
+    return FlashError(message="An error occurred during the transfer",
+                      return_code=EXIT_CODE_DAPLINK_TRANSIENT_ERROR)
+
+
+class RetryPolicyTestCase(unittest.TestCase):
+    def test_default_does_not_retry(self):
+        self.assertFalse(RetryPolicy().should_retry(transient(), 1, "0240"))
+
+    def test_retries_only_retryable(self):
+        policy = RetryPolicy(attempts=3)
+        self.assertTrue(policy.should_retry(transient(), 1, "0240"))
+        self.assertTrue(policy.should_retry(transient(), 2, "0240"))
+        self.assertFalse(policy.should_retry(transient(), 3, "0240"))
+        user_error = FlashError(message="The file is too large",
+                                return_code=EXIT_CODE_DAPLINK_USER_ERROR)
+        self.assertFalse(policy.should_retry(user_error, 1, "0240"))
+
+    def test_os_errors_retried_on_opt_in(self):
+        os_error = FlashError(message="Input/output error", return_code=EXIT_CODE_OS_ERROR)
+        self.assertFalse(RetryPolicy(attempts=3).should_retry(os_error, 1, "0240"))
+        policy = RetryPolicy(attempts=3, retryable=EXTENDED_RETRYABLE_RETURN_CODES)
+        self.assertTrue(policy.should_retry(os_error, 1, "0240"))
+
+    def test_delay_is_jittered_exponential(self):
+        policy = RetryPolicy(backoff=1, max_backoff=3, jitter=0.5)
+        for _ in range(20):
+            self.assertTrue(0.5 <= policy.delay(1) <= 1.5)
+            self.assertTrue(1 <= policy.delay(2) <= 3)
+            self.assertTrue(1.5 <= policy.delay(5) <= 4.5)
+
+    def test_budget_per_target(self):
+        policy = RetryPolicy(attempts=5, budget=RetryBudget(1))
+        self.assertTrue(policy.should_retry(transient(), 1, "0240"))
+        self.assertFalse(policy.should_retry(transient(), 2, "0240"))
+        self.assertTrue(policy.should_retry(transient(), 1, "1234"))
+
+    @mock.patch("mbed_flasher.retry.monotonic")
+    def test_budget_window(self, mock_monotonic):
+        budget = RetryBudget(1, window=10)
+        mock_monotonic.return_value = 100
+        self.assertTrue(budget.consume("0240"))
+        mock_monotonic.return_value = 105
+        self.assertFalse(budget.consume("0240"))
+        mock_monotonic.return_value = 111
+        self.assertTrue(budget.consume("0240"))
+
+
+@mock.patch("mbed_flasher.flash.time.sleep")
+@mock.patch("mbed_flasher.flash.MbedCommon.refresh_target", return_value=TARGET)
+@mock.patch("mbed_flasher.flash.FlasherMbed.flash")
+class FlashRetryTestCase(unittest.TestCase):
+    bin_path = os.path.join('test', 'helloworld.bin')
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_no_retry_by_default(self, mock_flash, mock_refresh, mock_sleep):
+        mock_flash.side_effect = transient()
+        flasher = Flash()
+        with self.assertRaises(FlashError):
+            flasher.flash(build=self.bin_path, target_id="0240")
+        self.assertEqual(mock_flash.call_count, 1)
+        self.assertEqual(len(flasher.attempts), 1)
+        mock_sleep.assert_not_called()
+
+    def test_retry_until_success(self, mock_flash, mock_refresh, mock_sleep):
+        mock_flash.side_effect = [transient(), None]
+        flasher = Flash()
+        result = flasher.flash(build=self.bin_path, target_id="0240",
+                               retry_policy=RetryPolicy(attempts=3, jitter=0))
+        self.assertEqual(result, EXIT_CODE_SUCCESS)
+        self.assertEqual(mock_flash.call_count, 2)
+        mock_sleep.assert_called_once_with(1.0)
+        self.assertEqual([a["return_code"] for a in flasher.attempts],
+                         [EXIT_CODE_DAPLINK_TRANSIENT_ERROR, EXIT_CODE_SUCCESS])
+        self.assertEqual(flasher.attempts[0]["delay"], 1.0)
+
+    def test_gives_up_after_attempts(self, mock_flash, mock_refresh, mock_sleep):
+        mock_flash.side_effect = transient()
+        flasher = Flash()
+        with self.assertRaises(FlashError) as cm:
+            flasher.flash(build=self.bin_path, target_id="0240",
+                          retry_policy=RetryPolicy(attempts=3))
+        self.assertEqual(cm.exception.return_code, EXIT_CODE_DAPLINK_TRANSIENT_ERROR)
+        self.assertEqual(mock_flash.call_count, 3)
+        self.assertEqual(len(flasher.attempts), 3)
+
+    def test_non_retryable_raises(self, mock_flash, mock_refresh, mock_sleep):
+        mock_flash.side_effect = FlashError(message="The file is too large",
+                                            return_code=EXIT_CODE_DAPLINK_USER_ERROR)
+        with self.assertRaises(FlashError):
+            Flash().flash(build=self.bin_path, target_id="0240",
+                          retry_policy=RetryPolicy(attempts=3))
+        self.assertEqual(mock_flash.call_count, 1)
+
+    @mock.patch("mbed_flasher.flash.Reset.reset_target")
+    def test_reset_between(self, mock_reset, mock_flash, mock_refresh, mock_sleep):
+        mock_flash.side_effect = [transient(), None]
+        Flash().flash(build=self.bin_path, target_id="0240",
+                      retry_policy=RetryPolicy(attempts=2, reset_between=True))
+        mock_reset.assert_called_once_with(TARGET, method='simple')
+
+    @mock.patch("mbed_flasher.flash.Reset")
+    def test_reset_between_uses_reset_method(self, mock_reset, mock_flash, mock_refresh,
+                                             mock_sleep):
+        mock_flash.side_effect = [transient(), None]
+        session_pool = mock.Mock()
+        Flash(session_pool=session_pool).flash(
+            build=self.bin_path, target_id="0240", reset_method="pyocd",
+            pyocd_platform="k64f", retry_policy=RetryPolicy(attempts=2, reset_between=True))
+        self.assertIs(mock_reset.call_args[1]["session_pool"], session_pool)
+        mock_reset.return_value.reset_target.assert_called_once_with(
+            TARGET, method="pyocd", platform="k64f", pack=None, session_pool=session_pool)
+
+
+if __name__ == '__main__':
+    unittest.main()
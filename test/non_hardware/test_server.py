@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=invalid-name
+# pylint:disable=unused-argument
+
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+
+import mock
+
+from mbed_flasher.api import OperationResult
+from mbed_flasher.common import FlashError, ResetError
+from mbed_flasher.main import FlasherCLI
+from mbed_flasher.retry import RetryPolicy, EXTENDED_RETRYABLE_RETURN_CODES
+from mbed_flasher.server import FlashServer, ServerClient, client_if_running
+from mbed_flasher.server import parse_address, encode_args, decode_args
+from mbed_flasher.server import default_address, check_socket_owner
+from mbed_flasher.simulator import VirtualDaplink, FakeBoardDetect
+from mbed_flasher.return_codes import EXIT_CODE_OS_ERROR
+from mbed_flasher.return_codes import EXIT_CODE_SUCCESS
+from mbed_flasher.return_codes import EXIT_CODE_RESET_FAIL
+
+
+def result_of(operation, target_id=None, **kwargs):
+    return OperationResult(operation, target_id, kwargs.get("method"))
+
+
+class ServerHelpersTestCase(unittest.TestCase):
+    def test_parse_address(self):
+        self.assertEqual(parse_address("127.0.0.1:8765"), (socket.AF_INET, ("127.0.0.1", 8765)))
+        self.assertEqual(parse_address("localhost:80"), (socket.AF_INET, ("localhost", 80)))
+        self.assertEqual(parse_address("/tmp/mbedflash.sock")[1], "/tmp/mbedflash.sock")
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix sockets not available")
+    def test_default_address(self):
+        runtime_dir = tempfile.mkdtemp()
+        try:
+            with mock.patch.dict(os.environ, {"XDG_RUNTIME_DIR": runtime_dir}):
+                self.assertEqual(default_address(), os.path.join(runtime_dir, "mbedflash.sock"))
+        finally:
+            shutil.rmtree(runtime_dir)
+        with mock.patch.dict(os.environ, {"XDG_RUNTIME_DIR": ""}):
+            self.assertEqual(os.path.basename(os.path.dirname(default_address())),
+                             "mbedflash-{}".format(os.getuid()))
+
+    def test_args_round_trip(self):
+        policy = RetryPolicy(attempts=3, reset_between=True,
+                             retryable=EXTENDED_RETRYABLE_RETURN_CODES)
+        encoded = encode_args({"build": "image.bin", "retry_policy": policy})
+        self.assertEqual(encoded["build"], os.path.abspath("image.bin"))
+        self.assertEqual(encoded["retry_policy"]["attempts"], 3)
+        decoded = decode_args(json.loads(json.dumps(encoded)))
+        self.assertEqual(decoded["retry_policy"].attempts, 3)
+        self.assertTrue(decoded["retry_policy"].reset_between)
+        self.assertEqual(decoded["retry_policy"].retryable, EXTENDED_RETRYABLE_RETURN_CODES)
+
+    def test_result_round_trip(self):
+        result = OperationResult("reset", "0240", "simple")
+        result.return_code = EXIT_CODE_RESET_FAIL
+        result.message = "no serial port"
+        copy = OperationResult.from_dict(result.as_dict())
+        self.assertEqual(copy.as_dict(), result.as_dict())
+        self.assertIsInstance(copy.error, ResetError)
+        self.assertEqual(copy.error.return_code, EXIT_CODE_RESET_FAIL)
+
+
+class FlashServerQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.server = FlashServer(address="127.0.0.1:0")
+        self.server.api = mock.Mock()
+        self.release = threading.Event()
+        self.calls = []
+
+        def erase(target_id=None, **kwargs):
+            self.calls.append(target_id)
+            self.release.wait(5)
+            return result_of("erase", target_id)
+
+        self.server.api.erase.side_effect = erase
+
+    def tearDown(self):
+        self.release.set()
+        logging.disable(logging.NOTSET)
+
+    def wait_calls(self, count):
+        for _ in range(500):
+            if len(self.calls) >= count:
+                return
+            threading.Event().wait(0.01)
+        self.fail("erase not called")
+
+    def test_coalesce_pending(self):
+        events = []
+        running = self.server.submit("erase", {"target_id": "1"})
+        self.wait_calls(1)
+        first = self.server.submit("erase", {"target_id": "1", "no_reset": True}, events.append)
+        second = self.server.submit("erase", {"target_id": "1", "no_reset": True}, events.append)
+        other = self.server.submit("erase", {"target_id": "1"}, events.append)
+        self.assertIs(first, second)
+        self.assertIsNot(running, other)
+        self.assertEqual([event["coalesced"] for event in events], [False, True, False])
+        self.release.set()
+        for job in (running, first, other):
+            self.assertTrue(job.done.wait(5))
+        self.assertEqual(self.calls, ["1", "1", "1"])
+        self.assertEqual(len([event for event in events if event["event"] == "finished"]), 3)
+
+    def test_targets_in_parallel(self):
+        jobs = [self.server.submit("erase", {"target_id": target_id})
+                for target_id in ("1", "2")]
+        self.wait_calls(2)
+        self.assertEqual(sorted(self.calls), ["1", "2"])
+        self.release.set()
+        for job in jobs:
+            self.assertTrue(job.done.wait(5))
+            self.assertTrue(job.result.succeeded)
+
+    def test_unknown_operation(self):
+        with self.assertRaises(ValueError):
+            self.server.submit("format", {"target_id": "1"})
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix sockets not available")
+class FlashServerSocketTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.address = os.path.join(self.tmp_dir, "mbedflash.sock")
+        self.server = FlashServer(address=self.address)
+        self.server.api = mock.Mock()
+        self.server.api.reset.side_effect = lambda **kwargs: result_of("reset", **kwargs)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.tmp_dir)
+        logging.disable(logging.NOTSET)
+
+    def test_client(self):
+        self.assertIsNotNone(client_if_running(self.address))
+        result = ServerClient(self.address).reset(target_id="0240", method="simple")
+        self.assertTrue(result.succeeded)
+        self.assertEqual(result.method, "simple")
+        self.server.api.reset.assert_called_once_with(target_id="0240", method="simple")
+
+    def test_already_running(self):
+        with self.assertRaises(FlashError):
+            FlashServer(address=self.address).start()
+
+    def test_socket_mode(self):
+        self.assertEqual(os.stat(self.address).st_mode & 0o777, 0o600)
+
+    def test_socket_of_other_user(self):
+        stat_result = os.stat(self.address)
+        other = mock.Mock(st_uid=os.getuid() + 1, st_mode=stat_result.st_mode)
+        real_stat = os.stat
+        with mock.patch("mbed_flasher.server.os.stat",
+                        side_effect=lambda path: other if path == self.address
+                        else real_stat(path)):
+            with self.assertRaises(FlashError) as context:
+                check_socket_owner(self.address)
+            self.assertEqual(context.exception.return_code, EXIT_CODE_OS_ERROR)
+            with self.assertRaises(FlashError):
+                client_if_running(self.address)
+        self.assertFalse(self.server.api.reset.called)
+
+    def test_shared_socket_dir(self):
+        os.chmod(self.tmp_dir, 0o777)
+        try:
+            with self.assertRaises(FlashError):
+                check_socket_owner(self.address)
+        finally:
+            os.chmod(self.tmp_dir, 0o700)
+
+    def test_private_socket_dir(self):
+        address = os.path.join(self.tmp_dir, "run", "server.sock")
+        server = FlashServer(address=address)
+        server.start()
+        try:
+            self.assertEqual(os.stat(os.path.dirname(address)).st_mode & 0o777, 0o700)
+        finally:
+            server.stop()
+
+    @mock.patch("mbed_flasher.main.client_if_running")
+    @mock.patch("mbed_flasher.main.FlasherAPI")
+    def test_cli_forwarding_opt_in(self, mock_api, mock_client_if_running):
+        mock_api.return_value.reset.return_value = result_of("reset")
+        with mock.patch.dict(os.environ, {"MBEDFLASH_SERVER": ""}):
+            cli = FlasherCLI(["reset", "--tid", "0240"])
+        self.assertEqual(cli.execute(), EXIT_CODE_SUCCESS)
+        self.assertFalse(mock_client_if_running.called)
+        mock_client_if_running.return_value = ServerClient(self.address)
+        with mock.patch.dict(os.environ, {"MBEDFLASH_SERVER": ""}):
+            cli = FlasherCLI(["--use-server", "reset", "--tid", "0240"])
+        self.assertEqual(cli.execute(), EXIT_CODE_SUCCESS)
+        mock_client_if_running.assert_called_once_with("", cli.logger)
+        self.assertTrue(self.server.api.reset.called)
+
+    def test_stop_removes_socket(self):
+        self.server.stop()
+        self.assertFalse(os.path.exists(self.address))
+        self.assertIsNone(client_if_running(self.address))
+
+    def test_cli_forwards(self):
+        cli = FlasherCLI(["--server", self.address, "reset", "--tid", "0240"])
+        self.assertEqual(cli.execute(), EXIT_CODE_SUCCESS)
+        self.assertEqual(self.server.api.reset.call_args[1]["target_id"], "0240")
+
+    def test_cli_forwarded_error(self):
+        def reset(**kwargs):
+            result = result_of("reset", **kwargs)
+            result.return_code = EXIT_CODE_RESET_FAIL
+            result.message = "no serial port"
+            return result
+
+        self.server.api.reset.side_effect = reset
+        cli = FlasherCLI(["--server", self.address, "reset", "--tid", "0240"])
+        with self.assertRaises(ResetError) as context:
+            cli.execute()
+        self.assertEqual(context.exception.return_code, EXIT_CODE_RESET_FAIL)
+
+    @mock.patch("mbed_flasher.main.FlasherAPI")
+    def test_cli_no_server(self, mock_api):
+        mock_api.return_value.reset.return_value = result_of("reset")
+        cli = FlasherCLI(["--server", self.address, "--no-server", "reset", "--tid", "0240"])
+        self.assertEqual(cli.execute(), EXIT_CODE_SUCCESS)
+        self.assertFalse(self.server.api.reset.called)
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix sockets not available")
+@mock.patch("mbed_flasher.mbed_common.CHECK_BINARY_DISAPPEAR_SLEEP", 0.05)
+class FlashServerSimulatorTestCase(unittest.TestCase):
+    bin_path = os.path.join('test', 'helloworld.bin')
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.device = VirtualDaplink(programming_delay=0.05, remount_delay=0.05)
+        self.device.start()
+
+    def tearDown(self):
+        self.device.stop()
+        shutil.rmtree(self.tmp_dir)
+        logging.disable(logging.NOTSET)
+
+    def test_flash_through_server(self):
+        address = os.path.join(self.tmp_dir, "mbedflash.sock")
+        detector = FakeBoardDetect([self.device])
+        with detector.installed():
+            server = FlashServer(address=address)
+            server.start()
+            try:
+                with mock.patch("mbed_flasher.mbed_common.create_board_detect") as create:
+                    results = [ServerClient(address).flash(self.bin_path,
+                                                           target_id=self.device.target_id)
+                               for _ in range(2)]
+                self.assertFalse(create.called)
+            finally:
+                server.stop()
+        self.assertTrue(all(result.succeeded for result in results))
+        self.assertEqual(len(self.device.images), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=invalid-name
+# pylint:disable=unused-argument
+
+import logging
+import unittest
+
+import mock
+from pyocd.flash.file_programmer import FileProgrammer
+from pyocd.flash.eraser import FlashEraser
+
+from mbed_flasher.flashers.FlasherPyOCD import FlasherPyOCD
+from mbed_flasher.flashers.session_pool import SessionPool
+
+
+class SessionPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.opened = []
+
+    def opener(self):
+        session = mock.MagicMock()
+        session.is_open = True
+        session.probe.is_open = True
+        self.opened.append(session)
+        return session
+
+    def test_session_is_reused(self):
+        pool = SessionPool()
+        with pool.session("id", ("k64f",), self.opener) as first:
+            pass
+        with pool.session("id", ("k64f",), self.opener) as second:
+            pass
+
+        self.assertIs(first, second)
+        self.assertEqual(len(self.opened), 1)
+        first.open.assert_called_once_with()
+        first.close.assert_not_called()
+        pool.close_all()
+        first.close.assert_called_once_with()
+
+    def test_probes_get_own_sessions(self):
+        pool = SessionPool()
+        with pool.session("id1", None, self.opener) as first:
+            pass
+        with pool.session("id2", None, self.opener) as second:
+            pass
+
+        self.assertIsNot(first, second)
+        pool.close_all()
+
+    def test_changed_options_reopen(self):
+        pool = SessionPool()
+        with pool.session("id", ("k64f", None, "halt"), self.opener) as first:
+            pass
+        with pool.session("id", ("k64f", None, "attach"), self.opener) as second:
+            pass
+
+        self.assertIsNot(first, second)
+        first.close.assert_called_once_with()
+        pool.close_all()
+
+    def test_unhealthy_session_is_replaced(self):
+        pool = SessionPool()
+        with pool.session("id", None, self.opener) as first:
+            pass
+        first.target.get_state.side_effect = IOError
+        with pool.session("id", None, self.opener) as second:
+            pass
+
+        self.assertIsNot(first, second)
+        first.close.assert_called_once_with()
+        pool.close_all()
+
+    def test_failing_operation_discards_session(self):
+        pool = SessionPool()
+        with self.assertRaises(ValueError):
+            with pool.session("id", None, self.opener) as first:
+                raise ValueError()
+
+        first.close.assert_called_once_with()
+        with pool.session("id", None, self.opener) as second:
+            pass
+        self.assertIsNot(first, second)
+        pool.close_all()
+
+    @mock.patch('mbed_flasher.flashers.session_pool.monotonic')
+    def test_idle_session_is_evicted(self, mock_monotonic):
+        mock_monotonic.return_value = 100
+        pool = SessionPool(idle_timeout=10)
+        with pool.session("id", None, self.opener) as first:
+            pass
+
+        mock_monotonic.return_value = 105
+        pool.evict_idle()
+        first.close.assert_not_called()
+
+        mock_monotonic.return_value = 111
+        pool.evict_idle()
+        first.close.assert_called_once_with()
+
+
+class FlasherPyOCDSessionPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.FlasherPyOCD._get_session')
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.FlashEraser', autospec=FlashEraser)
+    @mock.patch('mbed_flasher.flashers.FlasherPyOCD.FileProgrammer', autospec=FileProgrammer)
+    def test_erase_and_flash_share_session(self, mock_programmer, mock_eraser, mock_get_session):
+        session = mock.MagicMock()
+        session.is_open = True
+        session.probe.is_open = True
+        mock_get_session.return_value = session
+        pool = SessionPool()
+        target = {'target_id_usb_id': 'test_id'}
+
+        flasher = FlasherPyOCD(session_pool=pool)
+        flasher.erase(target, True, 'k64f', None, 'halt')
+        flasher.flash('test.bin', target, False, 'k64f', None, 'halt')
+
+        self.assertEqual(mock_get_session.call_count, 1)
+        session.open.assert_called_once_with()
+        session.target.reset.assert_called_once_with()
+        session.close.assert_not_called()
+        pool.close_all()
+        session.close.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=invalid-name
+# pylint:disable=unused-argument
+
+import logging
+import os
+import platform
+import unittest
+
+import mock
+
+from mbed_flasher.common import FlashError
+from mbed_flasher.erase import Erase
+from mbed_flasher.flash import Flash
+from mbed_flasher.mbed_common import MbedCommon
+from mbed_flasher.simulator import VirtualDaplink, FakeBoardDetect
+from mbed_flasher.return_codes import EXIT_CODE_SUCCESS
+from mbed_flasher.return_codes import EXIT_CODE_DAPLINK_TRANSIENT_ERROR
+
+
+class FakeBoardDetectTestCase(unittest.TestCase):
+    def test_list_and_filter(self):
+        detector = FakeBoardDetect([{"target_id": "1"}, {"target_id": "2"}])
+        self.assertEqual(len(detector.list_mbeds()), 2)
+        self.assertEqual(detector.list_mbeds(filter_function=lambda m: m["target_id"] == "2"),
+                         [{"target_id": "2"}])
+        self.assertEqual(detector.scans, 2)
+
+    def test_installed(self):
+        detector = FakeBoardDetect([{"target_id": "1", "mount_point": "/mnt"}])
+        with detector.installed():
+            self.assertEqual(MbedCommon.refresh_target("1")["mount_point"], "/mnt")
+        self.assertEqual(detector.scans, 1)
+
+
+@unittest.skipIf(platform.system() == "Windows", "Simulator serial port needs a pty")
+@mock.patch("mbed_flasher.mbed_common.CHECK_BINARY_DISAPPEAR_SLEEP", 0.05)
+class VirtualDaplinkTestCase(unittest.TestCase):
+    bin_path = os.path.join('test', 'helloworld.bin')
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.device = VirtualDaplink(programming_delay=0.05, remount_delay=0.05)
+        self.device.start()
+
+    def tearDown(self):
+        self.device.stop()
+        logging.disable(logging.NOTSET)
+
+    def test_mount_contents(self):
+        self.assertEqual(sorted(os.listdir(self.device.mount_point)),
+                         ["DETAILS.TXT", "MBED.HTM"])
+        self.assertEqual(self.device.info["mount_point"], self.device.mount_point)
+
+    def test_flash(self):
+        with FakeBoardDetect([self.device]).installed():
+            result = Flash().flash(build=self.bin_path, target_id=self.device.target_id)
+        self.assertEqual(result, EXIT_CODE_SUCCESS)
+        with open(self.bin_path, "rb") as image:
+            self.assertEqual(self.device.images, [("helloworld.bin", image.read())])
+        self.assertEqual(self.device.remount_count, 1)
+
+    def test_injected_error(self):
+        self.device.inject_error()
+        with FakeBoardDetect([self.device]).installed():
+            with self.assertRaises(FlashError) as cm:
+                Flash().flash(build=self.bin_path, target_id=self.device.target_id)
+        self.assertEqual(cm.exception.return_code, EXIT_CODE_DAPLINK_TRANSIENT_ERROR)
+        self.assertEqual(self.device.images, [])
+        self.assertIn("FAIL.TXT", os.listdir(self.device.mount_point))
+
+    def test_erase(self):
+        with FakeBoardDetect([self.device]).installed():
+            result = Erase().erase(target_id=self.device.target_id, method="msd")
+        self.assertEqual(result, EXIT_CODE_SUCCESS)
+        self.assertEqual(self.device.erase_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
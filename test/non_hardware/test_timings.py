@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 ARM Limited
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint:disable=missing-docstring
+# pylint:disable=invalid-name
+# pylint:disable=unused-argument
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import mock
+
+from mbed_flasher.main import FlasherCLI
+from mbed_flasher.timings import Tracer, TRACER, NULL_SPAN
+
+
+class TracerTestCase(unittest.TestCase):
+    def test_disabled_records_nothing(self):
+        tracer = Tracer()
+        with tracer.span("phase") as span:
+            self.assertIs(span, NULL_SPAN)
+            span.set(bytes=10)
+        self.assertEqual(tracer.breakdown(), [])
+
+    def test_nested_spans(self):
+        tracer = Tracer()
+        tracer.enable()
+        with tracer.span("flash", target_id="0240"):
+            with tracer.span("copy") as span:
+                span.set(bytes=1000)
+            with tracer.span("verify"):
+                pass
+        breakdown = tracer.breakdown()
+        self.assertEqual(len(breakdown), 1)
+        self.assertEqual(breakdown[0]["name"], "flash")
+        self.assertEqual(breakdown[0]["target_id"], "0240")
+        children = breakdown[0]["children"]
+        self.assertEqual([child["name"] for child in children], ["copy", "verify"])
+        self.assertEqual(children[0]["bytes"], 1000)
+        self.assertIn("throughput", children[0])
+
+    def test_error_recorded(self):
+        tracer = Tracer()
+        tracer.enable()
+        with self.assertRaises(ValueError):
+            with tracer.span("phase"):
+                raise ValueError("boom")
+        self.assertEqual(tracer.breakdown()[0]["error"], "boom")
+
+    def test_timed_decorator(self):
+        tracer = Tracer()
+
+        @tracer.timed("work")
+        def work(value):
+            tracer.current().set(bytes=value)
+            return value * 2
+
+        self.assertEqual(work(2), 4)
+        self.assertEqual(tracer.breakdown(), [])
+        tracer.enable()
+        self.assertEqual(work(3), 6)
+        self.assertEqual(tracer.breakdown()[0]["bytes"], 3)
+
+    def test_chrome_trace_threads(self):
+        tracer = Tracer()
+        tracer.enable()
+
+        def flash():
+            with tracer.span("flash"):
+                with tracer.span("copy"):
+                    pass
+
+        threads = [threading.Thread(target=flash) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        events = tracer.chrome_trace()["traceEvents"]
+        self.assertEqual(len(events), 4)
+        self.assertEqual(len(tracer.breakdown()), 2)
+        self.assertEqual(len(set(event["tid"] for event in events)), 2)
+        for event in events:
+            self.assertEqual(event["ph"], "X")
+            self.assertGreaterEqual(event["dur"], 0)
+
+
+class TimingsCliTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        shutil.rmtree(self.tmp_dir)
+        TRACER.disable()
+        TRACER.clear()
+
+    @mock.patch("mbed_flasher.api.Reset")
+    def test_trace_written(self, mock_reset):
+        def reset(**kwargs):
+            with TRACER.span("Reset.reset_board"):
+                return 0
+
+        mock_reset.return_value.reset.side_effect = reset
+        path = os.path.join(self.tmp_dir, "trace.json")
+        cli = FlasherCLI(["--trace", path, "reset", "--tid", "0240"])
+        self.assertEqual(cli.execute(), 0)
+        self.assertFalse(TRACER.enabled)
+        with open(path) as trace_file:
+            events = json.load(trace_file)["traceEvents"]
+        self.assertEqual([event["name"] for event in events], ["reset", "Reset.reset_board"])
+
+
+if __name__ == '__main__':
+    unittest.main()